@@ -3,6 +3,7 @@
 # requires-python = ">=3.12"
 # dependencies = [
 #     "click",
+#     "numpy",
 #     "pydantic",
 #     "pygame",
 #     "pyyaml",
@@ -14,15 +15,87 @@ A simple and clean implementation of the popular 2048 puzzle game
 using Python and Pygame.
 """
 
+from __future__ import annotations
+
+import bisect
+import contextlib
+import copy
+import dataclasses
+import functools
+import importlib
+import itertools
+import json
+import math
+import mmap
+import os
 import random
+import statistics
+import struct
 import sys
+import time
+from collections import Counter, OrderedDict, deque
 from enum import Enum, auto
-from typing import Dict, List, Optional, Set, Tuple
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    BinaryIO,
+    Callable,
+    ContextManager,
+    Deque,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    Union,
+)
 
 import click
-import pygame
-import yaml
-from pydantic import BaseModel, Field
+
+if TYPE_CHECKING:
+    import asyncio
+    import ctypes
+    import multiprocessing
+    import multiprocessing.connection
+    import queue
+    import sqlite3
+    import threading
+    from concurrent.futures import ProcessPoolExecutor
+
+    import numpy as np
+    import pygame
+
+
+class LazyModule:
+    """Stand-in for a module that is only imported on first attribute access.
+
+    Headless uses of the game logic never touch pygame or numpy, so they skip
+    the cost of importing them. Once loaded, the real module replaces the
+    stand-in in this module's globals.
+    """
+
+    def __init__(self, name: str, alias: str) -> None:
+        """Initialize the stand-in.
+
+        Args:
+            name: Name of the module to import
+            alias: Global name the module is bound to here
+        """
+        self.name = name
+        self.alias = alias
+
+    def __getattr__(self, attr: str) -> Any:
+        module = importlib.import_module(self.name)
+        globals()[self.alias] = module
+        return getattr(module, attr)
+
+
+# Heavy optional imports, loaded on first use
+np = LazyModule("numpy", "np")
+pygame = LazyModule("pygame", "pygame")
 
 
 class Action(Enum):
@@ -34,17 +107,77 @@ class Action(Enum):
     RIGHT = auto()
     RESTART = auto()
     NONE = auto()
+    UNDO = auto()
+    REDO = auto()
+
 
+# Move actions in the order used wherever moves are indexed or encoded
+MOVE_ACTIONS: Tuple[Action, ...] = (Action.UP, Action.DOWN, Action.LEFT, Action.RIGHT)
+MOVE_INDEX: Dict[Action, int] = {action: idx for idx, action in enumerate(MOVE_ACTIONS)}
 
-class GameConfig(BaseModel):
-    """Configuration for the 2048 game."""
+# Largest grid the list, bitboard and compact engines play; the numpy engine
+# goes up to the GameConfig bound
+MAX_GRID_SIZE = 8
+
+
+def setting(
+    default: Any = dataclasses.MISSING,
+    *,
+    default_factory: Any = dataclasses.MISSING,
+    ge: Optional[int] = None,
+    le: Optional[int] = None,
+    description: str = "",
+) -> Any:
+    """Declare a GameConfig field with optional bounds checked on construction.
+
+    Args:
+        default: Default value
+        default_factory: Factory for mutable default values
+        ge: Smallest allowed value
+        le: Largest allowed value
+        description: Human-readable description
+
+    Returns:
+        Dataclass field
+    """
+    return dataclasses.field(
+        default=default,
+        default_factory=default_factory,
+        metadata={"ge": ge, "le": le, "description": description},
+    )
+
+
+@dataclasses.dataclass
+class GameConfig:
+    """Configuration for the 2048 game.
+
+    A plain dataclass, so building one costs nothing beyond the bounds checks;
+    YAML files are parsed and validated with pydantic only when loaded.
+    """
 
     # Grid and display settings
-    grid_size: int = Field(default=4, ge=2, le=8, description="Size of the game grid")
-    tile_size: int = Field(
-        default=100, ge=40, le=200, description="Size of each tile in pixels"
+    # Replays store the grid size in one byte
+    grid_size: int = setting(4, ge=2, le=255, description="Size of the game grid")
+    tile_size: int = setting(
+        100, ge=40, le=200, description="Size of each tile in pixels"
+    )
+    fps: int = setting(60, ge=30, le=120, description="Frames per second")
+
+    # Engine settings
+    engine: Literal["list", "bitboard", "compact", "numpy"] = setting(
+        "list", description="Game engine backing the board state"
+    )
+    # Off by default: on random play, 4096 rows cost time on 6x6 and saved
+    # it only on 5x5, so only enable it where a benchmark shows a gain
+    row_cache_size: int = setting(
+        0,
+        ge=0,
+        description="Merged rows kept in the row cache of grids above 4x4 (0 disables)",
+    )
+    # A 4x4 keyframe interval takes about 15 KiB; the bound keeps several
+    undo_memory_kb: int = setting(
+        1024, ge=64, description="Memory the undo history may use, in KiB"
     )
-    fps: int = Field(default=60, ge=30, le=120, description="Frames per second")
 
     # Font settings
     font_name: str = "Arial"
@@ -57,44 +190,434 @@ class GameConfig(BaseModel):
 
     # Tile settings
     empty_tile: Tuple[int, int, int, int] = (205, 193, 180, 50)
-    tile_colors: Dict[int, Tuple[int, ...]] = {
-        0: (205, 193, 180, 50),
-        2: (238, 228, 218),
-        4: (237, 224, 200),
-        8: (242, 177, 121),
-        16: (245, 149, 99),
-        32: (246, 124, 95),
-        64: (246, 94, 59),
-        128: (237, 207, 114),
-        256: (237, 204, 97),
-        512: (237, 200, 80),
-        1024: (237, 197, 63),
-        2048: (237, 194, 46),
-    }
-    text_colors: Dict[int, Tuple[int, int, int]] = {
-        2: (119, 110, 101),
-        4: (119, 110, 101),
-    }
+    tile_colors: Dict[int, Tuple[int, ...]] = setting(
+        default_factory=lambda: {
+            0: (205, 193, 180, 50),
+            2: (238, 228, 218),
+            4: (237, 224, 200),
+            8: (242, 177, 121),
+            16: (245, 149, 99),
+            32: (246, 124, 95),
+            64: (246, 94, 59),
+            128: (237, 207, 114),
+            256: (237, 204, 97),
+            512: (237, 200, 80),
+            1024: (237, 197, 63),
+            2048: (237, 194, 46),
+        }
+    )
+    text_colors: Dict[int, Tuple[int, int, int]] = setting(
+        default_factory=lambda: {
+            2: (119, 110, 101),
+            4: (119, 110, 101),
+        }
+    )
+
+    # Auto-play settings
+    ai_player: Literal["expectimax", "montecarlo"] = setting(
+        "expectimax", description="Strategy used for auto-play"
+    )
+    ai_time_budget_ms: int = setting(
+        50, ge=1, le=5000, description="Search time per auto-played move"
+    )
+    hint_time_budget_ms: int = setting(
+        500, ge=1, le=10000, description="Search time for a move hint"
+    )
+    mc_rollouts: int = setting(
+        200, ge=1, description="Maximum Monte Carlo rollouts per move"
+    )
+    mc_workers: int = setting(
+        0, ge=0, description="Monte Carlo worker processes (0 for all cores)"
+    )
 
     # Layout settings
     animation_duration: int = 200  # milliseconds for new tile animation
+    animation_frames: int = setting(
+        8, ge=1, description="Pre-rendered frames of the new tile animation"
+    )
     title_y: int = 20  # Y coordinate for title text
     subtitle_y: int = 85  # Y coordinate for subtitle text
     grid_top_y: int = 195  # Y coordinate where the grid starts
     grid_padding: int = 15  # Padding around the grid
     debounce_time: int = 150  # milliseconds to prevent too rapid moves
 
+    def __post_init__(self) -> None:
+        """Check numeric settings against their bounds.
+
+        Raises:
+            ValueError: If a setting is out of bounds
+        """
+        for config_field in dataclasses.fields(self):
+            value = getattr(self, config_field.name)
+            low = config_field.metadata.get("ge")
+            high = config_field.metadata.get("le")
+            if low is not None and value < low:
+                raise ValueError(
+                    f"{config_field.name} must be at least {low}, got {value}"
+                )
+            if high is not None and value > high:
+                raise ValueError(
+                    f"{config_field.name} must be at most {high}, got {value}"
+                )
+
+    def model_copy(self, update: Dict[str, Any]) -> GameConfig:
+        """Return a copy with some settings replaced and checked again.
+
+        Args:
+            update: Settings to replace
+
+        Returns:
+            Updated configuration
+        """
+        return dataclasses.replace(self, **update)
+
+
+class RowCache:
+    """Bounded LRU cache of merged rows and the score they gained."""
+
+    def __init__(self, max_size: int) -> None:
+        """Initialize an empty cache.
+
+        Args:
+            max_size: Maximum number of rows to keep
+        """
+        self.max_size = max_size
+        self.entries: OrderedDict[Tuple[int, ...], Tuple[Tuple[int, ...], int]] = (
+            OrderedDict()
+        )
+        self.hits: int = 0
+        self.misses: int = 0
+        self.evictions: int = 0
+
+    def get(self, key: Tuple[int, ...]) -> Optional[Tuple[Tuple[int, ...], int]]:
+        """Look up a row, marking it as recently used.
+
+        Args:
+            key: The row before merging
+
+        Returns:
+            The merged row and score delta, or None if not cached
+        """
+        entry = self.entries.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Tuple[int, ...], merged: Tuple[int, ...], score: int) -> None:
+        """Store a merged row, evicting the least recently used one if full.
+
+        Args:
+            key: The row before merging
+            merged: The row after merging
+            score: Score gained by the merge
+        """
+        if self.max_size == 0:
+            return
+        self.entries[key] = (merged, score)
+        if len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def clear(self) -> None:
+        """Remove all cached rows and reset the counters."""
+        self.entries.clear()
+        self.hits = self.misses = self.evictions = 0
+
+    @property
+    def hit_rate(self) -> float:
+        """Fraction of lookups served from the cache."""
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def check_grid_size(config: GameConfig) -> None:
+    """Reject grids too large for the engines that scan the whole board per move.
+
+    Args:
+        config: Game configuration parameters
+
+    Raises:
+        ValueError: If the grid is larger than MAX_GRID_SIZE
+    """
+    if config.grid_size > MAX_GRID_SIZE:
+        raise ValueError(
+            f"The {config.engine} engine supports grids up to "
+            f"{MAX_GRID_SIZE}x{MAX_GRID_SIZE}; use the numpy engine for larger ones"
+        )
+
+
+# Undo history
+#
+# UndoHistory keeps every position of a game, oldest first, with the board
+# packed to one byte per cell. What decides the next tile spawn, the RNG
+# state and the order of the game's empty cell list, is saved only at
+# keyframes; any other position gets it back by replaying the moves since
+# the keyframe before it, which deals the same tiles again. When the history
+# outgrows its memory cap, every other position in its older half is dropped
+# and its moves are folded into the next one, so recent positions stay one
+# move apart while old ones are kept more coarsely.
+
+# Positions from one RNG keyframe to the next
+UNDO_KEYFRAME_INTERVAL = 32
+
+
+def pack_rng_state(rng: random.Random) -> bytes:
+    """Pack a Mersenne Twister state into about 2.5 KB.
+
+    The cached gauss() value is dropped; tile spawns never use it.
+
+    Args:
+        rng: Random number generator
+
+    Returns:
+        The state version followed by the 32-bit state words
+    """
+    version, internal, _ = rng.getstate()
+    return bytes([version]) + struct.pack(f"<{len(internal)}I", *internal)
+
+
+def unpack_rng_state(rng: random.Random, data: bytes) -> None:
+    """Restore a state packed with pack_rng_state.
+
+    Args:
+        rng: Random number generator to restore
+        data: Packed state
+    """
+    internal = struct.unpack(f"<{(len(data) - 1) // 4}I", data[1:])
+    rng.setstate((data[0], internal, None))
+
+
+@dataclasses.dataclass(frozen=True)
+class UndoEntry:
+    """One position in the undo history."""
+
+    board: bytes
+    score: int
+    move_counts: Tuple[int, ...]
+    game_over: bool
+    # Moves since the previous position, as indices into MOVE_ACTIONS
+    moves: bytes
+    # Packed RNG state and the game's empty_list at keyframes, None elsewhere
+    rng_state: Optional[bytes]
+    empty_order: Optional[bytes]
+
+    @property
+    def size(self) -> int:
+        """Memory used by the entry and the objects only it holds, in bytes.
+
+        Measured with sys.getsizeof, including the entry's slot in the
+        history's list; None and the ints in move_counts are shared and are
+        not counted.
+        """
+        size = (
+            sys.getsizeof(self)
+            + sys.getsizeof(vars(self))
+            + sys.getsizeof(self.board)
+            + sys.getsizeof(self.score)
+            + sys.getsizeof(self.move_counts)
+            + sys.getsizeof(self.moves)
+            + struct.calcsize("P")
+        )
+        if self.rng_state is not None:
+            size += sys.getsizeof(self.rng_state) + sys.getsizeof(self.empty_order)
+        return size
+
+
+class UndoHistory:
+    """Positions of a game that can be stepped back and forth through."""
+
+    def __init__(self, max_bytes: int) -> None:
+        """Initialize an empty history.
+
+        Args:
+            max_bytes: Memory the history may use before it is thinned
+        """
+        self.max_bytes = max_bytes
+        self.entries: List[UndoEntry] = []
+        self.position: int = -1
+        self.size: int = 0
+
+    def snapshot(self, game: Game, moves: bytes, keyframe: bool) -> UndoEntry:
+        """Pack a game's current position.
+
+        Args:
+            game: Game to pack
+            moves: Moves since the previous position
+            keyframe: Whether to save what decides the next spawns
+
+        Returns:
+            The position
+        """
+        return UndoEntry(
+            board=pack_board(game.board),
+            score=game.score,
+            move_counts=tuple(game.move_counts),
+            game_over=game.game_over,
+            moves=moves,
+            rng_state=pack_rng_state(game.rng) if keyframe else None,
+            empty_order=bytes(game.empty_list) if keyframe else None,
+        )
+
+    def reset(self, game: Game) -> None:
+        """Start over from a game's current position.
+
+        Args:
+            game: Game whose position becomes the only one
+        """
+        entry = self.snapshot(game, b"", keyframe=True)
+        self.entries = [entry]
+        self.position = 0
+        self.size = entry.size
+
+    def keyframe_before(self, index: int) -> int:
+        """Index of the last keyframe at or before a position."""
+        while self.entries[index].rng_state is None:
+            index -= 1
+        return index
+
+    def record(self, game: Game, action: Action) -> None:
+        """Add the position after a move, forgetting positions to redo.
+
+        Args:
+            game: Game that just made the move
+            action: The move
+        """
+        for entry in self.entries[self.position + 1 :]:
+            self.size -= entry.size
+        del self.entries[self.position + 1 :]
+        keyframe = (
+            self.position - self.keyframe_before(self.position)
+            >= UNDO_KEYFRAME_INTERVAL - 1
+        )
+        entry = self.snapshot(game, bytes([MOVE_INDEX[action]]), keyframe)
+        self.entries.append(entry)
+        self.position += 1
+        self.size += entry.size
+        if self.size > self.max_bytes:
+            self.thin(game)
+
+    def spawn_state(self, index: int, game: Game) -> Tuple[bytes, bytes]:
+        """Rebuild what decides the spawns of a position, from its keyframe.
+
+        Args:
+            index: Position to rebuild
+            game: Game the history belongs to
+
+        Returns:
+            Packed RNG state and the order of the empty cell list
+        """
+        keyframe = self.keyframe_before(index)
+        if keyframe == index:
+            return self.entries[index].rng_state, self.entries[index].empty_order
+        replay = game.clone()
+        self.restore(replay, keyframe)
+        for entry in self.entries[keyframe + 1 : index + 1]:
+            for move in entry.moves:
+                replay.handle_action(MOVE_ACTIONS[move])
+        return pack_rng_state(replay.rng), bytes(replay.empty_list)
+
+    def restore(self, game: Game, index: int) -> None:
+        """Put a game into a recorded position, spawn state included.
+
+        Args:
+            game: Game to restore
+            index: Position to restore
+        """
+        entry = self.entries[index]
+        rng_state, empty_order = self.spawn_state(index, game)
+        unpack_rng_state(game.rng, rng_state)
+        game.board = unpack_board(entry.board, game.grid_size)
+        game.update_empty_cells()
+        # Spawns pick from empty_list by index, so its order must match too
+        game.empty_list = list(empty_order)
+        for position, cell in enumerate(game.empty_list):
+            game.empty_index[cell] = position
+        game.score = entry.score
+        game.move_counts = list(entry.move_counts)
+        game.game_over = entry.game_over
+        game.new_tile_position = None
+
+    def step(self, game: Game, offset: int) -> bool:
+        """Move through the history and restore the position reached.
+
+        Args:
+            game: Game the history belongs to
+            offset: -1 to undo, 1 to redo
+
+        Returns:
+            True if there was a position to move to
+        """
+        target = self.position + offset
+        if not 0 <= target < len(self.entries):
+            return False
+        self.restore(game, target)
+        self.position = target
+        return True
+
+    def thin(self, game: Game) -> None:
+        """Drop every other old position until the history fits its cap.
+
+        Args:
+            game: Game the history belongs to
+        """
+        while self.size > self.max_bytes and self.position >= 2:
+            # Odd positions in the older half; the first and current stay
+            for index in reversed(range(1, self.position // 2 + 1, 2)):
+                self.drop(index, game)
+
+    def drop(self, index: int, game: Game) -> None:
+        """Remove a position, folding its moves into the next one.
+
+        Args:
+            index: Position to remove; never the first or the current one
+            game: Game the history belongs to
+        """
+        entry, following = self.entries[index], self.entries[index + 1]
+        rng_state, empty_order = following.rng_state, following.empty_order
+        if entry.rng_state is not None and rng_state is None:
+            # The next position would lose its keyframe, so it becomes one
+            rng_state, empty_order = self.spawn_state(index + 1, game)
+        merged = dataclasses.replace(
+            following,
+            moves=entry.moves + following.moves,
+            rng_state=rng_state,
+            empty_order=empty_order,
+        )
+        self.size += merged.size - entry.size - following.size
+        self.entries[index + 1] = merged
+        del self.entries[index]
+        self.position -= 1
+
 
 class Game:
-    """Handles game state and logic for 2048."""
+    """Handles game state and logic for 2048.
 
-    def __init__(self, config: GameConfig) -> None:
+    Empty cells and equal neighbouring pairs are tracked incrementally from
+    the cells each move changes; call update_empty_cells() after replacing
+    the board directly.
+    """
+
+    def __init__(self, config: GameConfig, seed: Optional[int] = None) -> None:
         """Initialize a new game with the specified configuration.
 
         Args:
             config: Game configuration parameters
+            seed: Seed for the tile spawns of the games that follow, or None
+                to seed from the operating system
+
+        Raises:
+            ValueError: If the grid is larger than MAX_GRID_SIZE
         """
+        check_grid_size(config)
         self.grid_size = config.grid_size
+        # Tile spawns use a private RNG, so a game is reproducible from its seed
+        self.rng = random.Random(seed)
+        self.seed: int = 0
+        # Board-changing moves made in each direction, in MOVE_ACTIONS order
+        self.move_counts: List[int] = [0] * len(MOVE_ACTIONS)
         self.board: List[List[int]] = [
             [0 for _ in range(self.grid_size)] for _ in range(self.grid_size)
         ]
@@ -102,18 +625,96 @@ class Game:
         self.game_over: bool = False
         self.new_tile_position: Optional[Tuple[int, int]] = None
         self.animation_start_time: int = 0
-        self.empty_cells: Set[Tuple[int, int]] = {
-            (i, j) for i in range(self.grid_size) for j in range(self.grid_size)
-        }
+        # Empty cells as flat indices (row * grid_size + col) in a list for
+        # O(1) sampling, with each cell's position in that list or -1
+        self.empty_list: List[int] = []
+        self.empty_index: List[int] = []
+        # One flag per neighbour pair, at 2 * cell for the pair to the right and
+        # 2 * cell + 1 for the pair below, set when both hold the same tile
+        self.pair_flags = bytearray()
+        self.equal_pairs: int = 0
+        # Merged rows are cached only above 4x4 and when a size is set;
+        # smaller rows merge faster than the cache can look them up
+        self.row_cache: Optional[RowCache] = (
+            RowCache(config.row_cache_size)
+            if self.grid_size > 4 and config.row_cache_size > 0
+            else None
+        )
+        # Positions to undo and redo, kept once enable_undo() is called
+        self.history: Optional[UndoHistory] = None
+        self.update_empty_cells()
+
+    @property
+    def empty_cells(self) -> Set[Tuple[int, int]]:
+        """The set of empty cells."""
+        return {divmod(cell, self.grid_size) for cell in self.empty_list}
 
     def update_empty_cells(self) -> None:
-        """Update the set of empty cells based on current board state."""
-        self.empty_cells = {
-            (i, j)
-            for i in range(self.grid_size)
-            for j in range(self.grid_size)
-            if self.board[i][j] == 0
-        }
+        """Rebuild the empty cell and equal pair tracking from the whole board."""
+        num_cells = self.grid_size * self.grid_size
+        self.empty_list = []
+        self.empty_index = [-1] * num_cells
+        self.pair_flags = bytearray(2 * num_cells)
+        self.equal_pairs = 0
+        self.update_cells(
+            [(i, j) for i in range(self.grid_size) for j in range(self.grid_size)]
+        )
+
+    def update_cells(self, cells: List[Tuple[int, int]]) -> None:
+        """Update the empty cell and equal pair tracking after cells changed.
+
+        Args:
+            cells: Cells whose value changed
+        """
+        board = self.board
+        size = self.grid_size
+        last = size - 1
+        empty_list = self.empty_list
+        empty_index = self.empty_index
+        flags = self.pair_flags
+        equal_pairs = self.equal_pairs
+        for row_idx, col_idx in cells:
+            row = board[row_idx]
+            value = row[col_idx]
+            cell = row_idx * size + col_idx
+
+            idx = empty_index[cell]
+            if value == 0:
+                if idx < 0:
+                    empty_index[cell] = len(empty_list)
+                    empty_list.append(cell)
+            elif idx >= 0:
+                # Swap-remove keeps removal O(1)
+                moved_cell = empty_list.pop()
+                if moved_cell != cell:
+                    empty_list[idx] = moved_cell
+                    empty_index[moved_cell] = idx
+                empty_index[cell] = -1
+
+            # Re-check the pairs to the right, left, below and above the cell.
+            # Two empty neighbours count as a pair too, which is harmless:
+            # pairs only decide the game once no cell is empty.
+            if col_idx < last:
+                pair = 2 * cell
+                flag = value == row[col_idx + 1]
+                equal_pairs += flag - flags[pair]
+                flags[pair] = flag
+            if col_idx > 0:
+                pair = 2 * (cell - 1)
+                flag = value == row[col_idx - 1]
+                equal_pairs += flag - flags[pair]
+                flags[pair] = flag
+            if row_idx < last:
+                pair = 2 * cell + 1
+                flag = value == board[row_idx + 1][col_idx]
+                equal_pairs += flag - flags[pair]
+                flags[pair] = flag
+            if row_idx > 0:
+                pair = 2 * (cell - size) + 1
+                flag = value == board[row_idx - 1][col_idx]
+                equal_pairs += flag - flags[pair]
+                flags[pair] = flag
+        self.equal_pairs = equal_pairs
 
     def add_random_tile(self) -> Optional[Tuple[int, int]]:
         """Add a random tile (2 or 4) to an empty cell.
@@ -121,15 +722,24 @@ class Game:
         Returns:
             The position of the new tile, or None if no empty cells
         """
-        self.update_empty_cells()  # ensure board and list are in sync
-        if not self.empty_cells:
+        if not self.empty_list:
             return None
-        row_idx, col_idx = random.choice(list(self.empty_cells))
-        self.board[row_idx][col_idx] = 2 if random.random() < 0.9 else 4
+        row_idx, col_idx = divmod(self.rng.choice(self.empty_list), self.grid_size)
+        self.set_tile(row_idx, col_idx, 2 if self.rng.random() < 0.9 else 4)
         self.new_tile_position = (row_idx, col_idx)
-        self.empty_cells.remove((row_idx, col_idx))
+        self.update_cells([(row_idx, col_idx)])
         return (row_idx, col_idx)
 
+    def set_tile(self, row_idx: int, col_idx: int, value: int) -> None:
+        """Place a tile value on the board.
+
+        Args:
+            row_idx: Grid row index
+            col_idx: Grid column index
+            value: Tile value to place
+        """
+        self.board[row_idx][col_idx] = value
+
     def merge_row(self, row: List[int]) -> List[int]:
         """Merge a single row by combining identical adjacent values.
 
@@ -139,74 +749,102 @@ class Game:
         Returns:
             The merged row
         """
+        # Serve repeated rows from the cache; a row tuple hashes faster than
+        # packing it into an int in Python
+        row_cache = self.row_cache
+        if row_cache is not None:
+            key = tuple(row)
+            cached = row_cache.get(key)
+            if cached is not None:
+                merged, gained = cached
+                self.score += gained
+                return list(merged)
+
         # Remove zeros
         row = [value for value in row if value != 0]
 
         # Merge adjacent identical values
+        gained = 0
         for i in range(len(row) - 1):
             if row[i] == row[i + 1]:
                 row[i] *= 2
-                self.score += row[i]
+                gained += row[i]
                 row[i + 1] = 0
+        self.score += gained
 
         # Remove zeros again and pad with zeros
         row = [value for value in row if value != 0]
         while len(row) < self.grid_size:
             row.append(0)
 
+        if row_cache is not None:
+            row_cache.put(key, tuple(row), gained)
         return row
 
-    def move_left(self) -> bool:
+    def move_left(self) -> List[Tuple[int, int]]:
         """Move tiles to the left and merge them.
 
         Returns:
-            True if the board changed, False otherwise
+            Cells whose value changed, empty if none did
         """
-        moved = False
+        changed = []
         for row_idx in range(self.grid_size):
-            original_row = self.board[row_idx].copy()
-            self.board[row_idx] = self.merge_row(self.board[row_idx])
-            if original_row != self.board[row_idx]:
-                moved = True
-        return moved
+            original_row = self.board[row_idx]
+            merged_row = self.merge_row(original_row)
+            if merged_row != original_row:
+                self.board[row_idx] = merged_row
+                changed.extend(
+                    [
+                        (row_idx, col_idx)
+                        for col_idx in range(self.grid_size)
+                        if merged_row[col_idx] != original_row[col_idx]
+                    ]
+                )
+        return changed
 
-    def move_right(self) -> bool:
+    def move_right(self) -> List[Tuple[int, int]]:
         """Move tiles to the right and merge them.
 
         Returns:
-            True if the board changed, False otherwise
+            Cells whose value changed, empty if none did
         """
-        moved = False
+        changed = []
         for row_idx in range(self.grid_size):
-            original_row = self.board[row_idx].copy()
-            reversed_row = self.board[row_idx][::-1]
-            slid_row = self.merge_row(reversed_row)
-            self.board[row_idx] = slid_row[::-1]
-            if original_row != self.board[row_idx]:
-                moved = True
-        return moved
-
-    def move_up(self) -> bool:
+            original_row = self.board[row_idx]
+            reversed_row = original_row[::-1]
+            slid_row = self.merge_row(reversed_row)[::-1]
+            if slid_row != original_row:
+                self.board[row_idx] = slid_row
+                changed.extend(
+                    [
+                        (row_idx, col_idx)
+                        for col_idx in range(self.grid_size)
+                        if slid_row[col_idx] != original_row[col_idx]
+                    ]
+                )
+        return changed
+
+    def move_up(self) -> List[Tuple[int, int]]:
         """Move tiles up and merge them.
 
         Returns:
-            True if the board changed, False otherwise
+            Cells whose value changed, empty if none did
         """
         self.transpose()
-        moved = self.move_left()
+        changed = self.move_left()
         self.transpose()
-        return moved
+        return [(col_idx, row_idx) for row_idx, col_idx in changed]
 
-    def move_down(self) -> bool:
+    def move_down(self) -> List[Tuple[int, int]]:
         """Move tiles down and merge them.
 
         Returns:
-            True if the board changed, False otherwise
+            Cells whose value changed, empty if none did
         """
         self.transpose()
-        moved = self.move_right()
+        changed = self.move_right()
         self.transpose()
-        return moved
+        return [(col_idx, row_idx) for row_idx, col_idx in changed]
 
     def transpose(self) -> None:
         """Transpose the board matrix."""
@@ -221,25 +859,55 @@ class Game:
         Returns:
             True if game is over, False if moves are still possible
         """
-        # Check for empty cells
-        for row_idx in range(self.grid_size):
-            for col_idx in range(self.grid_size):
-                if self.board[row_idx][col_idx] == 0:
-                    return False
+        # Moves are possible while a cell is empty or two neighbours can merge
+        return not self.empty_list and not self.equal_pairs
 
-        # Check for possible merges horizontally
-        for row_idx in range(self.grid_size):
-            for col_idx in range(self.grid_size - 1):
-                if self.board[row_idx][col_idx] == self.board[row_idx][col_idx + 1]:
-                    return False
+    def board_state(self) -> Board:
+        """The board as an immutable tuple of rows, for all_moves and the AIs."""
+        return tuple(map(tuple, self.board))
 
-        # Check for possible merges vertically
-        for row_idx in range(self.grid_size - 1):
-            for col_idx in range(self.grid_size):
-                if self.board[row_idx][col_idx] == self.board[row_idx + 1][col_idx]:
-                    return False
+    def legal_actions(self) -> List[Action]:
+        """Moves that would change the board, in MOVE_ACTIONS order."""
+        return legal_actions(self.board_state())
 
-        return True
+    def move(self, action: Action) -> List[Tuple[int, int]]:
+        """Slide the tiles in a direction without spawning a new tile.
+
+        The empty cell and equal pair tracking is left for the caller to
+        update with update_cells(). Every engine lists the changed cells in
+        the same order, so games stay identical across engines.
+
+        Args:
+            action: One of the move actions
+
+        Returns:
+            Cells whose value changed, empty if none did
+        """
+        action_handlers = {
+            Action.LEFT: self.move_left,
+            Action.RIGHT: self.move_right,
+            Action.UP: self.move_up,
+            Action.DOWN: self.move_down,
+        }
+        return action_handlers[action]()
+
+    def clone(self) -> "Game":
+        """Return an independent copy of the game for trying out moves.
+
+        The copy shares the row cache, if any, with this game.
+
+        Returns:
+            Copy of the game
+        """
+        other = copy.copy(self)
+        other.rng = copy.copy(self.rng)
+        other.history = None
+        other.move_counts = self.move_counts.copy()
+        other.board = [row.copy() for row in self.board]
+        other.empty_list = self.empty_list.copy()
+        other.empty_index = self.empty_index.copy()
+        other.pair_flags = self.pair_flags.copy()
+        return other
 
     def handle_action(self, action: Action) -> bool:
         """Process a game action and return whether the board changed.
@@ -257,432 +925,5945 @@ class Game:
         if action == Action.NONE:
             return False
 
-        action_handlers = {
-            Action.LEFT: self.move_left,
-            Action.RIGHT: self.move_right,
-            Action.UP: self.move_up,
-            Action.DOWN: self.move_down,
-        }
+        if action == Action.UNDO:
+            return self.undo()
 
-        if action in action_handlers:
-            moved = action_handlers[action]()
-            if moved:
-                self.update_empty_cells()
+        if action == Action.REDO:
+            return self.redo()
+
+        if action in MOVE_ACTIONS:
+            changed = self.move(action)
+            if changed:
+                self.move_counts[MOVE_INDEX[action]] += 1
+                self.update_cells(changed)
                 self.add_random_tile()
                 if self.is_game_over():
                     self.game_over = True
-            return moved
+                if self.history is not None:
+                    self.history.record(self, action)
+            return bool(changed)
 
         return False
 
-    def restart(self) -> None:
-        """Reset the game to its initial state."""
+    def enable_undo(self, memory_kb: int) -> None:
+        """Start keeping the positions of each game for undo and redo.
+
+        Args:
+            memory_kb: Memory the history may use, in KiB
+        """
+        self.history = UndoHistory(memory_kb * 1024)
+        self.history.reset(self)
+
+    def undo(self) -> bool:
+        """Go back to the position before the last move.
+
+        Returns:
+            True if there was a move to undo
+        """
+        return self.history is not None and self.history.step(self, -1)
+
+    def redo(self) -> bool:
+        """Replay the last undone move.
+
+        Returns:
+            True if there was a move to redo
+        """
+        return self.history is not None and self.history.step(self, 1)
+
+    def restart(self, seed: Optional[int] = None) -> None:
+        """Reset the game to its initial state.
+
+        Args:
+            seed: Seed for this game's tile spawns, or None to draw one from
+                the game's RNG
+        """
+        self.seed = seed if seed is not None else self.rng.getrandbits(64)
+        self.rng.seed(self.seed)
         self.board = [[0 for _ in range(self.grid_size)] for _ in range(self.grid_size)]
         self.score = 0
         self.game_over = False
         self.new_tile_position = None
-        self.empty_cells = {
-            (i, j) for i in range(self.grid_size) for j in range(self.grid_size)
-        }
+        self.move_counts = [0] * len(MOVE_ACTIONS)
+        self.update_empty_cells()
         self.add_random_tile()
         self.add_random_tile()
+        if self.history is not None:
+            self.history.reset(self)
 
 
-class Renderer:
-    """Handles rendering logic for 2048."""
+def pack_board(board: List[List[int]]) -> bytes:
+    """Pack a board into one byte per cell holding the tile exponent.
 
-    def __init__(self, game: Game, config: GameConfig) -> None:
-        """Initialize the renderer.
+    Args:
+        board: Rows of tile values
 
-        Args:
-            game: Game instance to render
-            config: Configuration parameters
-        """
-        self.game = game
-        self.config = config
+    Returns:
+        Row-major exponents, 0 for empty cells
+    """
+    return bytes(
+        value.bit_length() - 1 if value else 0 for row in board for value in row
+    )
 
-        # Layout parameters
-        self.animation_duration = config.animation_duration
-        self.title_y = config.title_y
-        self.subtitle_y = config.subtitle_y
-        self.grid_top_y = config.grid_top_y
-        self.tile_size = config.tile_size
-        self.fps = config.fps
-        self.font_name = config.font_name
-        self.grid_padding = config.grid_padding
-        self.debounce_time = config.debounce_time
 
-        # Calculate dimensions
-        self.grid_width = (
-            self.grid_padding * (game.grid_size + 1) + self.tile_size * game.grid_size
-        )
-        self.grid_height = self.grid_width
-        self.width = max(500, self.grid_width + 40)
-        self.height = 175 + self.grid_height + 100
+def unpack_board(packed: bytes, grid_size: int) -> List[List[int]]:
+    """Unpack a board packed with pack_board.
 
-        # Initialize pygame resources
-        self.screen: Optional[pygame.Surface] = None
-        self.clock: Optional[pygame.time.Clock] = None
-        self.title_font: Optional[pygame.font.Font] = None
-        self.subtitle_font: Optional[pygame.font.Font] = None
-        self.instruction_font: Optional[pygame.font.Font] = None
-        self.score_font: Optional[pygame.font.Font] = None
-        self.score_label_font: Optional[pygame.font.Font] = None
-        self.tile_fonts: Dict[int, pygame.font.Font] = {}
+    Args:
+        packed: Row-major exponents
+        grid_size: Size of the grid
 
-        # Tracking the last action time for debouncing
-        self.last_action_time: int = 0
+    Returns:
+        Rows of tile values
+    """
+    return [
+        [
+            1 << exponent if exponent else 0
+            for exponent in packed[start : start + grid_size]
+        ]
+        for start in range(0, grid_size * grid_size, grid_size)
+    ]
 
-    def init_pygame(self) -> None:
-        """Initialize pygame, display, and fonts."""
-        pygame.init()
-        try:
-            self.screen = pygame.display.set_mode((self.width, self.height))
-            pygame.display.set_caption("2048 Game")
-            self.clock = pygame.time.Clock()
 
-            # Initialize fonts
-            self.title_font = pygame.font.SysFont(self.font_name, 60, bold=True)
-            self.subtitle_font = pygame.font.SysFont(self.font_name, 18)
-            self.instruction_font = pygame.font.SysFont(self.font_name, 16)
-            self.score_font = pygame.font.SysFont(self.font_name, 25, bold=True)
-            self.score_label_font = pygame.font.SysFont(self.font_name, 14, bold=True)
+# Bitboard engine
+#
+# A 4x4 board packs into a single 64-bit integer: the cell at (row, col) holds
+# its tile exponent (2 ** exponent, 0 for empty) in the nibble starting at bit
+# 4 * (4 * row + col). A 16-bit row therefore has its leftmost cell in the
+# lowest nibble, and every possible row fits in a 65,536-entry lookup table.
 
-            # Initialize tile fonts with different sizes based on number of digits
-            for value in [2, 4, 8, 16, 32, 64]:
-                self.tile_fonts[value] = pygame.font.SysFont(
-                    self.font_name, 45, bold=True
-                )
-            for value in [128, 256, 512]:
-                self.tile_fonts[value] = pygame.font.SysFont(
-                    self.font_name, 40, bold=True
-                )
-            for value in [1024, 2048]:
-                self.tile_fonts[value] = pygame.font.SysFont(
-                    self.font_name, 30, bold=True
-                )
+BITBOARD_SIZE = 4
+ROW_MASK = 0xFFFF
+MAX_EXPONENT = 0xF
 
-            # Initialize game with two starting tiles
-            self.game.add_random_tile()
-            self.game.add_random_tile()
+_row_left: List[int] = []
+_row_right: List[int] = []
+_row_score: List[int] = []
+_row_values: List[Tuple[int, ...]] = []
 
-        except Exception as e:
-            print(f"Error initializing pygame: {e}")
-            sys.exit(1)
 
-    def draw_tile(
-        self, x: int, y: int, value: int, row_idx: int, col_idx: int, current_time: int
-    ) -> None:
-        """Draw a single tile on the screen.
+def _slide_row_exponents(
+    cells: List[int], max_exponent: int = MAX_EXPONENT
+) -> Tuple[List[int], int]:
+    """Slide and merge a row of exponents towards index 0.
 
-        Args:
-            x: X coordinate
-            y: Y coordinate
-            value: Tile value
-            row_idx: Grid row index
-            col_idx: Grid column index
-            current_time: Current game time in milliseconds
-        """
-        # Calculate animation parameters
-        anim_duration = self.animation_duration
-        elapsed = current_time - self.game.animation_start_time
-        is_anim_tile = (self.game.new_tile_position == (row_idx, col_idx)) and (
-            elapsed < anim_duration
-        )
-        scale: float = 1.0
+    Args:
+        cells: Tile exponents of the row, 0 for empty
+        max_exponent: Exponent of the largest tile, which never merges
 
-        # Apply animation scaling if this is a new tile
-        if is_anim_tile:
-            progress = elapsed / anim_duration
-            scale = 0.1 + 0.9 * progress
-        elif self.game.new_tile_position == (row_idx, col_idx):
-            self.game.new_tile_position = None
-
-        # Draw tile background
-        color = self.config.tile_colors.get(value, self.config.tile_colors[2048])
-
-        if is_anim_tile and scale < 1.0:
-            # For animated tiles, draw them smaller with a growing animation
-            scaled_size = int(self.tile_size * scale)
-            offset = (self.tile_size - scaled_size) // 2
-            tile_surf = pygame.Surface((scaled_size, scaled_size), pygame.SRCALPHA)
-            tile_surf.fill(color)
-            self.screen.blit(tile_surf, (x + offset, y + offset))
+    Returns:
+        The merged exponents padded with zeros, and the score gained
+    """
+    tiles = [cell for cell in cells if cell != 0]
+    merged: List[int] = []
+    score = 0
+    idx = 0
+    while idx < len(tiles):
+        # Exponents cannot grow past their storage, so the largest tile never merges
+        if (
+            idx + 1 < len(tiles)
+            and tiles[idx] == tiles[idx + 1]
+            and tiles[idx] < max_exponent
+        ):
+            merged.append(tiles[idx] + 1)
+            score += 1 << (tiles[idx] + 1)
+            idx += 2
         else:
-            # Draw normal tile
-            tile_rect = pygame.Rect(x, y, self.tile_size, self.tile_size)
-            pygame.draw.rect(self.screen, color, tile_rect, border_radius=3)
+            merged.append(tiles[idx])
+            idx += 1
+    merged.extend([0] * (len(cells) - len(merged)))
+    return merged, score
 
-        # Draw tile value text if not empty
-        if value != 0:
-            font = self.tile_fonts.get(value, self.tile_fonts[2048])
-            text_color = self.config.text_colors.get(value, self.config.light_text)
-            text = font.render(str(value), True, text_color)
 
-            # Scale text if this is an animated tile
-            if is_anim_tile and scale < 1.0:
-                text = pygame.transform.scale(
-                    text,
-                    (int(text.get_width() * scale), int(text.get_height() * scale)),
-                )
+def _pack_row(cells: List[int]) -> int:
+    """Pack four exponents into a 16-bit row."""
+    return sum(cell << (4 * idx) for idx, cell in enumerate(cells))
 
-            # Position text in the center of the tile
-            text_x = x + (self.tile_size - text.get_width()) // 2
-            text_y = y + (self.tile_size - text.get_height()) // 2
-            self.screen.blit(text, (text_x, text_y))
 
-    def draw(self) -> None:
-        """Draw the complete game screen."""
-        # Fill background
-        self.screen.fill(self.config.background_color)
+def _unpack_row(row: int) -> List[int]:
+    """Unpack a 16-bit row into four exponents."""
+    return [(row >> (4 * idx)) & MAX_EXPONENT for idx in range(BITBOARD_SIZE)]
 
-        # Draw title
-        title_text = self.title_font.render("2048", True, self.config.text_color)
-        self.screen.blit(
-            title_text, (self.width // 2 - title_text.get_width() // 2, self.title_y)
-        )
 
-        # Draw subtitle
-        subtitle_text = self.subtitle_font.render(
-            "Join the tiles, get to 2048!", True, self.config.text_color
-        )
-        self.screen.blit(
-            subtitle_text,
-            (self.width // 2 - subtitle_text.get_width() // 2, self.subtitle_y),
-        )
+def build_row_tables() -> None:
+    """Build the left/right move, score and tile value tables for every row.
 
-        # Draw score box
-        pygame.draw.rect(
-            self.screen,
-            self.config.grid_color,
-            (self.width // 2 - 70, 115, 140, 60),
-            border_radius=5,
-        )
+    The tables are module-level and built only once, on first use.
+    """
+    if _row_left:
+        return
+    left = [0] * (ROW_MASK + 1)
+    right = [0] * (ROW_MASK + 1)
+    scores = [0] * (ROW_MASK + 1)
+    values = [()] * (ROW_MASK + 1)
+    for row in range(ROW_MASK + 1):
+        cells = _unpack_row(row)
+        values[row] = tuple(1 << cell if cell else 0 for cell in cells)
+        merged, score = _slide_row_exponents(cells)
+        left[row] = _pack_row(merged)
+        scores[row] = score
+        merged, _ = _slide_row_exponents(cells[::-1])
+        right[row] = _pack_row(merged[::-1])
+    _row_left.extend(left)
+    _row_right.extend(right)
+    _row_score.extend(scores)
+    _row_values.extend(values)
 
-        # Draw score label
-        score_label_text = self.score_label_font.render("SCORE", True, (255, 255, 255))
-        self.screen.blit(
-            score_label_text, (self.width // 2 - score_label_text.get_width() // 2, 123)
-        )
 
-        # Draw score
-        score_text = self.score_font.render(str(self.game.score), True, (255, 255, 255))
-        self.screen.blit(
-            score_text, (self.width // 2 - score_text.get_width() // 2, 143)
-        )
+def transpose_bits(bits: int) -> int:
+    """Transpose a packed 4x4 board so rows become columns.
 
-        # Draw main grid background
-        grid_rect = pygame.Rect(
-            (self.width - self.grid_width) // 2,
-            self.grid_top_y,
-            self.grid_width,
-            self.grid_height,
-        )
-        pygame.draw.rect(
-            self.screen, self.config.grid_color, grid_rect, border_radius=6
-        )
+    Args:
+        bits: Packed board
 
-        # Get current time for animations
-        current_time = pygame.time.get_ticks()
+    Returns:
+        The packed transposed board
+    """
+    a1 = bits & 0xF0F00F0FF0F00F0F
+    a2 = bits & 0x0000F0F00000F0F0
+    a3 = bits & 0x0F0F00000F0F0000
+    a = a1 | (a2 << 12) | (a3 >> 12)
+    b1 = a & 0xFF00FF0000FF00FF
+    b2 = a & 0x00FF00FF00000000
+    b3 = a & 0x00000000FF00FF00
+    return b1 | (b2 >> 24) | (b3 << 24)
 
-        # Calculate bottom position for instructions
-        grid_bottom = self.grid_top_y + self.grid_height + 20
 
-        # Draw each tile
-        for row_idx in range(self.game.grid_size):
-            for col_idx in range(self.game.grid_size):
-                value = self.game.board[row_idx][col_idx]
-                x = (
-                    (self.width - self.grid_width) // 2
-                    + self.grid_padding * (col_idx + 1)
-                    + self.tile_size * col_idx
-                )
-                y = (
-                    self.grid_top_y
-                    + self.grid_padding * (row_idx + 1)
-                    + self.tile_size * row_idx
-                )
-                self.draw_tile(x, y, value, row_idx, col_idx, current_time)
+def _apply_row_table(bits: int, table: List[int]) -> Tuple[int, int]:
+    """Apply a row move table to all four rows of a packed board.
 
-        # Draw instructions
-        instruction_text1 = self.instruction_font.render(
-            "HOW TO PLAY: Use your arrow keys to move the tiles.",
-            True,
-            self.config.text_color,
-        )
-        instruction_text2 = self.instruction_font.render(
-            "When two tiles with the same number touch, they merge into one!",
-            True,
-            self.config.text_color,
-        )
-        self.screen.blit(
-            instruction_text1,
-            (self.width // 2 - instruction_text1.get_width() // 2, grid_bottom),
-        )
-        self.screen.blit(
-            instruction_text2,
-            (self.width // 2 - instruction_text2.get_width() // 2, grid_bottom + 25),
-        )
+    Args:
+        bits: Packed board
+        table: Row move table to apply
 
-        # Draw footer line
-        pygame.draw.line(
-            self.screen,
-            (200, 200, 200),
-            (0, self.height - 10),
-            (self.width, self.height - 10),
-            1,
-        )
+    Returns:
+        The packed board after the move and the score gained
+    """
+    # Unrolled over the four rows; this is the engine's hot path
+    row0 = bits & ROW_MASK
+    row1 = (bits >> 16) & ROW_MASK
+    row2 = (bits >> 32) & ROW_MASK
+    row3 = bits >> 48
+    result = (
+        table[row0] | (table[row1] << 16) | (table[row2] << 32) | (table[row3] << 48)
+    )
+    score = _row_score[row0] + _row_score[row1] + _row_score[row2] + _row_score[row3]
+    return result, score
 
-        # Draw game over overlay if needed
-        if self.game.game_over:
-            overlay = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
-            overlay.fill((255, 255, 255, 150))
-            self.screen.blit(overlay, (0, 0))
 
-            game_over_text = self.title_font.render(
-                "Game Over!", True, self.config.text_color
-            )
-            final_score_text = self.subtitle_font.render(
-                f"Final Score: {self.game.score}", True, self.config.text_color
-            )
-            restart_text = self.subtitle_font.render(
-                "Press 'R' to restart", True, self.config.text_color
-            )
+class BitboardGame(Game):
+    """4x4 game engine backed by a packed 64-bit board and row lookup tables.
 
-            self.screen.blit(
-                game_over_text,
-                (
-                    self.width // 2 - game_over_text.get_width() // 2,
-                    self.height // 2 - 50,
-                ),
-            )
-            self.screen.blit(
-                final_score_text,
-                (
-                    self.width // 2 - final_score_text.get_width() // 2,
-                    self.height // 2 + 10,
-                ),
-            )
-            self.screen.blit(
-                restart_text,
-                (
-                    self.width // 2 - restart_text.get_width() // 2,
-                    self.height // 2 + 40,
-                ),
+    Plays exactly like Game, move for move, for every tile up to 32768.
+    """
+
+    def __init__(self, config: GameConfig, seed: Optional[int] = None) -> None:
+        """Initialize a new bitboard game.
+
+        Args:
+            config: Game configuration parameters
+            seed: Seed for the tile spawns, or None to seed from the
+                operating system
+
+        Raises:
+            ValueError: If the grid is not 4x4
+        """
+        if config.grid_size != BITBOARD_SIZE:
+            raise ValueError(
+                f"The bitboard engine only supports a "
+                f"{BITBOARD_SIZE}x{BITBOARD_SIZE} grid"
             )
+        build_row_tables()
+        self.bits: int = 0
+        super().__init__(config, seed)
 
-    def handle_pygame_event(self, event: pygame.event.Event) -> Action:
-        """Convert a pygame event to a game action.
+    @property
+    def board(self) -> List[List[int]]:
+        """The board unpacked into rows of tile values."""
+        bits = self.bits
+        return [
+            list(_row_values[(bits >> shift) & ROW_MASK]) for shift in (0, 16, 32, 48)
+        ]
+
+    @board.setter
+    def board(self, rows: List[List[int]]) -> None:
+        self.bits = 0
+        for row_idx, row in enumerate(rows):
+            for col_idx, value in enumerate(row):
+                self.set_tile(row_idx, col_idx, value)
+
+    def set_tile(self, row_idx: int, col_idx: int, value: int) -> None:
+        """Place a tile value on the packed board.
 
         Args:
-            event: Pygame event to process
+            row_idx: Grid row index
+            col_idx: Grid column index
+            value: Tile value to place
+        """
+        shift = 4 * (BITBOARD_SIZE * row_idx + col_idx)
+        exponent = value.bit_length() - 1 if value else 0
+        self.bits = (self.bits & ~(MAX_EXPONENT << shift)) | (exponent << shift)
+
+    def clone(self) -> "BitboardGame":
+        """Return an independent copy of the game for trying out moves.
 
         Returns:
-            Corresponding game action
+            Copy of the game
         """
-        if event.type == pygame.KEYDOWN:
-            key_to_action = {
-                pygame.K_LEFT: Action.LEFT,
-                pygame.K_RIGHT: Action.RIGHT,
-                pygame.K_UP: Action.UP,
-                pygame.K_DOWN: Action.DOWN,
-                pygame.K_r: Action.RESTART,
-            }
-            return key_to_action.get(event.key, Action.NONE)
-        return Action.NONE
+        other = copy.copy(self)
+        other.rng = copy.copy(self.rng)
+        other.history = None
+        other.move_counts = self.move_counts.copy()
+        other.empty_list = self.empty_list.copy()
+        other.empty_index = self.empty_index.copy()
+        other.pair_flags = self.pair_flags.copy()
+        return other
 
-    def run(self) -> None:
-        """Run the main game loop."""
-        self.init_pygame()
-        running = True
+    def _move(self, table: List[int], transposed: bool) -> List[Tuple[int, int]]:
+        """Apply a row table move to the board and update the score.
 
-        while running:
-            current_time = pygame.time.get_ticks()
+        Args:
+            table: Row move table to apply
+            transposed: Whether to apply the move to columns instead of rows
 
-            # Process events
-            for event in pygame.event.get():
-                if event.type == pygame.QUIT:
-                    running = False
+        Returns:
+            Cells whose value changed, empty if none did
+        """
+        bits = transpose_bits(self.bits) if transposed else self.bits
+        result, score = _apply_row_table(bits, table)
+        if result == bits:
+            return []
+        self.bits = transpose_bits(result) if transposed else result
+        self.score += score
 
-                # Handle input with debouncing
-                if event.type == pygame.KEYDOWN:
-                    if current_time - self.last_action_time < self.debounce_time:
-                        continue
+        # Walk the changed nibbles in the same order as Game's moves
+        changed = []
+        diff = bits ^ result
+        for row_idx in range(BITBOARD_SIZE):
+            row_diff = (diff >> (16 * row_idx)) & ROW_MASK
+            if row_diff:
+                changed.extend(
+                    [
+                        (col_idx, row_idx) if transposed else (row_idx, col_idx)
+                        for col_idx in range(BITBOARD_SIZE)
+                        if (row_diff >> (4 * col_idx)) & MAX_EXPONENT
+                    ]
+                )
+        return changed
 
-                    action = self.handle_pygame_event(event)
-                    moved = self.game.handle_action(action)
+    def move_left(self) -> List[Tuple[int, int]]:
+        """Move tiles to the left and merge them.
 
-                    if moved:
-                        self.game.animation_start_time = current_time
-                        self.last_action_time = current_time
+        Returns:
+            Cells whose value changed, empty if none did
+        """
+        return self._move(_row_left, transposed=False)
 
-            # Update display
-            self.draw()
-            pygame.display.flip()
-            self.clock.tick(self.fps)
+    def move_right(self) -> List[Tuple[int, int]]:
+        """Move tiles to the right and merge them.
 
-        # Clean up
-        pygame.quit()
-        sys.exit()
+        Returns:
+            Cells whose value changed, empty if none did
+        """
+        return self._move(_row_right, transposed=False)
 
+    def move_up(self) -> List[Tuple[int, int]]:
+        """Move tiles up and merge them.
+
+        Returns:
+            Cells whose value changed, empty if none did
+        """
+        return self._move(_row_left, transposed=True)
+
+    def move_down(self) -> List[Tuple[int, int]]:
+        """Move tiles down and merge them.
+
+        Returns:
+            Cells whose value changed, empty if none did
+        """
+        return self._move(_row_right, transposed=True)
+
+    def transpose(self) -> None:
+        """Transpose the board matrix."""
+        self.bits = transpose_bits(self.bits)
+
+
+# Compact engine
+#
+# CompactGame stores a session in a handful of slots: the board is a bytearray
+# of exponents in row-major order, empty cells are found on demand, and tile
+# spawns come from a counter-based generator (SplitMix64 of the seed and the
+# spawn count) instead of a random.Random, whose state alone is 2.5 KB. A
+# game therefore snapshots to a fixed-size byte string. Because the spawn
+# generator differs, a seed plays out differently than on the other engines;
+# replay files record the engine, and games are replayed on it.
+
+MASK64 = (1 << 64) - 1
+COMPACT_MAX_EXPONENT = 0xFF
+# Seed, spawn count, score, game over flag and the move count in each
+# direction, followed by the cells
+COMPACT_HEADER = struct.Struct("<QIQ?4I")
+
+
+def splitmix64(value: int) -> int:
+    """Scramble a 64-bit integer with the SplitMix64 finalizer."""
+    value = (value + 0x9E3779B97F4A7C15) & MASK64
+    value = ((value ^ (value >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    value = ((value ^ (value >> 27)) * 0x94D049BB133111EB) & MASK64
+    return value ^ (value >> 31)
 
-def load_config(config_path: Optional[str] = None) -> GameConfig:
-    """Load game configuration from a file or use defaults.
+
+@functools.lru_cache(maxsize=65536)
+def _slide_packed_line(line: bytes) -> Tuple[bytes, int]:
+    """Slide a line of exponents towards index 0, cached by line.
 
     Args:
-        config_path: Path to YAML config file, or None to use defaults
+        line: Exponents of the line, 0 for empty
 
     Returns:
-        Game configuration object
+        The merged line and the score gained
     """
-    if config_path:
-        try:
-            with open(config_path, "r") as f:
-                data = yaml.safe_load(f)
-            return GameConfig(**data)
-        except Exception as e:
-            print(f"Error loading config file {config_path}: {e}")
-            print("Using default configuration instead.")
+    merged, score = _slide_row_exponents(list(line), COMPACT_MAX_EXPONENT)
+    return bytes(merged), score
 
-    return GameConfig()
 
+@functools.lru_cache(maxsize=64)
+def _compact_lines(grid_size: int, action: Action) -> Tuple[slice, ...]:
+    """Slices of a row-major board for each line, ordered in the move direction.
 
-@click.command()
-@click.option(
-    "--grid-size",
-    "-g",
-    default=4,
-    help="Size of the game grid (e.g. 4 for 4x4)",
-    type=int,
-)
-@click.option(
-    "--tile-size", "-t", default=100, help="Size of each tile in pixels", type=int
-)
-@click.option("--fps", "-f", default=60, help="Frames per second", type=int)
-@click.option(
-    "--config",
-    "-c",
-    "config_path",
-    type=click.Path(exists=True),
-    help="Path to config YAML file",
-)
-def main(grid_size: int, tile_size: int, fps: int, config_path: Optional[str]) -> None:
-    """2048 Game - Join the tiles, get to 2048!
+    Args:
+        grid_size: Size of the grid
+        action: Move direction
 
-    Use arrow keys to move tiles, 'R' to restart.
+    Returns:
+        One slice per row or column, starting at the cell the tiles move to
     """
-    # Load configuration
-    cfg = load_config(config_path)
+    size = grid_size
+    total = size * size
+    if action == Action.LEFT:
+        return tuple(slice(start, start + size) for start in range(0, total, size))
+    if action == Action.RIGHT:
+        return tuple(
+            slice(start + size - 1, start - 1 if start else None, -1)
+            for start in range(0, total, size)
+        )
+    if action == Action.UP:
+        return tuple(slice(col, total, size) for col in range(size))
+    return tuple(
+        slice(total - size + col, col - 1 if col else None, -size)
+        for col in range(size)
+    )
 
-    # Override config fields with command-line options
-    cfg = cfg.model_copy(
-        update={"grid_size": grid_size, "tile_size": tile_size, "fps": fps}
+
+class CompactGame:
+    """A 2048 game with the same interface as Game, using far less memory."""
+
+    __slots__ = (
+        "grid_size",
+        "cells",
+        "score",
+        "game_over",
+        "seed",
+        "spawns",
+        "move_counts",
+        "new_tile_position",
+        "animation_start_time",
     )
 
-    # Start the game
-    game = Game(cfg)
-    renderer = Renderer(game, cfg)
-    renderer.run()
+    def __init__(self, config: GameConfig, seed: Optional[int] = None) -> None:
+        """Initialize an empty game.
+
+        Args:
+            config: Game configuration parameters
+            seed: Seed of the first game, or None for a random one
+
+        Raises:
+            ValueError: If the grid is larger than MAX_GRID_SIZE
+        """
+        check_grid_size(config)
+        self.grid_size: int = config.grid_size
+        self.cells = bytearray(config.grid_size * config.grid_size)
+        self.score: int = 0
+        self.game_over: bool = False
+        self.seed: int = random.getrandbits(64) if seed is None else seed
+        self.spawns: int = 0
+        self.move_counts: List[int] = [0] * len(MOVE_ACTIONS)
+        self.new_tile_position: Optional[Tuple[int, int]] = None
+        self.animation_start_time: int = 0
+
+    @property
+    def board(self) -> List[List[int]]:
+        """The board unpacked into rows of tile values."""
+        return unpack_board(bytes(self.cells), self.grid_size)
+
+    @board.setter
+    def board(self, rows: List[List[int]]) -> None:
+        self.cells[:] = pack_board(rows)
+
+    @property
+    def empty_cells(self) -> Set[Tuple[int, int]]:
+        """Positions of the empty cells."""
+        return {
+            divmod(cell, self.grid_size)
+            for cell, exponent in enumerate(self.cells)
+            if not exponent
+        }
+
+    def update_empty_cells(self) -> None:
+        """Nothing to update: empty cells are derived from the board."""
+
+    def set_tile(self, row_idx: int, col_idx: int, value: int) -> None:
+        """Place a tile value on the board.
+
+        Args:
+            row_idx: Grid row index
+            col_idx: Grid column index
+            value: Tile value, 0 for empty
+        """
+        exponent = value.bit_length() - 1 if value else 0
+        self.cells[row_idx * self.grid_size + col_idx] = exponent
+
+    def add_random_tile(self) -> Optional[Tuple[int, int]]:
+        """Add a random tile (2 or 4) to an empty cell.
+
+        Returns:
+            The position of the new tile, or None if no empty cells
+        """
+        empty = [cell for cell, exponent in enumerate(self.cells) if not exponent]
+        if not empty:
+            return None
+        bits = splitmix64((self.seed + self.spawns * 0x9E3779B97F4A7C15) & MASK64)
+        self.spawns += 1
+        # High 32 bits pick the cell, low 32 bits pick a 4 one time in ten
+        cell = empty[((bits >> 32) * len(empty)) >> 32]
+        self.cells[cell] = 2 if (bits & 0xFFFFFFFF) < 0x1999999A else 1
+        self.new_tile_position = divmod(cell, self.grid_size)
+        return self.new_tile_position
+
+    def move(self, action: Action) -> List[Tuple[int, int]]:
+        """Slide the tiles in a direction without spawning a new tile.
+
+        Args:
+            action: One of the move actions
+
+        Returns:
+            Cells whose value changed, empty if none did
+        """
+        before = bytes(self.cells)
+        cells = self.cells
+        for line in _compact_lines(self.grid_size, action):
+            merged, gained = _slide_packed_line(bytes(cells[line]))
+            cells[line] = merged
+            self.score += gained
+        return [
+            divmod(cell, self.grid_size)
+            for cell, exponent in enumerate(before)
+            if exponent != cells[cell]
+        ]
+
+    def move_left(self) -> List[Tuple[int, int]]:
+        """Move tiles left and return the cells that changed."""
+        return self.move(Action.LEFT)
+
+    def move_right(self) -> List[Tuple[int, int]]:
+        """Move tiles right and return the cells that changed."""
+        return self.move(Action.RIGHT)
+
+    def move_up(self) -> List[Tuple[int, int]]:
+        """Move tiles up and return the cells that changed."""
+        return self.move(Action.UP)
+
+    def move_down(self) -> List[Tuple[int, int]]:
+        """Move tiles down and return the cells that changed."""
+        return self.move(Action.DOWN)
+
+    def is_game_over(self) -> bool:
+        """Check if the game is over (no more valid moves).
+
+        Returns:
+            True if game is over, False if moves are still possible
+        """
+        cells = self.cells
+        if 0 in cells:
+            return False
+        size = self.grid_size
+        for idx, exponent in enumerate(cells):
+            col = idx % size
+            if col < size - 1 and exponent == cells[idx + 1]:
+                return False
+            if idx + size < len(cells) and exponent == cells[idx + size]:
+                return False
+        return True
+
+    def board_state(self) -> Board:
+        """The board as an immutable tuple of rows, for all_moves and the AIs."""
+        return tuple(map(tuple, self.board))
+
+    def legal_actions(self) -> List[Action]:
+        """Moves that would change the board, in MOVE_ACTIONS order."""
+        return legal_actions(self.board_state())
+
+    def clone(self) -> "CompactGame":
+        """Return an independent copy of the game for trying out moves.
+
+        Returns:
+            Copy of the game
+        """
+        other = copy.copy(self)
+        other.cells = self.cells.copy()
+        other.move_counts = self.move_counts.copy()
+        return other
+
+    def handle_action(self, action: Action) -> bool:
+        """Process a game action and return whether the board changed.
+
+        Args:
+            action: The action to perform
+
+        Returns:
+            True if the board changed, False otherwise
+        """
+        if action == Action.RESTART:
+            self.restart()
+            return True
+        if action not in MOVE_ACTIONS:
+            return False
+        changed = self.move(action)
+        if changed:
+            self.move_counts[MOVE_INDEX[action]] += 1
+            self.add_random_tile()
+            if self.is_game_over():
+                self.game_over = True
+        return bool(changed)
+
+    def restart(self, seed: Optional[int] = None) -> None:
+        """Reset the game to its initial state.
+
+        Args:
+            seed: Seed for this game's tile spawns, or None to derive one
+                from the previous game's seed
+        """
+        self.seed = splitmix64(self.seed ^ self.spawns) if seed is None else seed
+        self.spawns = 0
+        self.move_counts = [0] * len(MOVE_ACTIONS)
+        self.cells[:] = bytes(len(self.cells))
+        self.score = 0
+        self.game_over = False
+        self.new_tile_position = None
+        self.add_random_tile()
+        self.add_random_tile()
+
+    def snapshot(self) -> bytes:
+        """Pack the whole game state into a fixed-size byte string.
+
+        Returns:
+            COMPACT_HEADER followed by the cells; the same length for every
+            game on the same grid
+        """
+        header = COMPACT_HEADER.pack(
+            self.seed, self.spawns, self.score, self.game_over, *self.move_counts
+        )
+        return header + self.cells
+
+    def restore(self, data: bytes) -> None:
+        """Restore the game state from a snapshot.
+
+        Args:
+            data: Snapshot taken on a grid of the same size
+
+        Raises:
+            ValueError: If the snapshot is for a different grid size
+        """
+        if len(data) != COMPACT_HEADER.size + len(self.cells):
+            raise ValueError(
+                f"Snapshot of {len(data)} bytes does not fit a "
+                f"{self.grid_size}x{self.grid_size} grid"
+            )
+        fields = COMPACT_HEADER.unpack_from(data)
+        self.seed, self.spawns, self.score, self.game_over = fields[:4]
+        self.move_counts = list(fields[4:])
+        self.cells[:] = data[COMPACT_HEADER.size :]
+        self.new_tile_position = None
+
+
+# Large-grid engine
+#
+# NumpyGame keeps the board in one (size, size) array and moves it with the
+# merge_rows kernel shared with BatchGame, so a move is a fixed number of
+# array operations instead of a Python loop over every cell. Vertical moves
+# run the kernel on a transposed view and write back through it. New tiles
+# land on a randomly drawn cell that is retried while occupied, so a spawn
+# only scans the board once it is nearly full. Because spawns are drawn this
+# way rather than from Game's empty cell list, a seed plays out differently
+# than on the list and bitboard engines; replay files record the engine, and
+# games are replayed on it.
+
+# Random cells drawn before falling back to listing the empty ones
+SPAWN_ATTEMPTS = 16
+
+
+class NumpyGame:
+    """A 2048 game for large grids with the same interface as Game."""
+
+    def __init__(self, config: GameConfig, seed: Optional[int] = None) -> None:
+        """Initialize an empty game.
+
+        Args:
+            config: Game configuration parameters
+            seed: Seed for the tile spawns of the games that follow, or None
+                to seed from the operating system
+        """
+        self.grid_size = config.grid_size
+        self.rng = random.Random(seed)
+        self.seed: int = 0
+        self.move_counts: List[int] = [0] * len(MOVE_ACTIONS)
+        self.cells = np.zeros((config.grid_size, config.grid_size), np.int64)
+        self.empty_count: int = self.cells.size
+        self.score: int = 0
+        self.game_over: bool = False
+        self.new_tile_position: Optional[Tuple[int, int]] = None
+        self.animation_start_time: int = 0
+
+    @property
+    def board(self) -> List[List[int]]:
+        """The board as rows of tile values."""
+        return self.cells.tolist()
+
+    @board.setter
+    def board(self, rows: List[List[int]]) -> None:
+        self.cells[...] = rows
+        self.update_empty_cells()
+
+    @property
+    def empty_cells(self) -> Set[Tuple[int, int]]:
+        """Positions of the empty cells."""
+        return set(map(tuple, np.argwhere(self.cells == 0).tolist()))
+
+    def update_empty_cells(self) -> None:
+        """Recount the empty cells after the board was changed directly."""
+        self.empty_count = self.cells.size - int(np.count_nonzero(self.cells))
+
+    def set_tile(self, row_idx: int, col_idx: int, value: int) -> None:
+        """Place a tile value on the board.
+
+        Args:
+            row_idx: Grid row index
+            col_idx: Grid column index
+            value: Tile value, 0 for empty
+        """
+        self.empty_count += bool(self.cells[row_idx, col_idx]) - bool(value)
+        self.cells[row_idx, col_idx] = value
+
+    def add_random_tile(self) -> Optional[Tuple[int, int]]:
+        """Add a random tile (2 or 4) to an empty cell.
+
+        Cells are drawn differently than on Game, so the same seed deals
+        different tiles.
+
+        Returns:
+            The position of the new tile, or None if no empty cells
+        """
+        if not self.empty_count:
+            return None
+        flat = self.cells.reshape(-1)
+        for _ in range(SPAWN_ATTEMPTS):
+            cell = self.rng.randrange(flat.size)
+            if not flat[cell]:
+                break
+        else:
+            cell = int(self.rng.choice(np.flatnonzero(flat == 0)))
+        row_idx, col_idx = divmod(cell, self.grid_size)
+        self.set_tile(row_idx, col_idx, 2 if self.rng.random() < 0.9 else 4)
+        self.new_tile_position = (row_idx, col_idx)
+        return self.new_tile_position
+
+    def slide(self, action: Action) -> Tuple[np.ndarray, int]:
+        """Compute a move without applying it.
+
+        Args:
+            action: One of the move actions
+
+        Returns:
+            The board after the move and the score it gains
+        """
+        result = np.empty_like(self.cells)
+        target = _oriented(result[None], action)[0]
+        merged, gains = merge_rows(_oriented(self.cells[None], action)[0])
+        target[...] = merged
+        return result, int(gains.sum())
+
+    def move(self, action: Action) -> List[Tuple[int, int]]:
+        """Slide the tiles in a direction without spawning a new tile.
+
+        Args:
+            action: One of the move actions
+
+        Returns:
+            Cells whose value changed, empty if none did
+        """
+        result, gained = self.slide(action)
+        changed = np.argwhere(result != self.cells)
+        if len(changed):
+            self.cells = result
+            self.score += gained
+            self.update_empty_cells()
+        return list(map(tuple, changed.tolist()))
+
+    def move_left(self) -> List[Tuple[int, int]]:
+        """Move tiles left and return the cells that changed."""
+        return self.move(Action.LEFT)
+
+    def move_right(self) -> List[Tuple[int, int]]:
+        """Move tiles right and return the cells that changed."""
+        return self.move(Action.RIGHT)
+
+    def move_up(self) -> List[Tuple[int, int]]:
+        """Move tiles up and return the cells that changed."""
+        return self.move(Action.UP)
+
+    def move_down(self) -> List[Tuple[int, int]]:
+        """Move tiles down and return the cells that changed."""
+        return self.move(Action.DOWN)
+
+    def is_game_over(self) -> bool:
+        """Check if the game is over (no more valid moves).
+
+        Returns:
+            True if game is over, False if moves are still possible
+        """
+        if self.empty_count:
+            return False
+        return bool(boards_game_over(self.cells[None])[0])
+
+    def board_state(self) -> Board:
+        """The board as an immutable tuple of rows, for all_moves and the AIs."""
+        return tuple(map(tuple, self.cells.tolist()))
+
+    def legal_actions(self) -> List[Action]:
+        """Moves that would change the board, in MOVE_ACTIONS order."""
+        return [
+            action
+            for action in MOVE_ACTIONS
+            if not np.array_equal(self.slide(action)[0], self.cells)
+        ]
+
+    def clone(self) -> "NumpyGame":
+        """Return an independent copy of the game for trying out moves.
+
+        Returns:
+            Copy of the game
+        """
+        other = copy.copy(self)
+        other.rng = copy.copy(self.rng)
+        other.cells = self.cells.copy()
+        other.move_counts = self.move_counts.copy()
+        return other
+
+    def handle_action(self, action: Action) -> bool:
+        """Process a game action and return whether the board changed.
+
+        Args:
+            action: The action to perform
+
+        Returns:
+            True if the board changed, False otherwise
+        """
+        if action == Action.RESTART:
+            self.restart()
+            return True
+        if action not in MOVE_ACTIONS:
+            return False
+        changed = self.move(action)
+        if changed:
+            self.move_counts[MOVE_INDEX[action]] += 1
+            self.add_random_tile()
+            if self.is_game_over():
+                self.game_over = True
+        return bool(changed)
+
+    def restart(self, seed: Optional[int] = None) -> None:
+        """Reset the game to its initial state.
+
+        Args:
+            seed: Seed for this game's tile spawns, or None to draw one from
+                the game's RNG
+        """
+        self.seed = seed if seed is not None else self.rng.getrandbits(64)
+        self.rng.seed(self.seed)
+        self.cells[...] = 0
+        self.empty_count = self.cells.size
+        self.score = 0
+        self.game_over = False
+        self.new_tile_position = None
+        self.move_counts = [0] * len(MOVE_ACTIONS)
+        self.add_random_tile()
+        self.add_random_tile()
+
+
+GAME_ENGINES: Dict[str, type] = {
+    "list": Game,
+    "bitboard": BitboardGame,
+    "compact": CompactGame,
+    "numpy": NumpyGame,
+}
+
+
+def create_game(config: GameConfig, seed: Optional[int] = None) -> Game:
+    """Create a game using the engine selected in the configuration.
+
+    Args:
+        config: Game configuration parameters
+        seed: Seed for the game's tile spawns, or None for a random one
+
+    Returns:
+        New game instance
+    """
+    return GAME_ENGINES[config.engine](config, seed)
+
+
+# Batched engine
+#
+# BatchGame keeps N boards in one (N, size, size) array and applies a vector
+# of actions with whole-array operations. Every direction is reduced to a
+# left move on a strided view of the boards, so one merge kernel serves all.
+
+
+def _oriented(boards: np.ndarray, action: Action) -> np.ndarray:
+    """View a stack of boards so that the given move slides towards column 0.
+
+    Args:
+        boards: Boards of shape (N, size, size)
+        action: Move direction
+
+    Returns:
+        A view of the boards in which the move becomes a left move
+    """
+    if action == Action.LEFT:
+        return boards
+    if action == Action.RIGHT:
+        return boards[:, :, ::-1]
+    if action == Action.UP:
+        return boards.transpose(0, 2, 1)
+    return boards.transpose(0, 2, 1)[:, :, ::-1]
+
+
+def _compact_rows(rows: np.ndarray) -> np.ndarray:
+    """Slide the non-zero values of each row to its start, keeping their order."""
+    order = np.argsort(rows == 0, axis=1, kind="stable")
+    return np.take_along_axis(rows, order, axis=1)
+
+
+def merge_rows(rows: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Merge many rows to the left at once, following Game.merge_row.
+
+    Args:
+        rows: Rows of shape (M, size)
+
+    Returns:
+        The merged rows and the score gained by each row
+    """
+    rows = _compact_rows(rows)
+    left, right = rows[:, :-1], rows[:, 1:]
+    same = (left == right) & (left != 0)
+    # A run of k equal tiles merges pairwise from its start, so a pair merges
+    # when it is an even number of pairs into its run of equal pairs
+    positions = np.arange(rows.shape[1] - 1)
+    run_start = np.maximum.accumulate(np.where(same, 0, positions + 1), axis=1)
+    merged = same & ((positions - run_start) % 2 == 0)
+    gains = np.where(merged, left * 2, 0).sum(axis=1, dtype=rows.dtype)
+    # Merged pairs never overlap, so doubling and clearing cannot collide
+    left[merged] *= 2
+    right[merged] = 0
+    return _compact_rows(rows), gains
+
+
+def slide_boards(
+    boards: np.ndarray, action: Action
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Apply the same move to a stack of boards without mutating them.
+
+    Args:
+        boards: Boards of shape (N, size, size)
+        action: Move direction
+
+    Returns:
+        The new boards, the score gained by each board and a moved mask
+    """
+    count, size = boards.shape[0], boards.shape[1]
+    merged, gains = merge_rows(_oriented(boards, action).reshape(-1, size))
+    result = np.empty_like(boards)
+    _oriented(result, action)[...] = merged.reshape(count, size, size)
+    moved = (result != boards).any(axis=(1, 2))
+    return result, gains.reshape(count, size).sum(axis=1), moved
+
+
+def boards_game_over(boards: np.ndarray) -> np.ndarray:
+    """Check which boards have no valid moves left, following Game.is_game_over.
+
+    Args:
+        boards: Boards of shape (N, size, size)
+
+    Returns:
+        Boolean mask of finished boards
+    """
+    playable = (
+        (boards == 0).any(axis=(1, 2))
+        | (boards[:, :, 1:] == boards[:, :, :-1]).any(axis=(1, 2))
+        | (boards[:, 1:, :] == boards[:, :-1, :]).any(axis=(1, 2))
+    )
+    return ~playable
+
+
+class BatchGame:
+    """Steps many independent 2048 games at once on a single NumPy array."""
+
+    def __init__(
+        self, config: GameConfig, num_games: int, seed: Optional[int] = None
+    ) -> None:
+        """Initialize a batch of empty boards.
+
+        Args:
+            config: Game configuration parameters
+            num_games: Number of boards in the batch
+            seed: Seed for the batch random number generator
+        """
+        self.grid_size = config.grid_size
+        self.num_games = num_games
+        self.rng = np.random.default_rng(seed)
+        self.boards = np.zeros((num_games, self.grid_size, self.grid_size), np.int64)
+        self.scores = np.zeros(num_games, np.int64)
+        self.game_over = np.zeros(num_games, bool)
+
+    def _select(self, mask: Optional[np.ndarray]) -> np.ndarray:
+        """Turn an optional boolean mask into board indices."""
+        if mask is None:
+            return np.arange(self.num_games)
+        return np.flatnonzero(mask)
+
+    def add_random_tiles(self, mask: Optional[np.ndarray] = None) -> np.ndarray:
+        """Add a random tile (2 or 4) to an empty cell of each selected board.
+
+        Args:
+            mask: Boards to add a tile to, or None for all of them
+
+        Returns:
+            Flat cell index of each new tile, or -1 where no cell was empty
+        """
+        positions = np.full(self.num_games, -1, np.int64)
+        indices = self._select(mask)
+        if indices.size == 0:
+            return positions
+        cells = self.boards[indices].reshape(len(indices), -1)
+
+        # Pick a uniformly random empty cell per board: the largest random key
+        keys = self.rng.random(cells.shape)
+        keys[cells != 0] = -1.0
+        chosen = keys.argmax(axis=1)
+        has_empty = cells[np.arange(len(indices)), chosen] == 0
+        values = np.where(self.rng.random(len(indices)) < 0.9, 2, 4)
+
+        indices, chosen = indices[has_empty], chosen[has_empty]
+        rows, cols = np.divmod(chosen, self.grid_size)
+        self.boards[indices, rows, cols] = values[has_empty]
+        positions[indices] = chosen
+        return positions
+
+    def is_game_over(self) -> np.ndarray:
+        """Check which games have no more valid moves.
+
+        Returns:
+            Boolean mask of finished games
+        """
+        return boards_game_over(self.boards)
+
+    def step(self, actions: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """Apply one move per board, then spawn tiles and update game over flags.
+
+        Finished games are left untouched.
+
+        Args:
+            actions: Index into MOVE_ACTIONS for each board
+
+        Returns:
+            The score gained by each board and a mask of boards that changed
+        """
+        actions = np.asarray(actions)
+        gains = np.zeros(self.num_games, np.int64)
+        moved = np.zeros(self.num_games, bool)
+        active = ~self.game_over
+        for action_idx, action in enumerate(MOVE_ACTIONS):
+            indices = np.flatnonzero(active & (actions == action_idx))
+            if indices.size == 0:
+                continue
+            result, gained, changed = slide_boards(self.boards[indices], action)
+            self.boards[indices] = result
+            gains[indices] = gained
+            moved[indices] = changed
+
+        self.scores += gains
+        self.add_random_tiles(moved)
+        self.game_over[moved] = boards_game_over(self.boards[moved])
+        return gains, moved
+
+    def restart(self, mask: Optional[np.ndarray] = None) -> None:
+        """Reset the selected games to their initial state.
+
+        Args:
+            mask: Games to reset, or None for all of them
+        """
+        indices = self._select(mask)
+        self.boards[indices] = 0
+        self.scores[indices] = 0
+        self.game_over[indices] = False
+        reset = np.zeros(self.num_games, bool)
+        reset[indices] = True
+        self.add_random_tiles(reset)
+        self.add_random_tiles(reset)
+
+
+# Reinforcement learning environments
+#
+# Gym-style wrappers: actions are indices into MOVE_ACTIONS, observations are
+# tile exponents (0 for empty) and the reward is the score gained by the move.
+# Observations are views of buffers allocated once and overwritten on every
+# step, so copy them if they must outlive the next call.
+
+
+class GameEnv:
+    """A single game behind a reset/step interface."""
+
+    def __init__(self, config: GameConfig, seed: Optional[int] = None) -> None:
+        """Initialize the environment; call reset() before stepping.
+
+        Args:
+            config: Game configuration parameters
+            seed: Seed for the tile spawns of every episode
+        """
+        self.game = create_game(config, seed)
+        size = config.grid_size
+        self.observation = np.zeros((size, size), np.uint8)
+        self.mask = np.zeros(len(MOVE_ACTIONS), bool)
+
+    def _observe(self) -> np.ndarray:
+        """Write the board's exponents into the observation buffer."""
+        self.observation.reshape(-1)[:] = np.frombuffer(
+            pack_board(self.game.board), np.uint8
+        )
+        return self.observation
+
+    def reset(self, seed: Optional[int] = None) -> np.ndarray:
+        """Start a new episode.
+
+        Args:
+            seed: Seed for this episode, or None to draw one from the game
+
+        Returns:
+            The observation buffer
+        """
+        self.game.restart(seed)
+        return self._observe()
+
+    def step(self, action: int) -> Tuple[np.ndarray, int, bool, Dict[str, Any]]:
+        """Apply a move; a move that changes nothing leaves the game as it is.
+
+        Args:
+            action: Index into MOVE_ACTIONS
+
+        Returns:
+            The observation buffer, the score gained, whether the game is over
+            and an info dict with the total score and whether the board moved
+        """
+        score = self.game.score
+        moved = self.game.handle_action(MOVE_ACTIONS[action])
+        info = {"score": self.game.score, "moved": moved}
+        return self._observe(), self.game.score - score, self.game.game_over, info
+
+    def action_mask(self) -> np.ndarray:
+        """Which moves would change the board, in MOVE_ACTIONS order."""
+        self.mask[:] = [moved for _, _, moved in all_moves(self.game.board_state())]
+        return self.mask
+
+
+class VectorGameEnv:
+    """Steps many games at once on a BatchGame, resetting finished ones in place.
+
+    Every array returned is a preallocated buffer: observations of shape
+    (N, size, size), rewards, dones and action masks of shape (N, 4).
+    """
+
+    def __init__(
+        self, config: GameConfig, num_envs: int, seed: Optional[int] = None
+    ) -> None:
+        """Initialize the environments; call reset() before stepping.
+
+        Args:
+            config: Game configuration parameters
+            num_envs: Number of games stepped together
+            seed: Seed for the batch random number generator
+        """
+        self.batch = BatchGame(config, num_envs, seed)
+        self.num_envs = num_envs
+        shape = self.batch.boards.shape
+        self.observations = np.zeros(shape, np.uint8)
+        self.rewards = np.zeros(num_envs, np.int64)
+        self.dones = np.zeros(num_envs, bool)
+        self.final_scores = np.zeros(num_envs, np.int64)
+        self.masks = np.zeros((num_envs, len(MOVE_ACTIONS)), bool)
+        # Scratch buffers for turning tile values into exponents
+        self._mantissas = np.zeros(shape, np.float64)
+        self._exponents = np.zeros(shape, np.int32)
+
+    def _observe(self) -> np.ndarray:
+        """Write every board's exponents into the observation buffer."""
+        # Tiles are powers of two, so frexp gives exponent + 1 (and 0 for 0)
+        np.frexp(self.batch.boards, out=(self._mantissas, self._exponents))
+        np.subtract(self._exponents, 1, out=self._exponents)
+        np.maximum(self._exponents, 0, out=self._exponents)
+        self.observations[...] = self._exponents
+        return self.observations
+
+    def reset(self) -> np.ndarray:
+        """Start a new episode in every environment.
+
+        Returns:
+            The observation buffer
+        """
+        self.batch.restart()
+        self.dones[:] = False
+        return self._observe()
+
+    def step(
+        self, actions: np.ndarray
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray, Dict[str, np.ndarray]]:
+        """Apply one move per environment and reset the ones that finished.
+
+        Args:
+            actions: Index into MOVE_ACTIONS for each environment
+
+        Returns:
+            The observation buffer, the score gained, a mask of games that
+            ended on this step (their observations already show the next
+            episode) and an info dict holding the final score of each game
+            that ended
+        """
+        gains, _ = self.batch.step(actions)
+        self.rewards[:] = gains
+        np.copyto(self.dones, self.batch.game_over)
+        np.copyto(self.final_scores, self.batch.scores)
+        if self.dones.any():
+            self.batch.restart(self.dones)
+        return (
+            self._observe(),
+            self.rewards,
+            self.dones,
+            {"final_scores": self.final_scores},
+        )
+
+    def action_masks(self) -> np.ndarray:
+        """Which moves would change each board, in MOVE_ACTIONS order.
+
+        Returns:
+            Boolean mask buffer of shape (N, 4)
+        """
+        for action_idx, action in enumerate(MOVE_ACTIONS):
+            _, _, self.masks[:, action_idx] = slide_boards(self.batch.boards, action)
+        return self.masks
+
+
+# Expectimax auto-player
+#
+# The search works on immutable boards (tuples of rows) so positions can be
+# hashed into the transposition table directly. Like add_random_tile, chance
+# nodes spawn a 2 with probability 0.9 and a 4 with probability 0.1.
+
+Board = Tuple[Tuple[int, ...], ...]
+
+TILE_ODDS: Tuple[Tuple[int, float], ...] = ((2, 0.9), (4, 0.1))
+
+# Heuristic weights, tuned for exponents rather than tile values
+HEURISTIC_LOST_PENALTY = 200000.0
+HEURISTIC_MONOTONICITY_POWER = 4.0
+HEURISTIC_MONOTONICITY_WEIGHT = 47.0
+HEURISTIC_SUM_POWER = 3.5
+HEURISTIC_SUM_WEIGHT = 11.0
+HEURISTIC_MERGES_WEIGHT = 700.0
+HEURISTIC_EMPTY_WEIGHT = 270.0
+
+
+@functools.lru_cache(maxsize=65536)
+def slide_row(row: Tuple[int, ...]) -> Tuple[Tuple[int, ...], int]:
+    """Slide and merge an immutable row to the left, following Game.merge_row.
+
+    Args:
+        row: Tile values of the row
+
+    Returns:
+        The merged row and the score gained
+    """
+    tiles = [value for value in row if value != 0]
+    gained = 0
+    for i in range(len(tiles) - 1):
+        if tiles[i] == tiles[i + 1]:
+            tiles[i] *= 2
+            gained += tiles[i]
+            tiles[i + 1] = 0
+    tiles = [value for value in tiles if value != 0]
+    tiles.extend([0] * (len(row) - len(tiles)))
+    return tuple(tiles), gained
+
+
+def slide_board(board: Board, action: Action) -> Tuple[Board, int]:
+    """Apply a move to an immutable board.
+
+    Args:
+        board: Board to move
+        action: Move direction
+
+    Returns:
+        The board after the move and the score gained
+    """
+    if action in (Action.UP, Action.DOWN):
+        lines = tuple(zip(*board))
+    else:
+        lines = board
+    reverse = action in (Action.RIGHT, Action.DOWN)
+    moved_lines = []
+    gained = 0
+    for line in lines:
+        merged, line_gain = slide_row(line[::-1] if reverse else line)
+        moved_lines.append(merged[::-1] if reverse else merged)
+        gained += line_gain
+    if action in (Action.UP, Action.DOWN):
+        return tuple(zip(*moved_lines)), gained
+    return tuple(moved_lines), gained
+
+
+# Successor board, score gain and whether the board changed
+MoveResult = Tuple[Board, int, bool]
+
+
+@functools.lru_cache(maxsize=65536)
+def _slide_line(
+    line: Tuple[int, ...],
+) -> Tuple[Tuple[int, ...], int, bool, Tuple[int, ...], int, bool]:
+    """Slide a line both ways at once, for all_moves.
+
+    Args:
+        line: Tile values of a row or column
+
+    Returns:
+        The line slid towards index 0 with its gain and moved flag, then the
+        same for the line slid towards the far end
+    """
+    towards_start, start_gain = slide_row(line)
+    towards_end, end_gain = slide_row(line[::-1])
+    towards_end = towards_end[::-1]
+    return (
+        towards_start,
+        start_gain,
+        towards_start != line,
+        towards_end,
+        end_gain,
+        towards_end != line,
+    )
+
+
+def all_moves(
+    board: Board,
+) -> Tuple[MoveResult, MoveResult, MoveResult, MoveResult]:
+    """Apply every move to an immutable board in one pass.
+
+    Rows and columns are each slid both ways in a single cached lookup, and
+    the board is transposed once for both vertical moves.
+
+    Args:
+        board: Board to move
+
+    Returns:
+        The successor board, score gain and moved flag of each move, in
+        MOVE_ACTIONS order
+    """
+    left, left_gain, left_moved, right, right_gain, right_moved = zip(
+        *map(_slide_line, board)
+    )
+    up, up_gain, up_moved, down, down_gain, down_moved = zip(
+        *map(_slide_line, zip(*board))
+    )
+    return (
+        (tuple(zip(*up)), sum(up_gain), any(up_moved)),
+        (tuple(zip(*down)), sum(down_gain), any(down_moved)),
+        (left, sum(left_gain), any(left_moved)),
+        (right, sum(right_gain), any(right_moved)),
+    )
+
+
+def legal_actions(board: Board) -> List[Action]:
+    """Moves that change an immutable board; none means the game is over.
+
+    Args:
+        board: Board to check
+
+    Returns:
+        The moves that change the board, in MOVE_ACTIONS order
+    """
+    return [
+        action for action, (_, _, moved) in zip(MOVE_ACTIONS, all_moves(board)) if moved
+    ]
+
+
+@functools.lru_cache(maxsize=65536)
+def _line_heuristic(line: Tuple[int, ...]) -> float:
+    """Score a single row or column; higher is better."""
+    exponents = [value.bit_length() - 1 if value else 0 for value in line]
+    empty = exponents.count(0)
+    total = sum(exponent**HEURISTIC_SUM_POWER for exponent in exponents)
+
+    merges = 0
+    previous = 0
+    counter = 0
+    for exponent in exponents:
+        if exponent == 0:
+            continue
+        if previous == exponent:
+            counter += 1
+        elif counter > 0:
+            merges += 1 + counter
+            counter = 0
+        previous = exponent
+    if counter > 0:
+        merges += 1 + counter
+
+    monotonicity_left = 0.0
+    monotonicity_right = 0.0
+    for current, following in zip(exponents, exponents[1:]):
+        if current > following:
+            monotonicity_left += (
+                current**HEURISTIC_MONOTONICITY_POWER
+                - following**HEURISTIC_MONOTONICITY_POWER
+            )
+        else:
+            monotonicity_right += (
+                following**HEURISTIC_MONOTONICITY_POWER
+                - current**HEURISTIC_MONOTONICITY_POWER
+            )
+
+    return (
+        HEURISTIC_LOST_PENALTY / (2 * len(line))
+        + HEURISTIC_EMPTY_WEIGHT * empty
+        + HEURISTIC_MERGES_WEIGHT * merges
+        - HEURISTIC_MONOTONICITY_WEIGHT * min(monotonicity_left, monotonicity_right)
+        - HEURISTIC_SUM_WEIGHT * total
+    )
+
+
+def evaluate_board(board: Board) -> float:
+    """Heuristic value of a board from the rows and columns it is made of.
+
+    Args:
+        board: Board to evaluate
+
+    Returns:
+        Heuristic value; higher is better
+    """
+    return sum(map(_line_heuristic, board)) + sum(
+        _line_heuristic(column) for column in zip(*board)
+    )
+
+
+class _SearchTimeout(Exception):
+    """Raised inside the search when the move's time budget runs out."""
+
+
+class ExpectimaxPlayer:
+    """Chooses moves with expectimax search under a per-move time budget.
+
+    The search deepens one level at a time and returns the best move of the
+    deepest fully searched level, so move latency stays close to the budget.
+    """
+
+    def __init__(
+        self,
+        time_budget_ms: int = 50,
+        max_depth: int = 6,
+        prob_cutoff: float = 1e-4,
+        table_size: int = 1_000_000,
+    ) -> None:
+        """Initialize the player.
+
+        Args:
+            time_budget_ms: Time allowed per move in milliseconds
+            max_depth: Deepest number of spawns to search
+            prob_cutoff: Positions less likely than this are scored heuristically
+            table_size: Entries kept in the transposition table before clearing
+        """
+        self.time_budget_ms = time_budget_ms
+        self.max_depth = max_depth
+        self.prob_cutoff = prob_cutoff
+        self.table_size = table_size
+        # Chance node values keyed by board, with the depth and the path
+        # probability they were searched with
+        self.table: Dict[Board, Tuple[int, float, float]] = {}
+        self.deadline = 0.0
+        self.cancelled: Optional[Callable[[], bool]] = None
+        self.last_depth = 0
+
+    def choose_action(self, game: Game) -> Action:
+        """Pick a move for the current state of a game.
+
+        Args:
+            game: Game to pick a move for, left unchanged
+
+        Returns:
+            The chosen move, or Action.NONE if no move changes the board
+        """
+        return self.choose_board_action(game.board_state())
+
+    def choose_board_action(
+        self, board: Board, cancelled: Optional[Callable[[], bool]] = None
+    ) -> Action:
+        """Pick a move for a board.
+
+        Args:
+            board: Board to pick a move for
+            cancelled: Called during the search; once it returns True the
+                search ends as if the time budget had run out
+
+        Returns:
+            The chosen move, or Action.NONE if no move changes the board
+        """
+        self.deadline = time.perf_counter() + self.time_budget_ms / 1000
+        self.cancelled = cancelled
+        if len(self.table) > self.table_size:
+            self.table.clear()
+
+        successors = [
+            (action, successor)
+            for action, (successor, _, moved) in zip(MOVE_ACTIONS, all_moves(board))
+            if moved
+        ]
+        if not successors:
+            return Action.NONE
+
+        # Used as is if not even one level fits in the time budget
+        best_action = max(successors, key=lambda item: evaluate_board(item[1]))[0]
+        self.last_depth = 0
+        for depth in range(1, self.max_depth + 1):
+            try:
+                values = [
+                    (self._chance_value(successor, depth, 1.0), action)
+                    for action, successor in successors
+                ]
+            except _SearchTimeout:
+                break
+            best_action = max(values, key=lambda item: item[0])[1]
+            self.last_depth = depth
+        return best_action
+
+    def _max_value(self, board: Board, depth: int, prob: float) -> float:
+        """Value of a position where the player moves next."""
+        if time.perf_counter() > self.deadline or (
+            self.cancelled is not None and self.cancelled()
+        ):
+            raise _SearchTimeout
+        best = 0.0
+        for successor, _, moved in all_moves(board):
+            if moved:
+                best = max(best, self._chance_value(successor, depth, prob))
+        return best
+
+    def _chance_value(self, board: Board, depth: int, prob: float) -> float:
+        """Value of a position where a random tile spawns next."""
+        if depth == 0 or prob < self.prob_cutoff:
+            return evaluate_board(board)
+
+        # A value searched with a higher path probability was pruned less by
+        # prob_cutoff, so it is at least as accurate as searching again here
+        entry = self.table.get(board)
+        if entry is not None and entry[0] >= depth and entry[1] >= prob:
+            return entry[2]
+
+        empty_cells = [
+            (row_idx, col_idx)
+            for row_idx, row in enumerate(board)
+            for col_idx, value in enumerate(row)
+            if value == 0
+        ]
+        cell_prob = prob / len(empty_cells)
+        total = 0.0
+        for row_idx, col_idx in empty_cells:
+            row = board[row_idx]
+            for tile, tile_prob in TILE_ODDS:
+                spawned = (
+                    board[:row_idx]
+                    + (row[:col_idx] + (tile,) + row[col_idx + 1 :],)
+                    + board[row_idx + 1 :]
+                )
+                total += tile_prob * self._max_value(
+                    spawned, depth - 1, cell_prob * tile_prob
+                )
+        value = total / len(empty_cells)
+
+        self.table[board] = (depth, prob, value)
+        return value
+
+    def close(self) -> None:
+        """Release the transposition table."""
+        self.table.clear()
+
+
+# Move hints
+#
+# HintWorker searches in a child process, so the search neither blocks the
+# frame loop nor competes with it for the GIL. Every request is tagged with a
+# generation number, which the parent also writes to a shared counter on
+# each new request or cancel(); the child checks the counter at every search
+# node and abandons a search as soon as it is outdated, and the parent drops
+# any result that does not belong to the newest request.
+
+
+def hint_search_loop(
+    connection: multiprocessing.connection.Connection,
+    generation: ctypes.c_longlong,
+    time_budget_ms: int,
+) -> None:
+    """Answer hint requests from a HintWorker until it sends None.
+
+    Args:
+        connection: Pipe end receiving (generation, board) requests and
+            sending back (generation, move) results
+        generation: Shared generation of the newest request
+        time_budget_ms: Search time per hint in milliseconds
+    """
+    player = ExpectimaxPlayer(time_budget_ms=time_budget_ms)
+    while True:
+        request = connection.recv()
+        if request is None:
+            break
+        request_generation, board = request
+
+        def outdated() -> bool:
+            return generation.value != request_generation
+
+        if outdated():
+            continue
+        action = player.choose_board_action(board, outdated)
+        if not outdated():
+            connection.send((request_generation, action))
+
+
+class HintWorker:
+    """Suggests moves for boards from a background process."""
+
+    def __init__(self, time_budget_ms: int = 500) -> None:
+        """Initialize the worker; the process starts with the first request.
+
+        Args:
+            time_budget_ms: Search time per hint in milliseconds
+        """
+        self.time_budget_ms = time_budget_ms
+        self.process: Optional[multiprocessing.Process] = None
+        self.connection: Optional[multiprocessing.connection.Connection] = None
+        self.shared_generation: Optional[ctypes.c_longlong] = None
+        self.generation = 0
+        self.result: Optional[Action] = None
+
+    def request(self, board: Board) -> None:
+        """Start a search for a board, cancelling any earlier one.
+
+        Args:
+            board: Board to suggest a move for
+        """
+        if self.process is None:
+            import multiprocessing
+
+            self.connection, child_connection = multiprocessing.Pipe()
+            # Only the parent writes it, so it needs no lock
+            self.shared_generation = multiprocessing.Value("q", 0, lock=False)
+            self.process = multiprocessing.Process(
+                target=hint_search_loop,
+                args=(child_connection, self.shared_generation, self.time_budget_ms),
+                name="move-hints",
+                daemon=True,
+            )
+            self.process.start()
+            child_connection.close()
+        self.cancel()
+        self.connection.send((self.generation, board))
+
+    def cancel(self) -> None:
+        """Stop the current search and drop its result."""
+        self.generation += 1
+        self.result = None
+        if self.shared_generation is not None:
+            self.shared_generation.value = self.generation
+
+    def poll(self) -> Optional[Action]:
+        """The suggested move for the newest request, if its search is done.
+
+        Never blocks.
+
+        Returns:
+            The move, Action.NONE if no move changes the board, or None while
+            the search runs or after it was cancelled
+        """
+        while self.connection is not None and self.connection.poll():
+            generation, action = self.connection.recv()
+            if generation == self.generation:
+                self.result = action
+        return self.result
+
+    def close(self) -> None:
+        """Cancel the current search and stop the process."""
+        self.cancel()
+        if self.process is not None:
+            self.connection.send(None)
+            self.process.join()
+            self.connection.close()
+            self.process = None
+            self.connection = None
+            self.shared_generation = None
+
+
+# Headless simulation
+#
+# Policies pick a move for a Game and never touch the renderer, so whole games
+# can be played in worker processes.
+
+Policy = Callable[[Game, random.Random], Action]
+
+
+def random_policy(game: Game, rng: random.Random) -> Action:
+    """Pick a uniformly random move."""
+    return rng.choice(MOVE_ACTIONS)
+
+
+def greedy_policy(game: Game, rng: random.Random) -> Action:
+    """Pick the move with the largest immediate score gain, breaking ties randomly."""
+    best_actions: List[Action] = []
+    best_gain = -1
+    for action, (_, gain, moved) in zip(MOVE_ACTIONS, all_moves(game.board_state())):
+        if not moved or gain < best_gain:
+            continue
+        if gain > best_gain:
+            best_actions, best_gain = [], gain
+        best_actions.append(action)
+    return rng.choice(best_actions) if best_actions else random_policy(game, rng)
+
+
+def corner_policy(game: Game, rng: random.Random) -> Action:
+    """Keep the largest tiles in the bottom-left corner."""
+    legal = game.legal_actions()
+    for action in (Action.DOWN, Action.LEFT, Action.RIGHT, Action.UP):
+        if action in legal:
+            return action
+    return Action.UP
+
+
+@functools.lru_cache(maxsize=1)
+def _expectimax_player(time_budget_ms: int) -> ExpectimaxPlayer:
+    """Expectimax player shared by every game played in this process."""
+    return ExpectimaxPlayer(time_budget_ms=time_budget_ms)
+
+
+def expectimax_policy(
+    game: Game, rng: random.Random, time_budget_ms: Optional[int] = None
+) -> Action:
+    """Pick the move found by the expectimax search.
+
+    Args:
+        game: Game to pick a move for
+        rng: Random number generator for the fallback when no move helps
+        time_budget_ms: Search time per move, or None for the default of
+            GameConfig.ai_time_budget_ms
+
+    Returns:
+        The chosen move
+    """
+    if time_budget_ms is None:
+        time_budget_ms = GameConfig().ai_time_budget_ms
+    action = _expectimax_player(time_budget_ms).choose_action(game)
+    return action if action != Action.NONE else random_policy(game, rng)
+
+
+POLICIES: Dict[str, Policy] = {
+    "random": random_policy,
+    "greedy": greedy_policy,
+    "corner": corner_policy,
+    "expectimax": expectimax_policy,
+}
+
+
+def play_game(
+    game: Game,
+    policy: Policy,
+    rng: random.Random,
+    actions: Optional[List[Action]] = None,
+) -> int:
+    """Play a game from its current state until it is over.
+
+    Args:
+        game: Game to play, already holding its starting tiles
+        policy: Policy choosing each move
+        rng: Random number generator for the policy
+        actions: List to append each move that changed the board to
+
+    Returns:
+        Number of moves that changed the board
+    """
+    moves = 0
+    while not game.game_over:
+        action = policy(game, rng)
+        if game.handle_action(action):
+            moves += 1
+            if actions is not None:
+                actions.append(action)
+    return moves
+
+
+class QuantileSketch:
+    """Mergeable quantile sketch in the style of a merging t-digest.
+
+    Values are buffered and periodically folded into weighted centroids.
+    Centroids near the tails are kept small, so extreme quantiles stay
+    accurate while memory stays bounded by the compression.
+    """
+
+    def __init__(self, compression: float = 200.0) -> None:
+        """Initialize an empty sketch.
+
+        Args:
+            compression: Roughly the number of centroids kept; higher is
+                more accurate
+        """
+        self.compression = compression
+        self.centroids: List[Tuple[float, float]] = []
+        self.buffer: List[Tuple[float, float]] = []
+        self.count = 0.0
+
+    def add(self, value: float, weight: float = 1.0) -> None:
+        """Add a value to the sketch."""
+        self.buffer.append((value, weight))
+        self.count += weight
+        if len(self.buffer) >= 5 * self.compression:
+            self._compress()
+
+    def merge(self, other: QuantileSketch) -> None:
+        """Fold another sketch into this one."""
+        self.buffer.extend(other.centroids)
+        self.buffer.extend(other.buffer)
+        self.count += other.count
+        self._compress()
+
+    def _scale(self, q: float) -> float:
+        """The t-digest k1 scale function."""
+        return self.compression / (2 * math.pi) * math.asin(2 * q - 1)
+
+    def _compress(self) -> None:
+        """Merge the buffer into the centroids."""
+        if not self.buffer:
+            return
+        points = sorted(self.centroids + self.buffer)
+        self.buffer = []
+        merged: List[Tuple[float, float]] = []
+        mean, weight = points[0]
+        seen = 0.0
+        limit = self._scale(0.0) + 1
+        for value, value_weight in points[1:]:
+            q = (seen + weight + value_weight) / self.count
+            if self._scale(min(q, 1.0)) <= limit:
+                weight += value_weight
+                mean += (value - mean) * value_weight / weight
+            else:
+                merged.append((mean, weight))
+                seen += weight
+                limit = self._scale(seen / self.count) + 1
+                mean, weight = value, value_weight
+        merged.append((mean, weight))
+        self.centroids = merged
+
+    def quantile(self, q: float) -> float:
+        """Estimate a quantile by interpolating between centroids.
+
+        Args:
+            q: Quantile between 0 and 1
+
+        Returns:
+            The estimated value, or 0 if the sketch is empty
+        """
+        self._compress()
+        if not self.centroids:
+            return 0.0
+        target = q * self.count
+        seen = 0.0
+        previous_mean, previous_mid = self.centroids[0][0], 0.0
+        for mean, weight in self.centroids:
+            mid = seen + weight / 2
+            if target <= mid:
+                if mid == previous_mid:
+                    return mean
+                fraction = (target - previous_mid) / (mid - previous_mid)
+                return previous_mean + fraction * (mean - previous_mean)
+            previous_mean, previous_mid = mean, mid
+            seen += weight
+        return self.centroids[-1][0]
+
+
+def _merge_moments(
+    count: int,
+    mean: float,
+    m2: float,
+    other_count: int,
+    other_mean: float,
+    other_m2: float,
+) -> Tuple[float, float]:
+    """Combine the Welford mean and squared-deviation sum of two samples.
+
+    Uses the parallel update of Chan et al.
+
+    Returns:
+        The mean and sum of squared deviations of the combined sample
+    """
+    total = count + other_count
+    delta = other_mean - mean
+    return (
+        mean + delta * other_count / total,
+        m2 + other_m2 + delta * delta * count * other_count / total,
+    )
+
+
+class GameStats:
+    """Bounded-memory summary of a stream of finished games.
+
+    Keeps running means and variances (Welford), a score quantile sketch,
+    the max tile histogram and per-direction move totals. Summaries built in
+    separate workers combine with merge().
+    """
+
+    def __init__(self) -> None:
+        """Initialize an empty summary."""
+        self.games = 0
+        self.score_mean = 0.0
+        self.score_m2 = 0.0
+        self.moves_mean = 0.0
+        self.moves_m2 = 0.0
+        self.min_score: Optional[int] = None
+        self.max_score: Optional[int] = None
+        self.total_moves = 0
+        self.scores = QuantileSketch()
+        self.max_tiles: Counter[int] = Counter()
+        self.direction_moves = [0] * len(MOVE_ACTIONS)
+
+    def add(
+        self, score: int, max_tile: int, moves: int, direction_moves: Sequence[int]
+    ) -> None:
+        """Add one finished game.
+
+        Args:
+            score: Final score
+            max_tile: Largest tile on the final board
+            moves: Number of moves that changed the board
+            direction_moves: Those moves per direction, in MOVE_ACTIONS order
+        """
+        self.games += 1
+        delta = score - self.score_mean
+        self.score_mean += delta / self.games
+        self.score_m2 += delta * (score - self.score_mean)
+        delta = moves - self.moves_mean
+        self.moves_mean += delta / self.games
+        self.moves_m2 += delta * (moves - self.moves_mean)
+        self.min_score = score if self.min_score is None else min(self.min_score, score)
+        self.max_score = score if self.max_score is None else max(self.max_score, score)
+        self.total_moves += moves
+        self.scores.add(score)
+        self.max_tiles[max_tile] += 1
+        for idx, count in enumerate(direction_moves):
+            self.direction_moves[idx] += count
+
+    def add_game(self, game: Game) -> None:
+        """Add a finished game from its final state."""
+        self.add(
+            game.score,
+            max(max(row) for row in game.board),
+            sum(game.move_counts),
+            game.move_counts,
+        )
+
+    def merge(self, other: GameStats) -> None:
+        """Fold another summary into this one."""
+        if not other.games:
+            return
+        self.score_mean, self.score_m2 = _merge_moments(
+            self.games,
+            self.score_mean,
+            self.score_m2,
+            other.games,
+            other.score_mean,
+            other.score_m2,
+        )
+        self.moves_mean, self.moves_m2 = _merge_moments(
+            self.games,
+            self.moves_mean,
+            self.moves_m2,
+            other.games,
+            other.moves_mean,
+            other.moves_m2,
+        )
+        if self.games:
+            self.min_score = min(self.min_score, other.min_score)
+            self.max_score = max(self.max_score, other.max_score)
+        else:
+            self.min_score, self.max_score = other.min_score, other.max_score
+        self.games += other.games
+        self.total_moves += other.total_moves
+        self.scores.merge(other.scores)
+        self.max_tiles.update(other.max_tiles)
+        for idx, count in enumerate(other.direction_moves):
+            self.direction_moves[idx] += count
+
+    @property
+    def score_stdev(self) -> float:
+        """Sample standard deviation of the scores."""
+        return math.sqrt(self.score_m2 / (self.games - 1)) if self.games > 1 else 0.0
+
+    def reach_rates(self) -> Dict[int, float]:
+        """Share of games whose largest tile reached each tile milestone.
+
+        Returns:
+            Fraction of games per tile value, from 2 up to the largest tile seen
+        """
+        if not self.games:
+            return {}
+        rates = {}
+        reached = self.games
+        for exponent in range(1, max(self.max_tiles).bit_length()):
+            tile = 1 << exponent
+            rates[tile] = reached / self.games
+            reached -= self.max_tiles.get(tile, 0)
+        return rates
+
+
+def simulate_games(
+    config: GameConfig,
+    policy_name: str,
+    first_game: int,
+    num_games: int,
+    seed: int,
+    record: bool = False,
+    history: bool = False,
+) -> Tuple[GameStats, List[bytes], List[GameRecord]]:
+    """Play a batch of games; runs inside a worker process.
+
+    Every game is seeded from the base seed and its index, so results do not
+    depend on how games are split between workers.
+
+    Args:
+        config: Game configuration parameters
+        policy_name: Key into POLICIES
+        first_game: Index of the first game in the batch
+        num_games: Number of games to play
+        seed: Base seed for the random number generators
+        record: Whether to encode a replay of every game
+        history: Whether to summarize every game for the game history
+
+    Returns:
+        Summary of the games, the encoded replays if recording and the game
+        records if keeping history
+    """
+    policy = POLICIES[policy_name]
+    if policy is expectimax_policy:
+        policy = functools.partial(
+            expectimax_policy, time_budget_ms=config.ai_time_budget_ms
+        )
+    game = create_game(config)
+    stats = GameStats()
+    replays = []
+    records = []
+    fingerprint = config_hash(config) if history else ""
+    for game_idx in range(first_game, first_game + num_games):
+        rng = random.Random(f"{seed}:{game_idx}:policy")
+        game.restart(random.Random(f"{seed}:{game_idx}").getrandbits(64))
+        actions: Optional[List[Action]] = [] if record else None
+        play_game(game, policy, rng, actions)
+        stats.add_game(game)
+        if actions is not None:
+            replays.append(
+                encode_replay(
+                    game.seed, game.grid_size, game.score, actions, config.engine
+                )
+            )
+        if history:
+            records.append(GameRecord.from_game(game, fingerprint))
+    return stats, replays, records
+
+
+def run_simulation(
+    config: GameConfig,
+    policy_name: str,
+    num_games: int,
+    workers: int,
+    seed: int,
+    replay_path: Optional[str] = None,
+    history_path: Optional[str] = None,
+) -> GameStats:
+    """Play games spread across a process pool.
+
+    Games are split into more batches than workers to balance the load.
+
+    Args:
+        config: Game configuration parameters
+        policy_name: Key into POLICIES
+        num_games: Total number of games to play
+        workers: Number of worker processes
+        seed: Base seed for the games
+        replay_path: File to append a replay of every game to, in game order
+        history_path: SQLite database to record every game in; only this
+            process writes to it
+
+    Returns:
+        Summary of all the games
+    """
+    from concurrent.futures import ProcessPoolExecutor
+
+    num_batches = min(num_games, workers * 4)
+    stats = GameStats()
+    writer = ReplayWriter(replay_path) if replay_path else None
+    history = GameHistory(history_path) if history_path else None
+    with contextlib.ExitStack() as stack:
+        if writer is not None:
+            stack.enter_context(writer)
+        if history is not None:
+            stack.enter_context(history)
+        executor = stack.enter_context(ProcessPoolExecutor(max_workers=workers))
+        futures = []
+        first_game = 0
+        for batch_idx in range(num_batches):
+            size = num_games // num_batches + (batch_idx < num_games % num_batches)
+            futures.append(
+                executor.submit(
+                    simulate_games,
+                    config,
+                    policy_name,
+                    first_game,
+                    size,
+                    seed,
+                    writer is not None,
+                    history is not None,
+                )
+            )
+            first_game += size
+        for future in futures:
+            batch_stats, replays, records = future.result()
+            stats.merge(batch_stats)
+            if writer is not None:
+                for replay in replays:
+                    writer.write(replay)
+            if history is not None:
+                for record in records:
+                    history.record(record)
+    return stats
+
+
+def format_simulation_report(stats: GameStats, elapsed: float) -> str:
+    """Summarize simulation results as human-readable text.
+
+    Args:
+        stats: Summary of the games played
+        elapsed: Wall-clock time taken in seconds
+
+    Returns:
+        Multi-line report
+    """
+    quantiles = stats.scores.quantile
+    total_moves = max(stats.total_moves, 1)
+    directions = "  ".join(
+        f"{action.name.lower()} {100 * count / total_moves:.1f}%"
+        for action, count in zip(MOVE_ACTIONS, stats.direction_moves)
+    )
+    lines = [
+        f"Games: {stats.games} in {elapsed:.2f}s",
+        f"  games/sec: {stats.games / elapsed:,.1f}",
+        f"  moves/sec: {stats.total_moves / elapsed:,.1f}",
+        f"  moves/game: {stats.moves_mean:,.1f}  ({directions})",
+        "Score:",
+        f"  min {stats.min_score}  mean {stats.score_mean:,.1f}"
+        f"  stdev {stats.score_stdev:,.1f}  max {stats.max_score}",
+        f"  p50 {quantiles(0.50):,.0f}  p90 {quantiles(0.90):,.0f}"
+        f"  p99 {quantiles(0.99):,.0f}",
+        "Max tile:        games   reached",
+    ]
+    reach_rates = stats.reach_rates()
+    smallest = min(stats.max_tiles, default=0)
+    for tile in sorted(reach_rates):
+        if tile < smallest:
+            continue
+        count = stats.max_tiles.get(tile, 0)
+        lines.append(f"  {tile:>6}: {count:>8}  {100 * reach_rates[tile]:6.1f}%")
+    return "\n".join(lines)
+
+
+# Replays
+#
+# A replay file is REPLAY_MAGIC followed by one record per game: a fixed
+# header (seed, final score, move count, grid size, engine id) and then the
+# moves that changed the board, packed four to a byte as 2-bit indices into
+# MOVE_ACTIONS with the first move in the lowest bits. Tile spawns come from
+# the game's seeded RNG, so the seed and the moves are enough to rebuild
+# every position on the engine that played it; engines may draw spawns
+# differently, so a seed is only replayed on its own engine.
+
+REPLAY_MAGIC = b"2048RPL2"
+REPLAY_HEADER = struct.Struct("<QQIBB")
+# Engine names by the id stored in replay headers; only ever append to it
+REPLAY_ENGINES: Tuple[str, ...] = ("list", "bitboard", "compact", "numpy")
+
+# The four moves packed into each possible byte
+_BYTE_ACTIONS: List[Tuple[Action, ...]] = [
+    tuple(MOVE_ACTIONS[(byte >> shift) & 3] for shift in (0, 2, 4, 6))
+    for byte in range(256)
+]
+
+
+def encode_actions(actions: Sequence[Action]) -> bytes:
+    """Pack moves four to a byte, 2 bits each.
+
+    Args:
+        actions: Move actions, each one of MOVE_ACTIONS
+
+    Returns:
+        The packed moves, padded with zero bits to a whole byte
+    """
+    codes = [MOVE_INDEX[action] for action in actions]
+    codes.extend([0] * (-len(codes) % 4))
+    quads = [iter(codes)] * 4
+    return bytes(a | b << 2 | c << 4 | d << 6 for a, b, c, d in zip(*quads))
+
+
+def decode_actions(data: bytes, num_moves: int) -> List[Action]:
+    """Unpack moves packed with encode_actions.
+
+    Args:
+        data: Packed moves
+        num_moves: Number of moves packed, to drop the padding
+
+    Returns:
+        The move actions
+    """
+    actions = list(itertools.chain.from_iterable(map(_BYTE_ACTIONS.__getitem__, data)))
+    del actions[num_moves:]
+    return actions
+
+
+def encode_replay(
+    seed: int, grid_size: int, score: int, actions: Sequence[Action], engine: str
+) -> bytes:
+    """Encode one game as a replay record.
+
+    Args:
+        seed: Seed the game was restarted with
+        grid_size: Size of the grid
+        score: Final score, kept so replays can be scanned without replaying
+        actions: Moves that changed the board, in order
+        engine: Name of the engine that played the game, in REPLAY_ENGINES
+
+    Returns:
+        The record, ready to append after REPLAY_MAGIC
+    """
+    header = REPLAY_HEADER.pack(
+        seed, score, len(actions), grid_size, REPLAY_ENGINES.index(engine)
+    )
+    return header + encode_actions(actions)
+
+
+@dataclasses.dataclass(frozen=True)
+class Replay:
+    """One recorded game; the moves stay packed until asked for."""
+
+    seed: int
+    score: int
+    num_moves: int
+    grid_size: int
+    engine: str
+    moves: bytes
+
+    def actions(self) -> List[Action]:
+        """The recorded moves, in order."""
+        return decode_actions(self.moves, self.num_moves)
+
+
+class ReplayWriter:
+    """Appends replay records to a file as games finish."""
+
+    def __init__(self, path: str) -> None:
+        """Open a replay file for appending, writing the magic if it is new.
+
+        Args:
+            path: File to append to
+        """
+        self.file: BinaryIO = open(path, "ab")
+        if self.file.tell() == 0:
+            self.file.write(REPLAY_MAGIC)
+        self.count = 0
+
+    def write(self, record: bytes) -> None:
+        """Append a record made with encode_replay."""
+        self.file.write(record)
+        self.count += 1
+
+    def write_game(self, game: Game, actions: Sequence[Action], engine: str) -> None:
+        """Append a finished game.
+
+        Args:
+            game: Game played from its last restart
+            actions: Moves that changed the board since that restart
+            engine: Name of the engine the game was played on, as in
+                GameConfig.engine
+        """
+        self.write(
+            encode_replay(game.seed, game.grid_size, game.score, actions, engine)
+        )
+
+    def close(self) -> None:
+        """Flush and close the file."""
+        self.file.close()
+
+    def __enter__(self) -> "ReplayWriter":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def read_replays(path: str) -> Iterator[Replay]:
+    """Stream the replays of a file without reading it into memory.
+
+    The file is memory-mapped, so only the pages holding the records being
+    read are loaded.
+
+    Args:
+        path: Replay file written by ReplayWriter
+
+    Yields:
+        Each replay, in file order
+
+    Raises:
+        ValueError: If the file is not a replay file, is truncated or names
+            an unknown engine
+    """
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            raise ValueError(f"{path} is not a replay file")
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as data:
+            if data[: len(REPLAY_MAGIC)] != REPLAY_MAGIC:
+                raise ValueError(f"{path} is not a replay file")
+            offset = len(REPLAY_MAGIC)
+            end = len(data)
+            while offset < end:
+                if offset + REPLAY_HEADER.size > end:
+                    raise ValueError(f"{path} is truncated")
+                seed, score, num_moves, grid_size, engine_id = (
+                    REPLAY_HEADER.unpack_from(data, offset)
+                )
+                if engine_id >= len(REPLAY_ENGINES):
+                    raise ValueError(f"{path} has a game with engine id {engine_id}")
+                offset += REPLAY_HEADER.size
+                moves_end = offset + (num_moves + 3) // 4
+                if moves_end > end:
+                    raise ValueError(f"{path} is truncated")
+                yield Replay(
+                    seed,
+                    score,
+                    num_moves,
+                    grid_size,
+                    REPLAY_ENGINES[engine_id],
+                    data[offset:moves_end],
+                )
+                offset = moves_end
+
+
+def replay_game(
+    replay: Replay,
+    config: GameConfig,
+    num_moves: Optional[int] = None,
+    engine: Optional[str] = None,
+) -> Game:
+    """Rebuild a recorded position by replaying its moves through the game.
+
+    Args:
+        replay: Recorded game
+        config: Game configuration; the grid size and engine are taken from
+            the replay
+        num_moves: Number of moves to replay, or None for the whole game
+        engine: Engine the caller asked for, or None for the recorded one
+
+    Returns:
+        The game after the moves
+
+    Raises:
+        ValueError: If engine differs from the recorded engine, or a recorded
+            move does not change the board
+    """
+    if engine is not None and engine != replay.engine:
+        raise ValueError(
+            f"Game was recorded with the {replay.engine} engine, not {engine}"
+        )
+    game = create_game(
+        config.model_copy(
+            update={"grid_size": replay.grid_size, "engine": replay.engine}
+        )
+    )
+    game.restart(replay.seed)
+    actions = replay.actions()
+    for idx, action in enumerate(actions[:num_moves]):
+        if not game.handle_action(action):
+            raise ValueError(f"Move {idx} ({action.name}) does not change the board")
+    return game
+
+
+# Game history
+#
+# Finished games are stored in a SQLite database in WAL mode. record() only
+# queues the row; a background thread owns the writing connection and inserts
+# queued rows in batches, one transaction per batch, so neither the frame
+# loop nor a simulation waits on the disk. Queries open their own
+# connections, which WAL lets read while the writer is busy.
+
+HISTORY_SCHEMA = """
+CREATE TABLE IF NOT EXISTS games (
+    id INTEGER PRIMARY KEY,
+    finished_at REAL NOT NULL,
+    day TEXT NOT NULL,
+    grid_size INTEGER NOT NULL,
+    score INTEGER NOT NULL,
+    max_tile INTEGER NOT NULL,
+    moves INTEGER NOT NULL,
+    config_hash TEXT NOT NULL
+);
+-- Top scores per grid size are read straight off this index
+CREATE INDEX IF NOT EXISTS games_top ON games (grid_size, score DESC);
+-- Covers the daily aggregates, so they never touch the table itself
+CREATE INDEX IF NOT EXISTS games_daily
+    ON games (grid_size, day, score, max_tile, moves);
+"""
+HISTORY_INSERT = (
+    "INSERT INTO games (finished_at, day, grid_size, score, max_tile, moves,"
+    " config_hash) VALUES (?, ?, ?, ?, ?, ?, ?)"
+)
+HISTORY_BATCH_SIZE = 1000
+# Longest a queued game waits for its batch to fill before it is written
+HISTORY_FLUSH_SECONDS = 1.0
+
+
+def config_hash(config: GameConfig) -> str:
+    """Short fingerprint of a configuration, to tell apart games played under it.
+
+    Args:
+        config: Game configuration parameters
+
+    Returns:
+        16 hex digits of a SHA-256 over every setting
+    """
+    import hashlib
+
+    settings = json.dumps(dataclasses.asdict(config), sort_keys=True)
+    return hashlib.sha256(settings.encode()).hexdigest()[:16]
+
+
+@dataclasses.dataclass(frozen=True)
+class GameRecord:
+    """Summary of one finished game, as stored in the history."""
+
+    score: int
+    max_tile: int
+    moves: int
+    grid_size: int
+    config_hash: str
+    finished_at: float
+
+    @classmethod
+    def from_game(cls, game: Game, config_hash: str) -> "GameRecord":
+        """Summarize a game that just finished.
+
+        Args:
+            game: The finished game
+            config_hash: Fingerprint of the configuration it was played with
+
+        Returns:
+            The record, timestamped now
+        """
+        return cls(
+            score=game.score,
+            max_tile=max(map(max, game.board)),
+            moves=sum(game.move_counts),
+            grid_size=game.grid_size,
+            config_hash=config_hash,
+            finished_at=time.time(),
+        )
+
+
+class GameHistory:
+    """SQLite store of finished games with a batching background writer."""
+
+    def __init__(
+        self,
+        path: str,
+        batch_size: int = HISTORY_BATCH_SIZE,
+        flush_seconds: float = HISTORY_FLUSH_SECONDS,
+    ) -> None:
+        """Open the store, creating the database and its indexes if needed.
+
+        The writer thread starts with the first record.
+
+        Args:
+            path: SQLite database file
+            batch_size: Most games inserted in one transaction
+            flush_seconds: Longest a game waits for its batch to fill
+        """
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.queue: Optional[queue.Queue[Optional[GameRecord]]] = None
+        self.writer: Optional[threading.Thread] = None
+        self.error: Optional[sqlite3.Error] = None
+        with contextlib.closing(self.connect()) as connection:
+            connection.executescript(HISTORY_SCHEMA)
+
+    def connect(self) -> sqlite3.Connection:
+        """Open a connection to the database in WAL mode.
+
+        Returns:
+            New connection; close it when done
+        """
+        import sqlite3
+
+        connection = sqlite3.connect(self.path)
+        connection.execute("PRAGMA journal_mode=WAL")
+        # WAL stays consistent without a sync on every commit
+        connection.execute("PRAGMA synchronous=NORMAL")
+        return connection
+
+    def record(self, record: GameRecord) -> None:
+        """Queue a finished game for writing; never blocks on the disk.
+
+        Args:
+            record: Game to store
+        """
+        if self.queue is None:
+            import queue
+            import threading
+
+            self.queue = queue.Queue()
+            self.writer = threading.Thread(
+                target=self.write_loop, name="game-history", daemon=True
+            )
+            self.writer.start()
+        self.queue.put(record)
+
+    def write_loop(self) -> None:
+        """Insert queued games in batches until close() is called."""
+        import queue
+        import sqlite3
+
+        connection = self.connect()
+        try:
+            closing = False
+            while not closing:
+                batch = [self.queue.get()]
+                deadline = time.monotonic() + self.flush_seconds
+                while batch[-1] is not None and len(batch) < self.batch_size:
+                    try:
+                        batch.append(
+                            self.queue.get(
+                                timeout=max(0.0, deadline - time.monotonic())
+                            )
+                        )
+                    except queue.Empty:
+                        break
+                closing = batch[-1] is None
+                rows = [
+                    (
+                        record.finished_at,
+                        time.strftime("%Y-%m-%d", time.gmtime(record.finished_at)),
+                        record.grid_size,
+                        record.score,
+                        record.max_tile,
+                        record.moves,
+                        record.config_hash,
+                    )
+                    for record in batch
+                    if record is not None
+                ]
+                try:
+                    with connection:
+                        connection.executemany(HISTORY_INSERT, rows)
+                except sqlite3.Error as e:
+                    # Reported by flush() and close(); keep draining so they return
+                    self.error = e
+                for _ in batch:
+                    self.queue.task_done()
+        finally:
+            connection.close()
+
+    def flush(self) -> None:
+        """Wait until every queued game has been written.
+
+        Raises:
+            sqlite3.Error: The error that stopped a batch from being written
+        """
+        if self.queue is not None:
+            self.queue.join()
+        if self.error is not None:
+            raise self.error
+
+    def close(self) -> None:
+        """Write the remaining games and stop the writer thread.
+
+        Raises:
+            sqlite3.Error: The error that stopped a batch from being written
+        """
+        if self.queue is not None:
+            self.queue.put(None)
+            self.writer.join()
+            self.queue = None
+        if self.error is not None:
+            raise self.error
+
+    def __enter__(self) -> "GameHistory":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def top_scores(
+        self, grid_size: int, limit: int = 10
+    ) -> List[Tuple[int, int, int, float]]:
+        """Highest scores on a grid size.
+
+        Args:
+            grid_size: Size of the grid
+            limit: Number of games to return
+
+        Returns:
+            Score, largest tile, moves and finish time of each game, best first
+        """
+        with contextlib.closing(self.connect()) as connection:
+            return connection.execute(
+                "SELECT score, max_tile, moves, finished_at FROM games"
+                " WHERE grid_size = ? ORDER BY score DESC LIMIT ?",
+                (grid_size, limit),
+            ).fetchall()
+
+    def daily_stats(
+        self, grid_size: int, since: Optional[str] = None
+    ) -> List[Tuple[str, int, float, int, int]]:
+        """Games per UTC day on a grid size.
+
+        Args:
+            grid_size: Size of the grid
+            since: First day to include, as YYYY-MM-DD, or None for all
+
+        Returns:
+            Day, number of games, mean score, best score and largest tile,
+            oldest day first
+        """
+        with contextlib.closing(self.connect()) as connection:
+            return connection.execute(
+                "SELECT day, COUNT(*), AVG(score), MAX(score), MAX(max_tile)"
+                " FROM games WHERE grid_size = ? AND day >= ?"
+                " GROUP BY day ORDER BY day",
+                (grid_size, since or ""),
+            ).fetchall()
+
+
+# Monte Carlo rollout player
+#
+# Candidate boards travel to the worker pool as packed exponent bytes; each
+# worker rebuilds a game from them and plays random moves to the end.
+
+
+def rollout_batch(
+    packed: bytes, config: GameConfig, num_rollouts: int, seed: int
+) -> Tuple[int, float, float]:
+    """Play random games from a board that is waiting for its tile spawn.
+
+    Args:
+        packed: Board packed with pack_board, just after a move
+        config: Game configuration parameters
+        num_rollouts: Number of games to play
+        seed: Seed for this batch's random number generators
+
+    Returns:
+        Number of rollouts, and the sum and sum of squares of their scores
+    """
+    rng = random.Random(seed)
+    game = create_game(config, rng.getrandbits(64))
+    board = unpack_board(packed, config.grid_size)
+    total = 0.0
+    total_sq = 0.0
+    for _ in range(num_rollouts):
+        game.board = [row.copy() for row in board]
+        game.update_empty_cells()
+        game.score = 0
+        game.game_over = False
+        game.add_random_tile()
+        game.game_over = game.is_game_over()
+        play_game(game, random_policy, rng)
+        total += game.score
+        total_sq += game.score * game.score
+    return num_rollouts, total, total_sq
+
+
+class MonteCarloPlayer:
+    """Chooses moves by the average score of random rollouts from each move.
+
+    Rollouts run on a process pool that is started once and reused for every
+    move, so move quality scales with the number of workers.
+    """
+
+    def __init__(
+        self,
+        config: GameConfig,
+        rollouts: int = 200,
+        workers: Optional[int] = None,
+        batch_size: int = 10,
+        confidence: float = 3.0,
+        seed: Optional[int] = None,
+    ) -> None:
+        """Initialize the player; the worker pool starts on the first move.
+
+        Args:
+            config: Game configuration parameters for the rollouts
+            rollouts: Maximum number of rollouts per candidate move
+            workers: Number of worker processes, or None for all cores
+            batch_size: Rollouts sent to a worker in one task
+            confidence: Standard errors by which the best move must lead the
+                others to stop early
+            seed: Seed for the rollout seeds
+        """
+        self.config = config
+        self.rollouts = rollouts
+        self.workers = workers or os.cpu_count() or 1
+        self.batch_size = batch_size
+        self.confidence = confidence
+        self.rng = random.Random(seed)
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self.last_rollouts = 0
+
+    def choose_action(self, game: Game) -> Action:
+        """Pick a move for the current state of a game.
+
+        Args:
+            game: Game to pick a move for, left unchanged
+
+        Returns:
+            The chosen move, or Action.NONE if no move changes the board
+        """
+        candidates: Dict[Action, Tuple[bytes, int]] = {
+            action: (pack_board(successor), gain)
+            for action, (successor, gain, moved) in zip(
+                MOVE_ACTIONS, all_moves(game.board_state())
+            )
+            if moved
+        }
+        if not candidates:
+            return Action.NONE
+        if len(candidates) == 1:
+            return next(iter(candidates))
+
+        if self.executor is None:
+            from concurrent.futures import ProcessPoolExecutor
+
+            self.executor = ProcessPoolExecutor(max_workers=self.workers)
+
+        # Rollout count, score sum and sum of squares per candidate
+        totals = {action: [0, 0.0, 0.0] for action in candidates}
+        round_size = self.batch_size * self.workers
+        while True:
+            futures = []
+            for action, (packed, _) in candidates.items():
+                remaining = self.rollouts - totals[action][0]
+                for start in range(0, min(remaining, round_size), self.batch_size):
+                    size = min(self.batch_size, remaining - start)
+                    seed = self.rng.getrandbits(63)
+                    futures.append(
+                        (
+                            action,
+                            self.executor.submit(
+                                rollout_batch, packed, self.config, size, seed
+                            ),
+                        )
+                    )
+            if not futures:
+                break
+            for action, future in futures:
+                count, total, total_sq = future.result()
+                totals[action][0] += count
+                totals[action][1] += total
+                totals[action][2] += total_sq
+            bounds = self._bounds(candidates, totals)
+            best = max(bounds, key=lambda action: bounds[action][0])
+            if all(
+                bounds[best][0] > upper
+                for action, (_, upper) in bounds.items()
+                if action != best
+            ):
+                break
+
+        self.last_rollouts = sum(int(count) for count, _, _ in totals.values())
+        bounds = self._bounds(candidates, totals)
+        return max(bounds, key=lambda action: sum(bounds[action]))
+
+    def _bounds(
+        self,
+        candidates: Dict[Action, Tuple[bytes, int]],
+        totals: Dict[Action, List[float]],
+    ) -> Dict[Action, Tuple[float, float]]:
+        """Confidence interval of the expected score after each candidate move."""
+        bounds = {}
+        for action, (count, total, total_sq) in totals.items():
+            mean = total / count
+            variance = max(total_sq / count - mean * mean, 0.0)
+            margin = self.confidence * (variance / count) ** 0.5
+            mean += candidates[action][1]
+            bounds[action] = (mean - margin, mean + margin)
+        return bounds
+
+    def close(self) -> None:
+        """Shut down the worker pool."""
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
+
+    def __enter__(self) -> "MonteCarloPlayer":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+def create_player(config: GameConfig) -> Union[ExpectimaxPlayer, MonteCarloPlayer]:
+    """Create the auto-player selected in the configuration.
+
+    Args:
+        config: Game configuration parameters
+
+    Returns:
+        New player instance
+    """
+    if config.ai_player == "montecarlo":
+        return MonteCarloPlayer(
+            config, rollouts=config.mc_rollouts, workers=config.mc_workers or None
+        )
+    return ExpectimaxPlayer(time_budget_ms=config.ai_time_budget_ms)
+
+
+# Endgame tablebase
+#
+# Small grids, or a 4x4 grid with some large tiles locked in place, can be
+# solved exactly. Positions are packed like BitboardGame.bits: one 4-bit
+# exponent per cell, row-major from the lowest nibble. The builder enumerates
+# every position reachable from the openings in layers of equal tile sum (a
+# turn adds a 2 or a 4 and merges keep the sum), then solves the layers from
+# the largest sum down, so the successors of a position are always solved
+# before it. Each position is stored once, under the smallest key among its
+# rotations and reflections that leave the locked tiles in place.
+#
+# A tablebase file is TABLEBASE_MAGIC, TABLEBASE_HEADER and then a linear
+# probing hash table of TABLEBASE_RECORD slots, so a lookup hashes the key
+# and reads the memory-mapped slots directly, with nothing to load first.
+
+TABLEBASE_MAGIC = b"2048TB01"
+# Grid size, log2 of the slot count, goal exponent (0 for none), number of
+# positions, locked tile exponents and the nibble mask of the locked cells
+TABLEBASE_HEADER = struct.Struct("<BBB5xQQQ")
+# Packed position (0 for a free slot), expected score and best move index
+TABLEBASE_RECORD = struct.Struct("<QfB3x")
+TABLEBASE_NO_MOVE = 0xFF
+TABLEBASE_MAX_GRID = 4
+_TABLEBASE_HASH = 0x9E3779B97F4A7C15
+
+# Row and column step of each move, in MOVE_ACTIONS order
+_MOVE_STEPS = ((-1, 0), (1, 0), (0, -1), (0, 1))
+
+
+def board_symmetries(grid_size: int) -> List[Tuple[Tuple[int, ...], Tuple[int, ...]]]:
+    """The rotations and reflections of a square grid.
+
+    Args:
+        grid_size: Size of the grid
+
+    Returns:
+        For each of the eight symmetries, the cell each cell is carried to
+        and the move each move turns into, as row-major cell indices and
+        indices into MOVE_ACTIONS; the identity comes first
+    """
+    last = grid_size - 1
+    mappings: List[Callable[[int, int], Tuple[int, int]]] = [
+        lambda row, col: (row, col),
+        lambda row, col: (col, last - row),
+        lambda row, col: (last - row, last - col),
+        lambda row, col: (last - col, row),
+        lambda row, col: (row, last - col),
+        lambda row, col: (last - row, col),
+        lambda row, col: (col, row),
+        lambda row, col: (last - col, last - row),
+    ]
+    symmetries = []
+    for mapping in mappings:
+        cells = []
+        for cell in range(grid_size * grid_size):
+            row, col = mapping(*divmod(cell, grid_size))
+            cells.append(row * grid_size + col)
+        # Each mapping is affine, so steps turn by its linear part
+        origin_row, origin_col = mapping(0, 0)
+        moves = []
+        for step in _MOVE_STEPS:
+            row, col = mapping(*step)
+            moves.append(_MOVE_STEPS.index((row - origin_row, col - origin_col)))
+        symmetries.append((tuple(cells), tuple(moves)))
+    return symmetries
+
+
+def _permute_key(key: int, cells: Sequence[int]) -> int:
+    """Move every nibble of a packed position to the cell given for it."""
+    return sum(
+        ((key >> (4 * cell)) & 0xF) << (4 * target) for cell, target in enumerate(cells)
+    )
+
+
+def tablebase_symmetries(
+    grid_size: int, locked_bits: int, locked_mask: int
+) -> List[Tuple[Tuple[int, ...], Tuple[int, ...]]]:
+    """The board symmetries that leave the locked tiles where they are.
+
+    Args:
+        grid_size: Size of the grid
+        locked_bits: Packed exponents of the locked tiles
+        locked_mask: Nibble mask of the locked cells
+
+    Returns:
+        The symmetries, as returned by board_symmetries
+    """
+    return [
+        (cells, moves)
+        for cells, moves in board_symmetries(grid_size)
+        if _permute_key(locked_bits, cells) == locked_bits
+        and _permute_key(locked_mask, cells) == locked_mask
+    ]
+
+
+class TablebaseBuilder:
+    """Solves every reachable position of a small game with NumPy.
+
+    Positions are handled a whole layer at a time as arrays of packed keys.
+    """
+
+    def __init__(
+        self,
+        grid_size: int,
+        goal: Optional[int] = None,
+        locked: Optional[Dict[Tuple[int, int], int]] = None,
+    ) -> None:
+        """Describe the positions to solve.
+
+        Args:
+            grid_size: Size of the grid, at most TABLEBASE_MAX_GRID
+            goal: Tile that ends the game once made, or None to play until
+                no move is left
+            locked: Tiles by (row, col) that must never move or merge; moves
+                that would disturb them are treated as illegal
+
+        Raises:
+            ValueError: If the grid size, goal or a locked tile is invalid
+        """
+        if not 2 <= grid_size <= TABLEBASE_MAX_GRID:
+            raise ValueError(
+                f"Tablebases support grids from 2x2 to "
+                f"{TABLEBASE_MAX_GRID}x{TABLEBASE_MAX_GRID}, got {grid_size}"
+            )
+        if goal is not None and (goal < 8 or goal & (goal - 1) or goal > 1 << 15):
+            raise ValueError(
+                f"The goal must be a power of two from 8 to 32768, got {goal}"
+            )
+        self.grid_size = grid_size
+        self.goal_exponent = goal.bit_length() - 1 if goal else 0
+        self.locked_bits = 0
+        self.locked_mask = 0
+        for (row, col), value in (locked or {}).items():
+            if not (0 <= row < grid_size and 0 <= col < grid_size):
+                raise ValueError(f"Locked cell ({row}, {col}) is outside the grid")
+            if value < 2 or value & (value - 1) or value > 1 << 15:
+                raise ValueError(
+                    f"Locked tile {value} is not a power of two up to 32768"
+                )
+            shift = 4 * (row * grid_size + col)
+            self.locked_bits |= (value.bit_length() - 1) << shift
+            self.locked_mask |= 0xF << shift
+        self.locked_sum = sum((locked or {}).values())
+        self.free_cells = [
+            cell
+            for cell in range(grid_size * grid_size)
+            if not (self.locked_mask >> (4 * cell)) & 0xF
+        ]
+        if len(self.free_cells) < 2:
+            raise ValueError("At least two cells must be free")
+        self.symmetries = tablebase_symmetries(
+            grid_size, self.locked_bits, self.locked_mask
+        )
+        # Vertical moves slide the rows of the transposed board
+        self.transposed = board_symmetries(grid_size)[6][0]
+
+        # Left and right slides of every packed row, with the score they gain
+        rows = 16**grid_size
+        self.slides = np.zeros((2, rows), np.uint64)
+        self.gains = np.zeros((2, rows), np.int64)
+        for row in range(rows):
+            cells = [(row >> (4 * idx)) & 0xF for idx in range(grid_size)]
+            merged, gain = _slide_row_exponents(cells)
+            self.slides[0, row] = _pack_row(merged)
+            self.gains[0, row] = gain
+            merged, gain = _slide_row_exponents(cells[::-1])
+            self.slides[1, row] = _pack_row(merged[::-1])
+            self.gains[1, row] = gain
+
+    def _nibbles(self, keys: np.ndarray, cell: int) -> np.ndarray:
+        """Exponent held by a cell in each packed position."""
+        return (keys >> np.uint64(4 * cell)) & np.uint64(0xF)
+
+    def _permute(self, keys: np.ndarray, cells: Sequence[int]) -> np.ndarray:
+        """Apply a cell permutation to packed positions."""
+        result = np.zeros_like(keys)
+        for cell, target in enumerate(cells):
+            result |= self._nibbles(keys, cell) << np.uint64(4 * target)
+        return result
+
+    def canonical(self, keys: np.ndarray) -> np.ndarray:
+        """Reduce packed positions to the smallest key among their symmetries.
+
+        Args:
+            keys: Packed positions
+
+        Returns:
+            The canonical keys
+        """
+        result = keys.copy()
+        for cells, _ in self.symmetries[1:]:
+            np.minimum(result, self._permute(keys, cells), out=result)
+        return result
+
+    def slide(
+        self, keys: np.ndarray, move: int
+    ) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Apply one move to packed positions.
+
+        Args:
+            keys: Packed positions
+            move: Index into MOVE_ACTIONS
+
+        Returns:
+            The positions after the move, the score gained and a mask of the
+            positions where the move is legal
+        """
+        vertical = MOVE_ACTIONS[move] in (Action.UP, Action.DOWN)
+        towards_end = int(MOVE_ACTIONS[move] in (Action.DOWN, Action.RIGHT))
+        source = self._permute(keys, self.transposed) if vertical else keys
+        row_bits = 4 * self.grid_size
+        row_mask = np.uint64((1 << row_bits) - 1)
+        result = np.zeros_like(keys)
+        gained = np.zeros(len(keys), np.int64)
+        for row in range(self.grid_size):
+            shift = np.uint64(row_bits * row)
+            rows = ((source >> shift) & row_mask).astype(np.intp)
+            result |= self.slides[towards_end, rows] << shift
+            gained += self.gains[towards_end, rows]
+        if vertical:
+            result = self._permute(result, self.transposed)
+        legal = (result != keys) & (
+            (result & np.uint64(self.locked_mask)) == np.uint64(self.locked_bits)
+        )
+        return result, gained, legal
+
+    def reached_goal(self, keys: np.ndarray) -> np.ndarray:
+        """Mask of packed positions holding the goal tile in a free cell."""
+        reached = np.zeros(len(keys), bool)
+        if self.goal_exponent:
+            for cell in self.free_cells:
+                reached |= self._nibbles(keys, cell) >= self.goal_exponent
+        return reached
+
+    def openings(self) -> Dict[int, np.ndarray]:
+        """Positions after the two opening tiles, grouped by tile sum."""
+        layers: Dict[int, List[int]] = {}
+        for first, second in itertools.combinations(self.free_cells, 2):
+            for low, high in itertools.product((1, 2), repeat=2):
+                key = self.locked_bits | low << (4 * first) | high << (4 * second)
+                total = self.locked_sum + (1 << low) + (1 << high)
+                layers.setdefault(total, []).append(key)
+        return {
+            total: np.unique(self.canonical(np.array(keys, np.uint64)))
+            for total, keys in layers.items()
+        }
+
+    def enumerate(self) -> Dict[int, np.ndarray]:
+        """Find every reachable position.
+
+        Returns:
+            Sorted canonical keys of the positions, by tile sum
+        """
+        pending: Dict[int, List[np.ndarray]] = {
+            total: [keys] for total, keys in self.openings().items()
+        }
+        layers: Dict[int, np.ndarray] = {}
+        while pending:
+            total = min(pending)
+            layer = np.unique(np.concatenate(pending.pop(total)))
+            layers[total] = layer
+            for move in range(len(MOVE_ACTIONS)):
+                after, _, legal = self.slide(layer, move)
+                after = after[legal & ~self.reached_goal(after)]
+                for cell in self.free_cells:
+                    empty = after[self._nibbles(after, cell) == 0]
+                    if not len(empty):
+                        continue
+                    for exponent in (1, 2):
+                        children = self.canonical(
+                            empty | np.uint64(exponent << (4 * cell))
+                        )
+                        pending.setdefault(total + (1 << exponent), []).append(
+                            np.unique(children)
+                        )
+        return layers
+
+    def solve(
+        self, layers: Dict[int, np.ndarray]
+    ) -> Iterator[Tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """Solve the layers from the largest tile sum down.
+
+        Args:
+            layers: Positions returned by enumerate(); solved layers are
+                removed once no other layer needs them
+
+        Yields:
+            For each layer, the keys, the expected score under best play and
+            the index of the best move (TABLEBASE_NO_MOVE when none is left)
+        """
+        values: Dict[int, np.ndarray] = {}
+        for total in sorted(layers, reverse=True):
+            keys = layers[total]
+            best_value = np.full(len(keys), -1.0)
+            best_move = np.full(len(keys), TABLEBASE_NO_MOVE, np.uint8)
+            for move in range(len(MOVE_ACTIONS)):
+                after, gained, legal = self.slide(keys, move)
+                expected = gained.astype(np.float64)
+                playing = np.flatnonzero(legal & ~self.reached_goal(after))
+                spawn_value = np.zeros(len(playing))
+                spawn_cells = np.zeros(len(playing))
+                after = after[playing]
+                for cell in self.free_cells:
+                    empty = np.flatnonzero(self._nibbles(after, cell) == 0)
+                    if not len(empty):
+                        continue
+                    for exponent, probability in ((1, 0.9), (2, 0.1)):
+                        children = self.canonical(
+                            after[empty] | np.uint64(exponent << (4 * cell))
+                        )
+                        child_keys = layers[total + (1 << exponent)]
+                        child_values = values[total + (1 << exponent)]
+                        spawn_value[empty] += (
+                            probability
+                            * child_values[np.searchsorted(child_keys, children)]
+                        )
+                    spawn_cells[empty] += 1
+                # Every legal move leaves at least one free cell empty
+                expected[playing] += spawn_value / spawn_cells
+                better = legal & (expected > best_value)
+                best_value[better] = expected[better]
+                best_move[better] = move
+            best_value[best_move == TABLEBASE_NO_MOVE] = 0.0
+            values[total] = best_value
+            # Layers four above are not needed below this one
+            layers.pop(total + 4, None)
+            values.pop(total + 4, None)
+            yield keys, best_value, best_move
+
+    def build(self, path: str) -> int:
+        """Solve every reachable position and write the tablebase file.
+
+        Args:
+            path: File to write
+
+        Returns:
+            Number of positions written
+        """
+        layers = self.enumerate()
+        num_positions = sum(len(keys) for keys in layers.values())
+        # At most half the slots are used, so probe runs stay short
+        hash_bits = max(1, (2 * num_positions - 1).bit_length())
+        offset = len(TABLEBASE_MAGIC) + TABLEBASE_HEADER.size
+        with open(path, "wb") as file:
+            file.write(TABLEBASE_MAGIC)
+            file.write(
+                TABLEBASE_HEADER.pack(
+                    self.grid_size,
+                    hash_bits,
+                    self.goal_exponent,
+                    num_positions,
+                    self.locked_bits,
+                    self.locked_mask,
+                )
+            )
+            file.truncate(offset + (TABLEBASE_RECORD.size << hash_bits))
+        record = np.dtype(
+            {
+                "names": ["key", "value", "move"],
+                "formats": ["<u8", "<f4", "u1"],
+                "offsets": [0, 8, 12],
+                "itemsize": TABLEBASE_RECORD.size,
+            }
+        )
+        table = np.memmap(path, record, "r+", offset, (1 << hash_bits,))
+        slot_mask = np.uint64((1 << hash_bits) - 1)
+        for keys, layer_values, moves in self.solve(layers):
+            slots = (keys * np.uint64(_TABLEBASE_HASH)) >> np.uint64(64 - hash_bits)
+            pending = np.arange(len(keys))
+            while len(pending):
+                free = np.flatnonzero(table["key"][slots] == 0)
+                # Where several positions probe the same free slot, the first wins
+                claimed, first = np.unique(slots[free], return_index=True)
+                winners = pending[free[first]]
+                table["key"][claimed] = keys[winners]
+                table["value"][claimed] = layer_values[winners]
+                table["move"][claimed] = moves[winners]
+                placed = np.zeros(len(pending), bool)
+                placed[free[first]] = True
+                pending = pending[~placed]
+                slots = (slots[~placed] + np.uint64(1)) & slot_mask
+        table.flush()
+        return num_positions
+
+
+class Tablebase:
+    """Read-only view of a tablebase file, answering lookups from the mapping."""
+
+    def __init__(self, path: str) -> None:
+        """Map a tablebase file.
+
+        Args:
+            path: File written by TablebaseBuilder.build
+
+        Raises:
+            ValueError: If the file is not a tablebase or is truncated
+        """
+        with open(path, "rb") as file:
+            if os.fstat(file.fileno()).st_size == 0:
+                raise ValueError(f"{path} is not a tablebase file")
+            self.data = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.data[: len(TABLEBASE_MAGIC)] != TABLEBASE_MAGIC:
+            self.data.close()
+            raise ValueError(f"{path} is not a tablebase file")
+        (
+            self.grid_size,
+            self.hash_bits,
+            goal_exponent,
+            self.num_positions,
+            self.locked_bits,
+            self.locked_mask,
+        ) = TABLEBASE_HEADER.unpack_from(self.data, len(TABLEBASE_MAGIC))
+        self.offset = len(TABLEBASE_MAGIC) + TABLEBASE_HEADER.size
+        if len(self.data) != self.offset + (TABLEBASE_RECORD.size << self.hash_bits):
+            self.data.close()
+            raise ValueError(f"{path} is truncated")
+        self.goal: Optional[int] = 1 << goal_exponent if goal_exponent else None
+        self.slot_mask = (1 << self.hash_bits) - 1
+        self.symmetries = tablebase_symmetries(
+            self.grid_size, self.locked_bits, self.locked_mask
+        )
+
+    def lookup(self, board: Sequence[Sequence[int]]) -> Optional[Tuple[Action, float]]:
+        """Look up the best move of a position.
+
+        Args:
+            board: Rows of tile values
+
+        Returns:
+            The best move (Action.NONE if the game is over) and the expected
+            score still to be gained under best play, or None if the position
+            is not in the tablebase
+        """
+        if len(board) != self.grid_size:
+            return None
+        exponents = [
+            value.bit_length() - 1 if value else 0 for row in board for value in row
+        ]
+        if len(exponents) != self.grid_size**2 or max(exponents) > MAX_EXPONENT:
+            return None
+        key = 0
+        for cell, exponent in enumerate(exponents):
+            key |= exponent << (4 * cell)
+        # Key 0 marks free slots; the empty board is never a game position
+        if key == 0 or key & self.locked_mask != self.locked_bits:
+            return None
+
+        canonical, moves = key, self.symmetries[0][1]
+        for cells, symmetry_moves in self.symmetries[1:]:
+            permuted = 0
+            for cell, exponent in enumerate(exponents):
+                permuted |= exponent << (4 * cells[cell])
+            if permuted < canonical:
+                canonical, moves = permuted, symmetry_moves
+
+        slot = ((canonical * _TABLEBASE_HASH) & MASK64) >> (64 - self.hash_bits)
+        while True:
+            stored, value, move = TABLEBASE_RECORD.unpack_from(
+                self.data, self.offset + slot * TABLEBASE_RECORD.size
+            )
+            if stored == canonical:
+                if move == TABLEBASE_NO_MOVE:
+                    return Action.NONE, value
+                # The stored move is for the canonical board; turn it back
+                return MOVE_ACTIONS[moves.index(move)], value
+            if stored == 0:
+                return None
+            slot = (slot + 1) & self.slot_mask
+
+    def close(self) -> None:
+        """Unmap the file."""
+        self.data.close()
+
+    def __enter__(self) -> "Tablebase":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+
+# Game server
+#
+# One asyncio event loop hosts every session; each TCP connection is one game.
+# The protocol is line-based ASCII. The server greets with
+# "HELLO <grid size> <seed>", then answers every command line with one line:
+#
+#   UP | DOWN | LEFT | RIGHT | RESTART | STATE
+#       -> "OK <moved 0/1> <score> <game over 0/1> <board>"
+#   QUIT -> "BYE", then the connection closes
+#   anything else -> "ERR <reason>"
+#
+# <board> is pack_board() in hex: two digits per cell holding its exponent.
+# All complete lines that arrive in one read are answered with one write, and
+# the server stops reading from a client until its replies have drained.
+
+SERVER_COMMANDS: Dict[bytes, Action] = {
+    b"UP": Action.UP,
+    b"DOWN": Action.DOWN,
+    b"LEFT": Action.LEFT,
+    b"RIGHT": Action.RIGHT,
+    b"RESTART": Action.RESTART,
+    b"STATE": Action.NONE,
+}
+
+
+class GameServer:
+    """Hosts many concurrent game sessions over line-based TCP."""
+
+    def __init__(
+        self,
+        config: GameConfig,
+        idle_timeout: float = 300.0,
+        max_sessions: int = 10000,
+        max_line: int = 256,
+    ) -> None:
+        """Initialize the server; start() begins listening.
+
+        Args:
+            config: Game configuration for every session
+            idle_timeout: Seconds without a command before a session is closed
+            max_sessions: Sessions beyond this are refused
+            max_line: Longest command line accepted, in bytes
+        """
+        self.config = config
+        self.idle_timeout = idle_timeout
+        self.max_sessions = max_sessions
+        self.max_line = max_line
+        self.sessions = 0
+        self.moves = 0
+        self.evicted = 0
+        self.server: Optional[asyncio.Server] = None
+
+    async def start(self, host: str, port: int) -> None:
+        """Start listening for connections.
+
+        Args:
+            host: Address to bind
+            port: Port to bind, or 0 for any free port
+        """
+        import asyncio
+
+        self.server = await asyncio.start_server(
+            self.handle_client, host, port, backlog=1024
+        )
+
+    @property
+    def port(self) -> int:
+        """Port the server is listening on."""
+        return self.server.sockets[0].getsockname()[1]
+
+    def reply(self, game: Game, moved: bool) -> bytes:
+        """Encode a game state as an OK line."""
+        return b"OK %d %d %d %s\n" % (
+            moved,
+            game.score,
+            game.game_over,
+            pack_board(game.board).hex().encode(),
+        )
+
+    def execute(self, game: Game, line: bytes) -> Optional[bytes]:
+        """Run one command line against a session's game.
+
+        Args:
+            game: The session's game
+            line: Command line without its newline
+
+        Returns:
+            The reply line, or None if the client asked to quit
+        """
+        command = line.strip().upper()
+        if command == b"QUIT":
+            return None
+        action = SERVER_COMMANDS.get(command)
+        if action is None:
+            return b"ERR unknown command\n"
+        if action == Action.NONE:
+            return self.reply(game, False)
+        moved = game.handle_action(action)
+        self.moves += moved and action != Action.RESTART
+        return self.reply(game, moved)
+
+    async def handle_client(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> None:
+        """Serve one session until the client quits, goes idle or disconnects."""
+        import asyncio
+
+        if self.sessions >= self.max_sessions:
+            writer.write(b"ERR server full\n")
+            writer.close()
+            return
+
+        self.sessions += 1
+        game = create_game(self.config)
+        game.restart()
+        writer.write(b"HELLO %d %d\n" % (game.grid_size, game.seed))
+        pending = b""
+        try:
+            while True:
+                try:
+                    async with asyncio.timeout(self.idle_timeout):
+                        data = await reader.read(65536)
+                except TimeoutError:
+                    self.evicted += 1
+                    writer.write(b"BYE idle\n")
+                    break
+                if not data:
+                    break
+
+                lines = (pending + data).split(b"\n")
+                pending = lines.pop()
+                if len(pending) > self.max_line:
+                    writer.write(b"ERR line too long\n")
+                    break
+                replies = []
+                quit_requested = False
+                for line in lines:
+                    reply = self.execute(game, line)
+                    if reply is None:
+                        replies.append(b"BYE\n")
+                        quit_requested = True
+                        break
+                    replies.append(reply)
+                writer.write(b"".join(replies))
+                if quit_requested:
+                    break
+                # Backpressure: stop reading until the client takes its replies
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            self.sessions -= 1
+            writer.close()
+            try:
+                await writer.wait_closed()
+            except ConnectionError:
+                pass
+
+    async def serve_forever(self) -> None:
+        """Serve until cancelled."""
+        async with self.server:
+            await self.server.serve_forever()
+
+
+async def run_load_test(
+    host: str, port: int, sessions: int, duration: float, seed: int = 0
+) -> Dict[str, float]:
+    """Drive a game server with many concurrent random-playing sessions.
+
+    Each session sends one move at a time and times the reply, restarting its
+    game when it ends.
+
+    Args:
+        host: Server address
+        port: Server port
+        sessions: Number of concurrent sessions
+        duration: Seconds to run for
+        seed: Seed for the sessions' move choices
+
+    Returns:
+        Connected sessions, failed connections, moves, moves per second and
+        reply latency percentiles in milliseconds
+    """
+    import asyncio
+
+    latencies: List[float] = []
+    connected = 0
+    failed = 0
+    commands = [b"UP\n", b"DOWN\n", b"LEFT\n", b"RIGHT\n"]
+    deadline = time.perf_counter() + duration
+
+    async def session(idx: int) -> None:
+        nonlocal connected, failed
+        rng = random.Random(f"{seed}:{idx}")
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            greeting = await reader.readline()
+        except OSError:
+            failed += 1
+            return
+        if not greeting.startswith(b"HELLO"):
+            failed += 1
+            writer.close()
+            return
+        connected += 1
+        try:
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                writer.write(rng.choice(commands))
+                reply = await reader.readline()
+                latencies.append((time.perf_counter() - start) * 1000)
+                fields = reply.split()
+                if not fields or fields[0] != b"OK":
+                    break
+                if fields[3] == b"1":
+                    writer.write(b"RESTART\n")
+                    await reader.readline()
+            writer.write(b"QUIT\n")
+            await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            writer.close()
+
+    start = time.perf_counter()
+    await asyncio.gather(*(session(idx) for idx in range(sessions)))
+    elapsed = time.perf_counter() - start
+
+    latencies.sort()
+    last = max(len(latencies) - 1, 0)
+
+    def percentile(q: float) -> float:
+        return latencies[round(q * last)] if latencies else 0.0
+
+    return {
+        "sessions": connected,
+        "failed": failed,
+        "moves": len(latencies),
+        "moves_per_sec": len(latencies) / elapsed,
+        "p50_ms": percentile(0.50),
+        "p95_ms": percentile(0.95),
+        "p99_ms": percentile(0.99),
+    }
+
+
+# Frame profiler
+#
+# Sections are timed with perf_counter and summed per frame, so a section
+# entered several times in one frame counts as one sample. Nested sections
+# include the time of the sections inside them.
+
+# Upper bounds in milliseconds of the histogram buckets in profile reports
+PROFILE_BUCKETS_MS = (0.1, 0.25, 0.5, 1.0, 2.0, 4.0, 8.0, 16.7, 33.3, 66.7)
+
+
+class FrameProfiler:
+    """Collects per-frame timings of the sections of the game loop."""
+
+    def __init__(self, window: int = 10000) -> None:
+        """Initialize an empty profile.
+
+        Args:
+            window: Most recent samples per section used for the percentiles
+        """
+        self.window = window
+        self.samples: Dict[str, Deque[float]] = {}
+        self.histograms: Dict[str, List[int]] = {}
+        self.totals: Dict[str, float] = {}
+        self.counts: Dict[str, int] = {}
+        self.maxima: Dict[str, float] = {}
+        self.current: Dict[str, float] = {}
+        self.frames = 0
+
+    @contextlib.contextmanager
+    def section(self, name: str) -> Iterator[None]:
+        """Time a block of code as part of the current frame.
+
+        Args:
+            name: Section name, dotted for sub-sections (e.g. "draw.tiles")
+        """
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = (time.perf_counter() - start) * 1000
+            self.current[name] = self.current.get(name, 0.0) + elapsed
+
+    def end_frame(self) -> None:
+        """Record the sections timed since the previous frame ended."""
+        for name, elapsed in self.current.items():
+            if name not in self.samples:
+                self.samples[name] = deque(maxlen=self.window)
+                self.histograms[name] = [0] * (len(PROFILE_BUCKETS_MS) + 1)
+                self.totals[name] = 0.0
+                self.counts[name] = 0
+                self.maxima[name] = 0.0
+            self.samples[name].append(elapsed)
+            self.histograms[name][bisect.bisect_left(PROFILE_BUCKETS_MS, elapsed)] += 1
+            self.totals[name] += elapsed
+            self.counts[name] += 1
+            self.maxima[name] = max(self.maxima[name], elapsed)
+        self.current.clear()
+        self.frames += 1
+
+    def percentiles(self, name: str) -> Tuple[float, float, float]:
+        """The p50, p95 and p99 of a section's recent samples, in milliseconds.
+
+        Args:
+            name: Section name
+
+        Returns:
+            p50, p95 and p99, or zeros if the section has no samples
+        """
+        samples = sorted(self.samples.get(name, ()))
+        if not samples:
+            return 0.0, 0.0, 0.0
+        last = len(samples) - 1
+        return tuple(samples[round(q * last)] for q in (0.50, 0.95, 0.99))
+
+    def report(self) -> Dict[str, Any]:
+        """Summarize every section for export.
+
+        Returns:
+            Frame count and, per section, sample count, mean, percentiles,
+            maximum and histogram bucket counts, all in milliseconds
+        """
+        sections = {}
+        for name in sorted(self.samples):
+            p50, p95, p99 = self.percentiles(name)
+            bounds = [*PROFILE_BUCKETS_MS, None]
+            sections[name] = {
+                "count": self.counts[name],
+                "mean_ms": self.totals[name] / self.counts[name],
+                "p50_ms": p50,
+                "p95_ms": p95,
+                "p99_ms": p99,
+                "max_ms": self.maxima[name],
+                "histogram": [
+                    {"le_ms": bound, "count": count}
+                    for bound, count in zip(bounds, self.histograms[name])
+                ],
+            }
+        return {"frames": self.frames, "sections": sections}
+
+    def write_json(self, path: str) -> None:
+        """Write the report to a JSON file.
+
+        Args:
+            path: File to write
+        """
+        with open(path, "w") as file:
+            json.dump(self.report(), file, indent=2)
+
+    def lines(self) -> List[str]:
+        """Short text lines of the percentiles, for the on-screen overlay."""
+        lines = [f"{'section':<16}{'p50':>7}{'p95':>7}{'p99':>7}"]
+        for name in sorted(self.samples):
+            p50, p95, p99 = self.percentiles(name)
+            lines.append(f"{name:<16}{p50:>7.2f}{p95:>7.2f}{p99:>7.2f}")
+        return lines
+
+
+class TileAtlas:
+    """Pre-rendered tile surfaces, including the new tile animation frames.
+
+    Surfaces are opaque and include the grid background around the rounded
+    tile, so drawing a tile is a single blit. Tiles for the configured colors
+    are rendered up front; larger values are added the first time they show up.
+    """
+
+    def __init__(
+        self,
+        config: GameConfig,
+        tile_size: int,
+        tile_fonts: Dict[int, pygame.font.Font],
+        animation_frames: int,
+    ) -> None:
+        """Initialize the atlas and render the tiles with configured colors.
+
+        Args:
+            config: Configuration parameters
+            tile_size: Size of each tile in pixels
+            tile_fonts: Fonts for tile values, with the 2048 font as fallback
+            animation_frames: Number of pre-scaled new tile animation frames
+        """
+        self.config = config
+        self.tile_size = tile_size
+        self.tile_fonts = tile_fonts
+        self.animation_frames = animation_frames
+        self.tiles: Dict[int, pygame.Surface] = {}
+        self.frames: Dict[int, List[pygame.Surface]] = {}
+        for value in config.tile_colors:
+            self.tile(value)
+
+    def _render_text(self, value: int) -> pygame.Surface:
+        """Render the text of a tile value."""
+        font = self.tile_fonts.get(value, self.tile_fonts[2048])
+        text_color = self.config.text_colors.get(value, self.config.light_text)
+        return font.render(str(value), True, text_color)
+
+    def _color(self, value: int) -> Tuple[int, ...]:
+        """Background color of a tile value."""
+        return self.config.tile_colors.get(value, self.config.tile_colors[2048])
+
+    def tile(self, value: int) -> pygame.Surface:
+        """Full-size surface for a tile value.
+
+        Args:
+            value: Tile value
+
+        Returns:
+            Tile surface
+        """
+        surface = self.tiles.get(value)
+        if surface is None:
+            surface = pygame.Surface((self.tile_size, self.tile_size))
+            surface.fill(self.config.grid_color)
+            pygame.draw.rect(
+                surface,
+                self._color(value),
+                (0, 0, self.tile_size, self.tile_size),
+                border_radius=3,
+            )
+            if value != 0:
+                text = self._render_text(value)
+                surface.blit(
+                    text,
+                    (
+                        (self.tile_size - text.get_width()) // 2,
+                        (self.tile_size - text.get_height()) // 2,
+                    ),
+                )
+            self.tiles[value] = surface
+        return surface
+
+    def frame(self, value: int, progress: float) -> pygame.Surface:
+        """Surface of a new tile partway through its growing animation.
+
+        Args:
+            value: Tile value
+            progress: Fraction of the animation elapsed, from 0 to 1
+
+        Returns:
+            The pre-scaled frame closest to the given progress
+        """
+        frames = self.frames.get(value)
+        if frames is None:
+            frames = [
+                self._render_frame(value, 0.1 + 0.9 * idx / self.animation_frames)
+                for idx in range(self.animation_frames)
+            ]
+            self.frames[value] = frames
+        idx = min(int(progress * self.animation_frames), self.animation_frames - 1)
+        return frames[idx]
+
+    def _render_frame(self, value: int, scale: float) -> pygame.Surface:
+        """Render a tile scaled around its center on the grid background."""
+        surface = pygame.Surface((self.tile_size, self.tile_size))
+        surface.fill(self.config.grid_color)
+        scaled_size = int(self.tile_size * scale)
+        offset = (self.tile_size - scaled_size) // 2
+        surface.fill(self._color(value), (offset, offset, scaled_size, scaled_size))
+        if value != 0:
+            text = self._render_text(value)
+            text = pygame.transform.scale(
+                text, (int(text.get_width() * scale), int(text.get_height() * scale))
+            )
+            surface.blit(
+                text,
+                (
+                    (self.tile_size - text.get_width()) // 2,
+                    (self.tile_size - text.get_height()) // 2,
+                ),
+            )
+        return surface
+
+
+class Renderer:
+    """Handles rendering logic for 2048."""
+
+    def __init__(
+        self,
+        game: Game,
+        config: GameConfig,
+        profile_path: Optional[str] = None,
+        history_path: Optional[str] = None,
+    ) -> None:
+        """Initialize the renderer.
+
+        Args:
+            game: Game instance to render
+            config: Configuration parameters
+            profile_path: JSON file to write a frame profile to on exit, or
+                None to run without profiling
+            history_path: SQLite database to record finished games in, or
+                None to keep no history
+        """
+        self.game = game
+        self.config = config
+
+        # Layout parameters
+        self.animation_duration = config.animation_duration
+        self.title_y = config.title_y
+        self.subtitle_y = config.subtitle_y
+        self.grid_top_y = config.grid_top_y
+        self.tile_size = config.tile_size
+        self.fps = config.fps
+        self.font_name = config.font_name
+        self.grid_padding = config.grid_padding
+        self.debounce_time = config.debounce_time
+
+        # Calculate dimensions
+        self.grid_width = (
+            self.grid_padding * (game.grid_size + 1) + self.tile_size * game.grid_size
+        )
+        self.grid_height = self.grid_width
+        self.width = max(500, self.grid_width + 40)
+        self.height = 175 + self.grid_height + 100
+
+        # Initialize pygame resources
+        self.screen: Optional[pygame.Surface] = None
+        self.clock: Optional[pygame.time.Clock] = None
+        self.title_font: Optional[pygame.font.Font] = None
+        self.subtitle_font: Optional[pygame.font.Font] = None
+        self.instruction_font: Optional[pygame.font.Font] = None
+        self.score_font: Optional[pygame.font.Font] = None
+        self.score_label_font: Optional[pygame.font.Font] = None
+        self.tile_fonts: Dict[int, pygame.font.Font] = {}
+        self.atlas: Optional[TileAtlas] = None
+        self.text_cache: Dict[
+            Tuple[pygame.font.Font, str, Tuple[int, int, int]], pygame.Surface
+        ] = {}
+        self.overlay: Optional[pygame.Surface] = None
+
+        # Frames are timed by pygame's ticks unless a virtual time is set, as
+        # when exporting frames faster or slower than real time
+        self.virtual_time: Optional[int] = None
+
+        # Tracking the last action time for debouncing
+        self.last_action_time: int = 0
+
+        # Auto-play picks moves with the expectimax player, toggled with 'A'
+        self.auto_play: bool = False
+        self.player = create_player(config)
+
+        # 'Z' undoes and 'Y' redoes moves on the engines that keep a history
+        if isinstance(game, Game):
+            game.enable_undo(config.undo_memory_kb)
+
+        # Move hints, toggled with 'H', are searched off the frame loop; the
+        # hint belongs to hint_board and is None until its search finishes
+        self.hints = HintWorker(config.hint_time_budget_ms)
+        self.show_hints: bool = False
+        self.hint_board: Optional[Board] = None
+        self.hint_action: Optional[Action] = None
+
+        # What is currently on screen, so only changed regions are redrawn
+        self.needs_full_redraw: bool = True
+        self.drawn_board: Optional[List[List[int]]] = None
+        self.drawn_score: int = 0
+        self.drawn_game_over: bool = False
+        self.drawn_hint: Optional[Action] = None
+        self.animated_cell: Optional[Tuple[int, int]] = None
+
+        # Frame profiling, with an overlay of the percentiles toggled with 'P'
+        self.profile_path = profile_path
+        self.profiler = FrameProfiler() if profile_path else None
+        self.show_profile: bool = False
+        self.profile_font: Optional[pygame.font.Font] = None
+        self.profile_surface: Optional[pygame.Surface] = None
+        self.profile_updated: int = 0
+
+        # Each finished game is queued for the history once
+        self.history = GameHistory(history_path) if history_path else None
+        self.config_hash = config_hash(config) if history_path else ""
+        self.recorded_game_over: bool = False
+
+    def init_pygame(self) -> None:
+        """Initialize pygame, display, and fonts."""
+        pygame.init()
+        try:
+            self.screen = pygame.display.set_mode((self.width, self.height))
+            pygame.display.set_caption("2048 Game")
+            self.clock = pygame.time.Clock()
+
+            # Initialize fonts
+            self.title_font = pygame.font.SysFont(self.font_name, 60, bold=True)
+            self.subtitle_font = pygame.font.SysFont(self.font_name, 18)
+            self.instruction_font = pygame.font.SysFont(self.font_name, 16)
+            self.score_font = pygame.font.SysFont(self.font_name, 25, bold=True)
+            self.score_label_font = pygame.font.SysFont(self.font_name, 14, bold=True)
+            self.profile_font = pygame.font.SysFont("monospace", 12)
+
+            # Initialize tile fonts with different sizes based on number of digits
+            for value in [2, 4, 8, 16, 32, 64]:
+                self.tile_fonts[value] = pygame.font.SysFont(
+                    self.font_name, 45, bold=True
+                )
+            for value in [128, 256, 512]:
+                self.tile_fonts[value] = pygame.font.SysFont(
+                    self.font_name, 40, bold=True
+                )
+            for value in [1024, 2048]:
+                self.tile_fonts[value] = pygame.font.SysFont(
+                    self.font_name, 30, bold=True
+                )
+
+            # Pre-render tiles and the overlay so frames only blit surfaces
+            self.atlas = TileAtlas(
+                self.config,
+                self.tile_size,
+                self.tile_fonts,
+                self.config.animation_frames,
+            )
+            self.overlay = pygame.Surface((self.width, self.height), pygame.SRCALPHA)
+            self.overlay.fill((255, 255, 255, 150))
+
+            # Initialize game with two starting tiles
+            self.game.restart()
+
+        except Exception as e:
+            print(f"Error initializing pygame: {e}")
+            sys.exit(1)
+
+    def now(self) -> int:
+        """Current time of the renderer's clock.
+
+        Returns:
+            The virtual time if one is set, otherwise pygame's ticks, in
+            milliseconds
+        """
+        if self.virtual_time is not None:
+            return self.virtual_time
+        return pygame.time.get_ticks()
+
+    def profile(self, section: str) -> ContextManager[None]:
+        """Time a block of the game loop when profiling is enabled.
+
+        Args:
+            section: Section name passed to FrameProfiler.section
+
+        Returns:
+            Context manager timing the block, or doing nothing
+        """
+        if self.profiler is None:
+            return contextlib.nullcontext()
+        return self.profiler.section(section)
+
+    def draw_tile(
+        self, x: int, y: int, value: int, row_idx: int, col_idx: int, current_time: int
+    ) -> None:
+        """Draw a single tile on the screen.
+
+        Args:
+            x: X coordinate
+            y: Y coordinate
+            value: Tile value
+            row_idx: Grid row index
+            col_idx: Grid column index
+            current_time: Current game time in milliseconds
+        """
+        # Calculate animation parameters
+        anim_duration = self.animation_duration
+        elapsed = current_time - self.game.animation_start_time
+        is_anim_tile = (self.game.new_tile_position == (row_idx, col_idx)) and (
+            elapsed < anim_duration
+        )
+
+        # Blit the pre-rendered tile, or its animation frame if it is new
+        if is_anim_tile:
+            surface = self.atlas.frame(value, elapsed / anim_duration)
+        else:
+            if self.game.new_tile_position == (row_idx, col_idx):
+                self.game.new_tile_position = None
+            surface = self.atlas.tile(value)
+        self.screen.blit(surface, (x, y))
+
+    def render_text(
+        self, font: pygame.font.Font, text: str, color: Tuple[int, int, int]
+    ) -> pygame.Surface:
+        """Render static text once and reuse the surface afterwards.
+
+        Args:
+            font: Font to render with
+            text: Text to render
+            color: Text color
+
+        Returns:
+            Rendered text surface
+        """
+        key = (font, text, color)
+        surface = self.text_cache.get(key)
+        if surface is None:
+            surface = font.render(text, True, color)
+            self.text_cache[key] = surface
+        return surface
+
+    def tile_rect(self, row_idx: int, col_idx: int) -> pygame.Rect:
+        """Screen rectangle covered by a tile.
+
+        Args:
+            row_idx: Grid row index
+            col_idx: Grid column index
+
+        Returns:
+            Rectangle of the tile
+        """
+        x = (
+            (self.width - self.grid_width) // 2
+            + self.grid_padding * (col_idx + 1)
+            + self.tile_size * col_idx
+        )
+        y = (
+            self.grid_top_y
+            + self.grid_padding * (row_idx + 1)
+            + self.tile_size * row_idx
+        )
+        return pygame.Rect(x, y, self.tile_size, self.tile_size)
+
+    def draw_score(self) -> pygame.Rect:
+        """Draw the score box with the current score.
+
+        Returns:
+            Rectangle of the score box
+        """
+        score_rect = pygame.Rect(self.width // 2 - 70, 115, 140, 60)
+        self.screen.fill(self.config.background_color, score_rect)
+        pygame.draw.rect(
+            self.screen, self.config.grid_color, score_rect, border_radius=5
+        )
+
+        # Draw score label
+        score_label_text = self.render_text(
+            self.score_label_font, "SCORE", (255, 255, 255)
+        )
+        self.screen.blit(
+            score_label_text, (self.width // 2 - score_label_text.get_width() // 2, 123)
+        )
+
+        # Draw score
+        score_text = self.score_font.render(str(self.game.score), True, (255, 255, 255))
+        self.screen.blit(
+            score_text, (self.width // 2 - score_text.get_width() // 2, 143)
+        )
+        return score_rect
+
+    def draw_hint(self) -> pygame.Rect:
+        """Draw the hint box right of the score box, with an arrow for the hint.
+
+        Returns:
+            Rectangle of the hint box
+        """
+        hint_rect = pygame.Rect(self.width // 2 + 90, 115, 60, 60)
+        self.screen.fill(self.config.background_color, hint_rect)
+        if self.hint_action not in MOVE_ACTIONS:
+            return hint_rect
+
+        pygame.draw.rect(
+            self.screen, self.config.grid_color, hint_rect, border_radius=5
+        )
+        # Arrow along the move's direction; side offsets are across it
+        row_step, col_step = _MOVE_STEPS[MOVE_ACTIONS.index(self.hint_action)]
+        center_x, center_y = hint_rect.center
+
+        def point(along: int, side: int) -> Tuple[int, int]:
+            return (
+                center_x + col_step * along - row_step * side,
+                center_y + row_step * along + col_step * side,
+            )
+
+        pygame.draw.polygon(
+            self.screen,
+            (255, 255, 255),
+            [
+                point(-18, 5),
+                point(2, 5),
+                point(2, 14),
+                point(20, 0),
+                point(2, -14),
+                point(2, -5),
+                point(-18, -5),
+            ],
+        )
+        return hint_rect
+
+    def draw(self) -> None:
+        """Draw the complete game screen."""
+        with self.profile("draw.background"):
+            self.screen.fill(self.config.background_color)
+
+        with self.profile("draw.text"):
+            # Draw title
+            title_text = self.render_text(
+                self.title_font, "2048", self.config.text_color
+            )
+            self.screen.blit(
+                title_text,
+                (self.width // 2 - title_text.get_width() // 2, self.title_y),
+            )
+
+            # Draw subtitle
+            subtitle_text = self.render_text(
+                self.subtitle_font,
+                "Join the tiles, get to 2048!",
+                self.config.text_color,
+            )
+            self.screen.blit(
+                subtitle_text,
+                (self.width // 2 - subtitle_text.get_width() // 2, self.subtitle_y),
+            )
+
+            # Draw score box
+            self.draw_score()
+
+        with self.profile("draw.hint"):
+            self.draw_hint()
+
+        with self.profile("draw.background"):
+            # Draw main grid background
+            grid_rect = pygame.Rect(
+                (self.width - self.grid_width) // 2,
+                self.grid_top_y,
+                self.grid_width,
+                self.grid_height,
+            )
+            pygame.draw.rect(
+                self.screen, self.config.grid_color, grid_rect, border_radius=6
+            )
+
+        # Get current time for animations
+        current_time = self.now()
+
+        # Calculate bottom position for instructions
+        grid_bottom = self.grid_top_y + self.grid_height + 20
+
+        with self.profile("draw.tiles"):
+            # Draw each tile
+            board = self.game.board
+            for row_idx in range(self.game.grid_size):
+                for col_idx in range(self.game.grid_size):
+                    tile_rect = self.tile_rect(row_idx, col_idx)
+                    self.draw_tile(
+                        tile_rect.x,
+                        tile_rect.y,
+                        board[row_idx][col_idx],
+                        row_idx,
+                        col_idx,
+                        current_time,
+                    )
+
+        with self.profile("draw.text"):
+            # Draw instructions
+            instruction_text1 = self.render_text(
+                self.instruction_font,
+                "HOW TO PLAY: Use your arrow keys to move the tiles.",
+                self.config.text_color,
+            )
+            instruction_text2 = self.render_text(
+                self.instruction_font,
+                "When two tiles with the same number touch, they merge into one!",
+                self.config.text_color,
+            )
+            self.screen.blit(
+                instruction_text1,
+                (self.width // 2 - instruction_text1.get_width() // 2, grid_bottom),
+            )
+            self.screen.blit(
+                instruction_text2,
+                (
+                    self.width // 2 - instruction_text2.get_width() // 2,
+                    grid_bottom + 25,
+                ),
+            )
+
+        with self.profile("draw.background"):
+            # Draw footer line
+            pygame.draw.line(
+                self.screen,
+                (200, 200, 200),
+                (0, self.height - 10),
+                (self.width, self.height - 10),
+                1,
+            )
+
+        # Draw game over overlay if needed
+        if self.game.game_over:
+            with self.profile("draw.overlay"):
+                self.draw_game_over()
+
+    def draw_game_over(self) -> None:
+        """Draw the game over overlay and its text."""
+        self.screen.blit(self.overlay, (0, 0))
+
+        game_over_text = self.render_text(
+            self.title_font, "Game Over!", self.config.text_color
+        )
+        final_score_text = self.subtitle_font.render(
+            f"Final Score: {self.game.score}", True, self.config.text_color
+        )
+        restart_text = self.render_text(
+            self.subtitle_font, "Press 'R' to restart", self.config.text_color
+        )
+
+        self.screen.blit(
+            game_over_text,
+            (
+                self.width // 2 - game_over_text.get_width() // 2,
+                self.height // 2 - 50,
+            ),
+        )
+        self.screen.blit(
+            final_score_text,
+            (
+                self.width // 2 - final_score_text.get_width() // 2,
+                self.height // 2 + 10,
+            ),
+        )
+        self.screen.blit(
+            restart_text,
+            (
+                self.width // 2 - restart_text.get_width() // 2,
+                self.height // 2 + 40,
+            ),
+        )
+
+    def draw_changes(self) -> List[pygame.Rect]:
+        """Redraw only the parts of the screen that changed since the last call.
+
+        Changed tiles, the animated tile and the score box are redrawn; the
+        whole screen is redrawn on the first frame and when the game over
+        overlay appears or disappears.
+
+        Returns:
+            Screen rectangles that were redrawn
+        """
+        board = self.game.board
+        if (
+            self.needs_full_redraw
+            or self.drawn_board is None
+            or self.game.game_over != self.drawn_game_over
+        ):
+            self.draw()
+            dirty_rects = [self.screen.get_rect()]
+        else:
+            dirty_cells = {
+                (row_idx, col_idx)
+                for row_idx, row in enumerate(board)
+                for col_idx, value in enumerate(row)
+                if value != self.drawn_board[row_idx][col_idx]
+            }
+            # The animated tile keeps changing, and needs one last full-size draw
+            for cell in (self.animated_cell, self.game.new_tile_position):
+                if cell is not None:
+                    dirty_cells.add(cell)
+
+            current_time = self.now()
+            dirty_rects = []
+            with self.profile("draw.tiles"):
+                for row_idx, col_idx in dirty_cells:
+                    tile_rect = self.tile_rect(row_idx, col_idx)
+                    self.screen.fill(self.config.grid_color, tile_rect)
+                    self.draw_tile(
+                        tile_rect.x,
+                        tile_rect.y,
+                        board[row_idx][col_idx],
+                        row_idx,
+                        col_idx,
+                        current_time,
+                    )
+                    dirty_rects.append(tile_rect)
+
+            if self.game.score != self.drawn_score:
+                with self.profile("draw.text"):
+                    dirty_rects.append(self.draw_score())
+
+            if self.hint_action != self.drawn_hint:
+                with self.profile("draw.hint"):
+                    dirty_rects.append(self.draw_hint())
+
+        self.needs_full_redraw = False
+        self.drawn_board = [row.copy() for row in board]
+        self.drawn_score = self.game.score
+        self.drawn_game_over = self.game.game_over
+        self.drawn_hint = self.hint_action
+        self.animated_cell = self.game.new_tile_position
+        return dirty_rects
+
+    def draw_profile(self) -> pygame.Rect:
+        """Draw the profiler percentiles in the top-left corner.
+
+        The text is re-rendered at most twice a second so the overlay does
+        not dominate the timings it shows.
+
+        Returns:
+            Rectangle of the overlay
+        """
+        now = self.now()
+        if self.profile_surface is None or now - self.profile_updated >= 500:
+            lines = self.profiler.lines()
+            line_height = self.profile_font.get_linesize()
+            width = max(self.profile_font.size(line)[0] for line in lines) + 8
+            self.profile_surface = pygame.Surface((width, line_height * len(lines) + 8))
+            self.profile_surface.fill((0, 0, 0))
+            for idx, line in enumerate(lines):
+                text = self.profile_font.render(line, True, (255, 255, 255))
+                self.profile_surface.blit(text, (4, 4 + idx * line_height))
+            self.profile_updated = now
+        return self.screen.blit(self.profile_surface, (0, 0))
+
+    def record_finished_game(self) -> None:
+        """Queue the game for the history on the first frame it is over."""
+        if self.history is None or self.game.game_over == self.recorded_game_over:
+            return
+        if self.game.game_over:
+            self.history.record(GameRecord.from_game(self.game, self.config_hash))
+        self.recorded_game_over = self.game.game_over
+
+    def update_hint(self) -> None:
+        """Request a hint when the board changed and pick up finished searches.
+
+        The hint is cleared as soon as the board changes, so a search that
+        finishes late is never shown for a different position.
+        """
+        if not self.show_hints:
+            return
+        board = self.game.board_state()
+        if board != self.hint_board:
+            self.hint_board = board
+            self.hint_action = None
+            if self.game.game_over:
+                self.hints.cancel()
+            else:
+                self.hints.request(board)
+        elif self.hint_action is None:
+            self.hint_action = self.hints.poll()
+
+    def is_idle(self) -> bool:
+        """Whether nothing will change on screen until the next event.
+
+        Returns:
+            True if no animation, auto-play or hint search is running
+        """
+        hint_pending = (
+            self.show_hints and self.hint_action is None and not self.game.game_over
+        )
+        return (
+            self.game.new_tile_position is None
+            and not hint_pending
+            and not (self.auto_play and not self.game.game_over)
+        )
+
+    def handle_pygame_event(self, event: pygame.event.Event) -> Action:
+        """Convert a pygame event to a game action.
+
+        Args:
+            event: Pygame event to process
+
+        Returns:
+            Corresponding game action
+        """
+        if event.type == pygame.KEYDOWN:
+            key_to_action = {
+                pygame.K_LEFT: Action.LEFT,
+                pygame.K_RIGHT: Action.RIGHT,
+                pygame.K_UP: Action.UP,
+                pygame.K_DOWN: Action.DOWN,
+                pygame.K_r: Action.RESTART,
+                pygame.K_z: Action.UNDO,
+                pygame.K_y: Action.REDO,
+            }
+            return key_to_action.get(event.key, Action.NONE)
+        return Action.NONE
+
+    def run(self) -> None:
+        """Run the main game loop."""
+        self.init_pygame()
+        try:
+            self.loop()
+        finally:
+            if self.profiler is not None:
+                self.profiler.write_json(self.profile_path)
+            if self.history is not None:
+                self.history.close()
+
+        # Clean up
+        self.player.close()
+        self.hints.close()
+        pygame.quit()
+        sys.exit()
+
+    def loop(self) -> None:
+        """Process events and draw frames until the window is closed."""
+        running = True
+
+        while running:
+            # Sleep until something happens when there is nothing to animate
+            events = pygame.event.get()
+            if not events and self.is_idle():
+                events = [pygame.event.wait()]
+            current_time = self.now()
+
+            # Process events
+            with self.profile("events"):
+                for event in events:
+                    if event.type == pygame.QUIT:
+                        running = False
+
+                    if event.type in (pygame.VIDEOEXPOSE, pygame.WINDOWEXPOSED):
+                        self.needs_full_redraw = True
+
+                    # Handle input with debouncing
+                    if event.type == pygame.KEYDOWN:
+                        if event.key == pygame.K_a:
+                            self.auto_play = not self.auto_play
+                            continue
+
+                        if event.key == pygame.K_h:
+                            self.show_hints = not self.show_hints
+                            self.hints.cancel()
+                            self.hint_board = None
+                            self.hint_action = None
+                            continue
+
+                        if event.key == pygame.K_p and self.profiler is not None:
+                            self.show_profile = not self.show_profile
+                            self.needs_full_redraw = True
+                            continue
+
+                        if current_time - self.last_action_time < self.debounce_time:
+                            continue
+
+                        action = self.handle_pygame_event(event)
+                        with self.profile("handle_action"):
+                            moved = self.game.handle_action(action)
+
+                        if moved:
+                            self.game.animation_start_time = current_time
+                            self.last_action_time = current_time
+
+            # Let the auto-player move, within its time budget, once per debounce
+            if (
+                self.auto_play
+                and not self.game.game_over
+                and current_time - self.last_action_time >= self.debounce_time
+            ):
+                with self.profile("ai"):
+                    action = self.player.choose_action(self.game)
+                with self.profile("handle_action"):
+                    moved = self.game.handle_action(action)
+                if moved:
+                    self.game.animation_start_time = current_time
+                    self.last_action_time = current_time
+            self.record_finished_game()
+            self.update_hint()
+
+            # Update only the changed parts of the display
+            with self.profile("draw"):
+                dirty_rects = self.draw_changes()
+                if self.show_profile:
+                    dirty_rects.append(self.draw_profile())
+            if dirty_rects:
+                with self.profile("display.update"):
+                    pygame.display.update(dirty_rects)
+            with self.profile("clock.tick"):
+                self.clock.tick(self.fps)
+            if self.profiler is not None:
+                self.profiler.end_frame()
+
+
+# Terminal renderer
+#
+# Draws the game with ANSI escape sequences for terminals without a display,
+# such as over SSH. Every frame compares the board and score with what is on
+# screen and only moves the cursor to, and repaints, the cells and score
+# digits that changed, so a move costs a few dozen bytes instead of a repaint.
+
+ANSI_CELL_WIDTH = 7
+ANSI_GRID_TOP = 3
+ANSI_SCORE_WIDTH = 10
+ANSI_KEYS: Dict[bytes, Action] = {
+    b"\x1b[A": Action.UP,
+    b"\x1b[B": Action.DOWN,
+    b"\x1b[C": Action.RIGHT,
+    b"\x1b[D": Action.LEFT,
+    b"\x1bOA": Action.UP,
+    b"\x1bOB": Action.DOWN,
+    b"\x1bOC": Action.RIGHT,
+    b"\x1bOD": Action.LEFT,
+    b"r": Action.RESTART,
+    b"R": Action.RESTART,
+    b"z": Action.UNDO,
+    b"Z": Action.UNDO,
+    b"y": Action.REDO,
+    b"Y": Action.REDO,
+}
+
+
+def _ansi_color(color: Tuple[int, ...], background: bool) -> str:
+    """24-bit color escape sequence for an RGB color."""
+    return f"\x1b[{48 if background else 38};2;{color[0]};{color[1]};{color[2]}m"
+
+
+class TerminalRenderer:
+    """Renders the game in a terminal and reads arrow keys from raw stdin."""
+
+    def __init__(
+        self, game: Game, config: GameConfig, history_path: Optional[str] = None
+    ) -> None:
+        """Initialize the renderer.
+
+        Args:
+            game: Game instance to render
+            config: Configuration parameters
+            history_path: SQLite database to record finished games in, or
+                None to keep no history
+        """
+        self.game = game
+        self.config = config
+        self.debounce_time = config.debounce_time
+        self.auto_play: bool = False
+        self.player = create_player(config)
+        self.cell_styles: Dict[int, str] = {}
+        if isinstance(game, Game):
+            game.enable_undo(config.undo_memory_kb)
+
+        # What is currently on screen, so only changes are written
+        self.drawn_board: Optional[List[List[int]]] = None
+        self.drawn_score: str = ""
+        self.drawn_game_over: bool = False
+
+        # Each finished game is queued for the history once
+        self.history = GameHistory(history_path) if history_path else None
+        self.config_hash = config_hash(config) if history_path else ""
+
+    def cell_style(self, value: int) -> str:
+        """Escape sequence and padded text of a tile, cached per value."""
+        style = self.cell_styles.get(value)
+        if style is None:
+            config = self.config
+            if value:
+                color = config.tile_colors.get(value, config.tile_colors[2048])
+                text_color = config.text_colors.get(value, config.light_text)
+                text = str(value).center(ANSI_CELL_WIDTH - 1)
+            else:
+                # Blend the translucent empty tile over the grid like pygame does
+                tile = config.tile_colors.get(0, config.empty_tile)
+                alpha = tile[3] / 255 if len(tile) > 3 else 1.0
+                color = tuple(
+                    round(grid + (cell - grid) * alpha)
+                    for grid, cell in zip(config.grid_color, tile[:3])
+                )
+                text_color = config.text_color
+                text = " " * (ANSI_CELL_WIDTH - 1)
+            style = _ansi_color(color, True) + _ansi_color(text_color, False) + text
+            self.cell_styles[value] = style
+        return style
+
+    def render(self) -> str:
+        """Escape sequences that bring the screen up to date with the game.
+
+        Returns:
+            Text to write to the terminal, empty if nothing changed
+        """
+        game = self.game
+        board = game.board
+        size = game.grid_size
+        out: List[str] = []
+        if self.drawn_board is None:
+            out.append("\x1b[0m\x1b[2J\x1b[H\x1b[1m2048\x1b[0m   Score:")
+            help_row = ANSI_GRID_TOP + size + 1
+            out.append(
+                f"\x1b[{help_row};1HArrows move, 'z'/'y' undo/redo, 'r' restarts, "
+                "'a' toggles auto-play, 'q' quits"
+            )
+            self.drawn_board = [[-1] * size for _ in range(size)]
+            self.drawn_score = " " * ANSI_SCORE_WIDTH
+
+        num_parts = len(out)
+        for row_idx, row in enumerate(board):
+            drawn_row = self.drawn_board[row_idx]
+            for col_idx, value in enumerate(row):
+                if value != drawn_row[col_idx]:
+                    out.append(
+                        f"\x1b[{ANSI_GRID_TOP + row_idx};"
+                        f"{1 + col_idx * ANSI_CELL_WIDTH}H{self.cell_style(value)}"
+                    )
+                    drawn_row[col_idx] = value
+        if len(out) > num_parts:
+            out.append("\x1b[0m")
+
+        # Rewrite only the runs of score digits that changed
+        score = str(game.score).rjust(ANSI_SCORE_WIDTH)
+        column = 0
+        while column < ANSI_SCORE_WIDTH:
+            if score[column] == self.drawn_score[column]:
+                column += 1
+                continue
+            end = column
+            while end < ANSI_SCORE_WIDTH and score[end] != self.drawn_score[end]:
+                end += 1
+            out.append(f"\x1b[1;{15 + column}H{score[column:end]}")
+            column = end
+        self.drawn_score = score
+
+        if game.game_over != self.drawn_game_over:
+            if game.game_over and self.history is not None:
+                self.history.record(GameRecord.from_game(game, self.config_hash))
+            message = "Game over! Press 'r' to restart" if game.game_over else ""
+            out.append(f"\x1b[{ANSI_GRID_TOP + size};1H\x1b[2K{message}")
+            self.drawn_game_over = game.game_over
+        return "".join(out)
+
+    def read_actions(self, data: bytes) -> List[Union[Action, bytes]]:
+        """Split raw key input into actions and other single keys.
+
+        Args:
+            data: Bytes read from stdin
+
+        Returns:
+            Actions for recognized keys, and the raw bytes of other keys
+        """
+        keys: List[Union[Action, bytes]] = []
+        idx = 0
+        while idx < len(data):
+            for length in (3, 1):
+                key = data[idx : idx + length]
+                if key in ANSI_KEYS:
+                    keys.append(ANSI_KEYS[key])
+                    idx += length
+                    break
+            else:
+                keys.append(data[idx : idx + 1])
+                idx += 1
+        return keys
+
+    def run(self) -> None:
+        """Run the game loop until 'q' or Ctrl+C."""
+        import select
+        import termios
+        import tty
+
+        stdin = sys.stdin.fileno()
+        stdout = sys.stdout.fileno()
+        saved = termios.tcgetattr(stdin)
+        # Alternate screen, hidden cursor
+        os.write(stdout, b"\x1b[?1049h\x1b[?25l")
+        try:
+            tty.setcbreak(stdin)
+            self.game.restart()
+            last_action_time = 0.0
+            running = True
+            while running:
+                frame = self.render()
+                if frame:
+                    os.write(stdout, frame.encode())
+
+                # Wait for a key, or until the auto-player may move again
+                timeout = None
+                if self.auto_play and not self.game.game_over:
+                    timeout = max(
+                        0.0,
+                        last_action_time + self.debounce_time / 1000 - time.monotonic(),
+                    )
+                readable, _, _ = select.select([stdin], [], [], timeout)
+                if readable:
+                    for key in self.read_actions(os.read(stdin, 64)):
+                        if key in (b"q", b"Q", b"\x03"):
+                            running = False
+                        elif key in (b"a", b"A"):
+                            self.auto_play = not self.auto_play
+                        elif isinstance(key, Action):
+                            self.game.handle_action(key)
+                elif self.auto_play and not self.game.game_over:
+                    self.game.handle_action(self.player.choose_action(self.game))
+                    last_action_time = time.monotonic()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            termios.tcsetattr(stdin, termios.TCSADRAIN, saved)
+            os.write(stdout, b"\x1b[0m\x1b[?25h\x1b[?1049l")
+            self.player.close()
+            if self.history is not None:
+                self.history.close()
+
+
+# Replay export
+#
+# Replays are drawn offscreen with SDL's dummy video driver on a Renderer
+# whose virtual clock advances one frame interval per frame, so animations
+# play out as they would at the configured fps however fast frames are
+# produced. Raw frames are copied out of the screen into one array that every
+# frame reuses. Games are exported in batches on a process pool, each game
+# to its own PNG directory, raw file or pipe, so workers never share output.
+
+EXPORT_FORMATS = ("png", "raw")
+
+
+class FrameExporter:
+    """Draws the frames of replays on an offscreen Renderer."""
+
+    def __init__(
+        self, config: GameConfig, grid_size: int, engine: str, frames_per_move: int
+    ) -> None:
+        """Initialize pygame with the dummy video driver and the renderer.
+
+        Args:
+            config: Game configuration; fps sets the frame interval
+            grid_size: Grid size of the replays to draw
+            engine: Engine the replays were recorded with
+            frames_per_move: Frames drawn after each move
+        """
+        self.grid_size = grid_size
+        self.engine = engine
+        os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+        # pygame's import banner would land in frames streamed to stdout
+        os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+        config = config.model_copy(update={"grid_size": grid_size, "engine": engine})
+        self.renderer = Renderer(create_game(config), config)
+        self.renderer.init_pygame()
+        self.frames_per_move = frames_per_move
+        self.frame = np.empty((self.renderer.height, self.renderer.width, 3), np.uint8)
+
+    def draw_frames(self, replay: Replay) -> Iterator[int]:
+        """Draw a replay frame by frame on the renderer's screen.
+
+        The start position is shown for frames_per_move frames, and so is the
+        position after every move.
+
+        Args:
+            replay: Recorded game, with the exporter's grid size and engine
+
+        Yields:
+            Index of each frame, once it is on the screen
+
+        Raises:
+            ValueError: If a recorded move does not change the board
+        """
+        renderer = self.renderer
+        game = renderer.game
+        game.restart(replay.seed)
+        renderer.needs_full_redraw = True
+        renderer.virtual_time = game.animation_start_time = 0
+        frame_idx = 0
+        for move_idx, action in enumerate([Action.NONE, *replay.actions()]):
+            if action is not Action.NONE:
+                if not game.handle_action(action):
+                    raise ValueError(
+                        f"Move {move_idx - 1} ({action.name}) does not change the board"
+                    )
+                game.animation_start_time = renderer.virtual_time
+            for _ in range(self.frames_per_move):
+                renderer.draw_changes()
+                yield frame_idx
+                frame_idx += 1
+                renderer.virtual_time = round(frame_idx * 1000 / renderer.fps)
+
+    def rgb_frame(self) -> np.ndarray:
+        """Copy the screen into the exporter's frame array.
+
+        Returns:
+            The (height, width, 3) frame array, overwritten on the next call
+        """
+        pixels = pygame.surfarray.pixels3d(self.renderer.screen)
+        np.copyto(self.frame, pixels.transpose(1, 0, 2))
+        # The screen stays locked, and cannot be drawn on, while a view exists
+        del pixels
+        return self.frame
+
+    def close(self) -> None:
+        """Shut pygame down."""
+        self.renderer.player.close()
+        pygame.quit()
+
+
+def export_replays(
+    path: str,
+    game_indices: Sequence[int],
+    config: GameConfig,
+    output: str,
+    fmt: str,
+    frames_per_move: int,
+    pipe_command: Optional[str] = None,
+) -> int:
+    """Export games of a replay file as frames; runs inside a worker process.
+
+    PNG frames go to OUTPUT/game_<index>/frame_<frame>.png. Raw RGB frames
+    go to OUTPUT/game_<index>.rgb, to standard output if OUTPUT is "-", or
+    to the standard input of pipe_command, run once per game after filling
+    in {game}, {width}, {height} and {fps}.
+
+    Args:
+        path: Replay file written by ReplayWriter
+        game_indices: Indices of the games to export, in file order
+        config: Game configuration parameters
+        output: Output directory, or "-" for raw frames on standard output
+        fmt: One of EXPORT_FORMATS
+        frames_per_move: Frames drawn for the start position and each move
+        pipe_command: Command to pipe each game's raw frames to
+
+    Returns:
+        Number of frames exported
+
+    Raises:
+        ValueError: If a recorded move does not change the board
+        subprocess.CalledProcessError: If pipe_command fails
+    """
+    import shlex
+    import subprocess
+
+    wanted = set(game_indices)
+    exporter: Optional[FrameExporter] = None
+    frames = 0
+    try:
+        for game_idx, replay in enumerate(read_replays(path)):
+            if game_idx not in wanted:
+                continue
+            if exporter is None or (exporter.grid_size, exporter.engine) != (
+                replay.grid_size,
+                replay.engine,
+            ):
+                if exporter is not None:
+                    exporter.close()
+                exporter = FrameExporter(
+                    config, replay.grid_size, replay.engine, frames_per_move
+                )
+
+            name = f"game_{game_idx:05d}"
+            if fmt == "png":
+                directory = os.path.join(output, name)
+                os.makedirs(directory, exist_ok=True)
+                for frame_idx in exporter.draw_frames(replay):
+                    pygame.image.save(
+                        exporter.renderer.screen,
+                        os.path.join(directory, f"frame_{frame_idx:06d}.png"),
+                    )
+                    frames += 1
+                continue
+
+            with contextlib.ExitStack() as stack:
+                if pipe_command is not None:
+                    command = pipe_command.format(
+                        game=name,
+                        width=exporter.renderer.width,
+                        height=exporter.renderer.height,
+                        fps=exporter.renderer.fps,
+                    )
+                    process = stack.enter_context(
+                        subprocess.Popen(shlex.split(command), stdin=subprocess.PIPE)
+                    )
+                    sink = process.stdin
+                elif output == "-":
+                    sink = sys.stdout.buffer
+                else:
+                    sink = stack.enter_context(
+                        open(os.path.join(output, name + ".rgb"), "wb")
+                    )
+                for _ in exporter.draw_frames(replay):
+                    sink.write(exporter.rgb_frame())
+                    frames += 1
+                sink.flush()
+            if pipe_command is not None and process.returncode:
+                raise subprocess.CalledProcessError(process.returncode, command)
+    finally:
+        if exporter is not None:
+            exporter.close()
+    return frames
+
+
+def load_config(config_path: Optional[str] = None) -> GameConfig:
+    """Load game configuration from a file or use defaults.
+
+    Args:
+        config_path: Path to YAML config file, or None to use defaults
+
+    Returns:
+        Game configuration object
+    """
+    if config_path:
+        # Only config files need the YAML parser and pydantic's type coercion
+        import yaml
+        from pydantic import TypeAdapter
+
+        try:
+            with open(config_path, "r") as f:
+                data = yaml.safe_load(f)
+            return TypeAdapter(GameConfig).validate_python(data)
+        except Exception as e:
+            print(f"Error loading config file {config_path}: {e}")
+            print("Using default configuration instead.")
+
+    return GameConfig()
+
+
+def override_config(config: GameConfig, overrides: Dict[str, Any]) -> GameConfig:
+    """Apply command-line overrides to a configuration.
+
+    Args:
+        config: Configuration to start from
+        overrides: Settings to replace; None values are options not given
+
+    Returns:
+        Updated configuration
+
+    Raises:
+        click.UsageError: If an override is out of bounds
+    """
+    try:
+        return config.model_copy(
+            update={key: value for key, value in overrides.items() if value is not None}
+        )
+    except ValueError as e:
+        raise click.UsageError(str(e)) from e
+
+
+# Startup benchmark
+#
+# Each run starts a fresh interpreter, so imports are measured cold.
+
+STARTUP_PROBE = """
+import importlib.util, sys, time
+start = time.perf_counter()
+spec = importlib.util.spec_from_file_location("game2048", sys.argv[1])
+module = importlib.util.module_from_spec(spec)
+sys.modules[spec.name] = module
+spec.loader.exec_module(module)
+imported = time.perf_counter()
+config = module.GameConfig()
+renderer = module.Renderer(module.create_game(config), config)
+renderer.init_pygame()
+module.pygame.display.update(renderer.draw_changes())
+frame = time.perf_counter()
+print((imported - start) * 1000, (frame - start) * 1000)
+"""
+
+
+def measure_startup(runs: int) -> Dict[str, float]:
+    """Measure cold import time and time to first frame in fresh interpreters.
+
+    Frames are drawn with SDL's dummy video driver, so no display is needed.
+
+    Args:
+        runs: Number of interpreters to start
+
+    Returns:
+        Median import, first frame and whole process times in milliseconds
+    """
+    import subprocess
+
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", PYGAME_HIDE_SUPPORT_PROMPT="1")
+    import_times = []
+    frame_times = []
+    process_times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        output = subprocess.run(
+            [sys.executable, "-c", STARTUP_PROBE, os.path.abspath(__file__)],
+            env=env,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout
+        process_times.append((time.perf_counter() - start) * 1000)
+        import_ms, frame_ms = output.split()[-2:]
+        import_times.append(float(import_ms))
+        frame_times.append(float(frame_ms))
+    return {
+        "import_ms": statistics.median(import_times),
+        "first_frame_ms": statistics.median(frame_times),
+        "process_ms": statistics.median(process_times),
+    }
+
+
+# Benchmark suite
+#
+# Every operation runs over the same seeded fixtures: positions sampled from
+# corner-policy games, so boards look like real mid-games rather than random
+# noise. Results are nanoseconds per call, the median over several rounds,
+# keyed "<engine>/<operation>/<grid size>".
+
+BENCH_GRID_SIZES = tuple(range(2, 9))
+
+
+def bench_fixtures(
+    config: GameConfig, count: int = 256, seed: int = 0
+) -> List[List[List[int]]]:
+    """Sample realistic boards from seeded corner-policy games.
+
+    Games on large grids last very long, so each is cut off after 25 moves
+    per cell.
+
+    Args:
+        config: Game configuration; the list engine is always used
+        count: Number of boards to return
+        seed: Seed for the games and the sampling
+
+    Returns:
+        Boards, each still playable
+    """
+    rng = random.Random(seed)
+    game = Game(config.model_copy(update={"engine": "list"}), seed)
+    max_moves = 25 * config.grid_size * config.grid_size
+    boards: List[List[List[int]]] = []
+    while len(boards) < count:
+        game.restart()
+        history = []
+        while not game.game_over and len(history) < max_moves:
+            history.append([row.copy() for row in game.board])
+            game.handle_action(corner_policy(game, rng))
+        boards.extend(rng.sample(history, min(len(history), 8)))
+    return boards[:count]
+
+
+def _time_calls(setup: Callable[[], List[Callable[[], object]]], rounds: int) -> float:
+    """Median nanoseconds per call over several rounds, after a warm-up round.
+
+    Args:
+        setup: Builds the calls of one round; runs outside the timing
+        rounds: Number of rounds
+
+    Returns:
+        Median time per call in nanoseconds
+    """
+    timings = []
+    for _ in range(rounds + 1):
+        calls = setup()
+        start = time.perf_counter_ns()
+        for call in calls:
+            call()
+        timings.append((time.perf_counter_ns() - start) / len(calls))
+    return statistics.median(timings[1:])
+
+
+def bench_engine(
+    config: GameConfig, boards: List[List[List[int]]], rounds: int
+) -> Dict[str, float]:
+    """Time the game operations of one engine on a set of boards.
+
+    Args:
+        config: Game configuration selecting the engine and grid size
+        boards: Fixture boards
+        rounds: Timing rounds per operation
+
+    Returns:
+        Nanoseconds per call for each operation the engine supports
+    """
+    template = create_game(config, 0)
+    template.restart(0)
+
+    def games() -> List[Game]:
+        result = []
+        for board in boards:
+            game = template.clone()
+            game.board = [row.copy() for row in board]
+            game.update_empty_cells()
+            result.append(game)
+        return result
+
+    def bound(name: str, *args: object) -> Callable[[], List[Callable[[], object]]]:
+        return lambda: [
+            functools.partial(getattr(game, name), *args) for game in games()
+        ]
+
+    operations: Dict[str, Callable[[], List[Callable[[], object]]]] = {}
+    if isinstance(template, Game) and not isinstance(template, BitboardGame):
+        rows = [row for board in boards for row in board]
+        operations["merge_row"] = lambda: [
+            functools.partial(template.merge_row, row.copy()) for row in rows
+        ]
+    for action in MOVE_ACTIONS:
+        name = f"move_{action.name.lower()}"
+        operations[name] = bound(name)
+    if hasattr(template, "transpose"):
+        operations["transpose"] = bound("transpose")
+    operations["add_random_tile"] = bound("add_random_tile")
+    operations["is_game_over"] = bound("is_game_over")
+    # Cycle the directions so every engine path is part of the average
+    operations["handle_action"] = lambda: [
+        functools.partial(game.handle_action, MOVE_ACTIONS[idx % len(MOVE_ACTIONS)])
+        for idx, game in enumerate(games())
+    ]
+    return {name: _time_calls(setup, rounds) for name, setup in operations.items()}
+
+
+def bench_draw(config: GameConfig, boards: List[List[List[int]]], rounds: int) -> float:
+    """Time full-screen Renderer.draw calls with SDL's dummy video driver.
+
+    Args:
+        config: Game configuration
+        boards: Fixture boards to draw
+        rounds: Timing rounds
+
+    Returns:
+        Nanoseconds per draw
+    """
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    renderer = Renderer(create_game(config, 0), config)
+    renderer.init_pygame()
+
+    def setup() -> List[Callable[[], object]]:
+        calls = []
+        for board in boards:
+
+            def draw(board: List[List[int]] = board) -> None:
+                renderer.game.board = board
+                renderer.draw()
+
+            calls.append(draw)
+        return calls
+
+    try:
+        return _time_calls(setup, rounds)
+    finally:
+        renderer.player.close()
+        pygame.quit()
+
+
+def run_benchmarks(
+    engines: Sequence[str],
+    grid_sizes: Sequence[int],
+    rounds: int = 5,
+    draw: bool = True,
+    startup_runs: int = 0,
+) -> Dict[str, Any]:
+    """Run the benchmark suite.
+
+    Args:
+        engines: Engines to benchmark; grid sizes an engine rejects are skipped
+        grid_sizes: Grid sizes to benchmark
+        rounds: Timing rounds per operation
+        draw: Whether to time Renderer.draw on each grid size
+        startup_runs: Cold starts to measure, 0 to skip startup
+
+    Returns:
+        Environment metadata and nanoseconds per call keyed
+        "<engine>/<operation>/<grid size>"
+    """
+    import platform
+
+    results: Dict[str, float] = {}
+    for grid_size in grid_sizes:
+        config = GameConfig(grid_size=grid_size)
+        boards = bench_fixtures(config)
+        for engine in engines:
+            engine_config = config.model_copy(update={"engine": engine})
+            try:
+                create_game(engine_config)
+            except ValueError:
+                continue
+            for name, value in bench_engine(engine_config, boards, rounds).items():
+                results[f"{engine}/{name}/{grid_size}"] = value
+        if draw:
+            results[f"render/draw/{grid_size}"] = bench_draw(config, boards, rounds)
+    if startup_runs:
+        startup = measure_startup(startup_runs)
+        results["startup/import/0"] = startup["import_ms"] * 1e6
+        results["startup/first_frame/0"] = startup["first_frame_ms"] * 1e6
+    return {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "results": results,
+    }
+
+
+def compare_benchmarks(
+    baseline: Dict[str, float], current: Dict[str, float], threshold: float
+) -> List[Tuple[str, float, float, float, bool]]:
+    """Compare two benchmark result sets.
+
+    Args:
+        baseline: Nanoseconds per call from the baseline run
+        current: Nanoseconds per call from the run to check
+        threshold: Slowdown in percent above which a benchmark regressed
+
+    Returns:
+        For every benchmark in both runs: key, baseline, current, change in
+        percent and whether it regressed
+    """
+    rows = []
+    for key in sorted(baseline.keys() & current.keys()):
+        before, after = baseline[key], current[key]
+        change = (after - before) / before * 100 if before else 0.0
+        rows.append((key, before, after, change, change > threshold))
+    return rows
+
+
+@click.group(invoke_without_command=True)
+@click.option(
+    "--grid-size",
+    "-g",
+    default=4,
+    help="Size of the game grid (e.g. 4 for 4x4)",
+    type=int,
+)
+@click.option(
+    "--tile-size", "-t", default=100, help="Size of each tile in pixels", type=int
+)
+@click.option("--fps", "-f", default=60, help="Frames per second", type=int)
+@click.option(
+    "--engine",
+    "-e",
+    type=click.Choice(sorted(GAME_ENGINES)),
+    default=None,
+    help="Game engine (overrides the config file)",
+)
+@click.option("--auto", "-a", "auto_play", is_flag=True, help="Start in auto-play mode")
+@click.option(
+    "--ai",
+    type=click.Choice(["expectimax", "montecarlo"]),
+    default=None,
+    help="Auto-play strategy (overrides the config file)",
+)
+@click.option(
+    "--rollouts",
+    default=None,
+    help="Monte Carlo rollouts per move (overrides the config file)",
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--ai-workers",
+    default=None,
+    help="Monte Carlo worker processes (overrides the config file)",
+    type=click.IntRange(min=0),
+)
+@click.option(
+    "--profile",
+    "profile_path",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Time each part of the game loop and write the results to this JSON file",
+)
+@click.option(
+    "--terminal",
+    "-T",
+    is_flag=True,
+    help="Play in the terminal with ANSI colors instead of a pygame window",
+)
+@click.option(
+    "--history",
+    "history_path",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Record every finished game in this SQLite database",
+)
+@click.option(
+    "--config",
+    "-c",
+    "config_path",
+    type=click.Path(exists=True),
+    help="Path to config YAML file",
+)
+@click.pass_context
+def main(
+    ctx: click.Context,
+    grid_size: int,
+    tile_size: int,
+    fps: int,
+    engine: Optional[str],
+    auto_play: bool,
+    ai: Optional[str],
+    rollouts: Optional[int],
+    ai_workers: Optional[int],
+    profile_path: Optional[str],
+    terminal: bool,
+    history_path: Optional[str],
+    config_path: Optional[str],
+) -> None:
+    """2048 Game - Join the tiles, get to 2048!
+
+    Use arrow keys to move tiles, 'R' to restart, 'Z' and 'Y' to undo and
+    redo, 'H' to toggle move hints, 'A' to toggle auto-play and 'P' to toggle
+    the profiler overlay when profiling.
+    """
+    if ctx.invoked_subcommand is not None:
+        return
+
+    # Load configuration
+    cfg = load_config(config_path)
+
+    # Override config fields with command-line options
+    cfg = override_config(
+        cfg,
+        {
+            "grid_size": grid_size,
+            "tile_size": tile_size,
+            "fps": fps,
+            "engine": engine,
+            "ai_player": ai,
+            "mc_rollouts": rollouts,
+            "mc_workers": ai_workers,
+        },
+    )
+
+    # Start the game
+    try:
+        game = create_game(cfg)
+    except ValueError as e:
+        raise click.UsageError(str(e)) from e
+    if terminal:
+        if profile_path is not None:
+            raise click.UsageError("--profile is not supported with --terminal")
+        renderer: Union[Renderer, TerminalRenderer] = TerminalRenderer(
+            game, cfg, history_path
+        )
+    else:
+        renderer = Renderer(game, cfg, profile_path, history_path)
+    renderer.auto_play = auto_play
+    renderer.run()
+
+
+@main.command()
+@click.option("--games", "-n", default=1000, help="Number of games to play", type=int)
+@click.option(
+    "--policy",
+    "-p",
+    type=click.Choice(sorted(POLICIES)),
+    default="random",
+    help="Policy choosing the moves",
+)
+@click.option(
+    "--workers",
+    "-w",
+    default=os.cpu_count() or 1,
+    help="Number of worker processes (defaults to all cores)",
+    type=int,
+)
+@click.option("--seed", "-s", default=0, help="Base random seed", type=int)
+@click.option(
+    "--grid-size",
+    "-g",
+    default=4,
+    help="Size of the game grid (e.g. 4 for 4x4)",
+    type=int,
+)
+@click.option(
+    "--engine",
+    "-e",
+    type=click.Choice(sorted(GAME_ENGINES)),
+    default=None,
+    help="Game engine (overrides the config file)",
+)
+@click.option(
+    "--config",
+    "-c",
+    "config_path",
+    type=click.Path(exists=True),
+    help="Path to config YAML file",
+)
+@click.option(
+    "--record",
+    "replay_path",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Append a replay of every game to this file",
+)
+@click.option(
+    "--history",
+    "history_path",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Record every game in this SQLite database",
+)
+def simulate(
+    games: int,
+    policy: str,
+    workers: int,
+    seed: int,
+    grid_size: int,
+    engine: Optional[str],
+    config_path: Optional[str],
+    replay_path: Optional[str],
+    history_path: Optional[str],
+) -> None:
+    """Play games headlessly across all cores and report statistics."""
+    if games < 1 or workers < 1:
+        raise click.UsageError("--games and --workers must be at least 1")
+
+    cfg = override_config(
+        load_config(config_path), {"grid_size": grid_size, "engine": engine}
+    )
+
+    # Fail fast on an invalid engine setup instead of inside every worker
+    try:
+        create_game(cfg)
+    except ValueError as e:
+        raise click.UsageError(str(e)) from e
+
+    start = time.perf_counter()
+    results = run_simulation(
+        cfg, policy, games, workers, seed, replay_path, history_path
+    )
+    elapsed = time.perf_counter() - start
+
+    click.echo(f"Policy: {policy}  engine: {cfg.engine}  workers: {workers}")
+    click.echo(format_simulation_report(results, elapsed))
+
+
+@main.command()
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--game",
+    "game_idx",
+    default=None,
+    type=int,
+    help="Index of the game to rebuild (defaults to checking every game)",
+)
+@click.option(
+    "--moves",
+    "-m",
+    default=None,
+    type=int,
+    help="Number of moves to replay (defaults to the whole game)",
+)
+@click.option(
+    "--engine",
+    "-e",
+    type=click.Choice(sorted(GAME_ENGINES)),
+    default=None,
+    help="Engine the games must have been recorded with (defaults to the recorded one)",
+)
+@click.option(
+    "--config",
+    "-c",
+    "config_path",
+    type=click.Path(exists=True),
+    help="Path to config YAML file",
+)
+def replay(
+    path: str,
+    game_idx: Optional[int],
+    moves: Optional[int],
+    engine: Optional[str],
+    config_path: Optional[str],
+) -> None:
+    """Rebuild a recorded position, or re-simulate every game in a replay file.
+
+    Games are replayed on the engine they were recorded with.
+    """
+    cfg = load_config(config_path)
+
+    try:
+        if game_idx is not None:
+            recorded = next(itertools.islice(read_replays(path), game_idx, None), None)
+            if recorded is None:
+                raise click.UsageError(f"{path} has no game {game_idx}")
+            game = replay_game(recorded, cfg, moves, engine)
+            click.echo(f"Game {game_idx}  seed: {recorded.seed}  score: {game.score}")
+            for row in game.board:
+                click.echo(" ".join(f"{value:>6}" for value in row))
+            return
+
+        start = time.perf_counter()
+        games = total_moves = mismatches = 0
+        for recorded in read_replays(path):
+            game = replay_game(recorded, cfg, engine=engine)
+            games += 1
+            total_moves += recorded.num_moves
+            mismatches += game.score != recorded.score
+    except ValueError as e:
+        raise click.UsageError(str(e)) from e
+    elapsed = time.perf_counter() - start
+
+    click.echo(f"Games: {games}  moves: {total_moves} in {elapsed:.2f}s")
+    click.echo(f"  moves/sec: {total_moves / max(elapsed, 1e-9):,.1f}")
+    click.echo(f"  score mismatches: {mismatches}")
+    if mismatches:
+        sys.exit(1)
+
+
+@main.command()
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.argument("output", type=click.Path(file_okay=False, allow_dash=True))
+@click.option(
+    "--format",
+    "fmt",
+    type=click.Choice(EXPORT_FORMATS),
+    default="png",
+    help="Numbered PNG files, or raw RGB24 frames",
+)
+@click.option(
+    "--game",
+    "game_indices",
+    multiple=True,
+    type=click.IntRange(min=0),
+    help="Index of a game to export; repeat for several (defaults to all)",
+)
+@click.option(
+    "--pipe",
+    "pipe_command",
+    default=None,
+    help="Pipe each game's raw frames to this command, which may use "
+    "{game}, {width}, {height} and {fps}",
+)
+@click.option(
+    "--frames-per-move",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Frames per move (defaults to the tile animation plus one frame)",
+)
+@click.option("--fps", "-f", default=None, help="Frame rate of the export", type=int)
+@click.option(
+    "--workers",
+    "-w",
+    default=os.cpu_count() or 1,
+    help="Number of worker processes (defaults to all cores)",
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--config",
+    "-c",
+    "config_path",
+    type=click.Path(exists=True),
+    help="Path to config YAML file",
+)
+def export(
+    path: str,
+    output: str,
+    fmt: str,
+    game_indices: Tuple[int, ...],
+    pipe_command: Optional[str],
+    frames_per_move: Optional[int],
+    fps: Optional[int],
+    workers: int,
+    config_path: Optional[str],
+) -> None:
+    """Render replays offscreen to frames for video, without a window.
+
+    OUTPUT is a directory that gets game_<index>/frame_<frame>.png files,
+    or game_<index>.rgb files with --format raw. With --format raw, OUTPUT
+    "-" streams every frame to standard output from a single process, and
+    --pipe runs a command per game fed with its frames, for example:
+
+    \b
+        --pipe "ffmpeg -f rawvideo -pix_fmt rgb24 -s {width}x{height}
+        -r {fps} -i - {game}.mp4"
+    """
+    import subprocess
+
+    cfg = override_config(load_config(config_path), {"fps": fps})
+    if frames_per_move is None:
+        frames_per_move = math.ceil(cfg.animation_duration * cfg.fps / 1000) + 1
+    if fmt == "png" and (pipe_command is not None or output == "-"):
+        raise click.UsageError("--pipe and OUTPUT - need --format raw")
+
+    try:
+        num_games = sum(1 for _ in read_replays(path))
+        indices = sorted(set(game_indices)) if game_indices else range(num_games)
+        missing = [idx for idx in indices if idx >= num_games]
+        if missing:
+            raise click.UsageError(f"{path} has no game {missing[0]}")
+
+        start = time.perf_counter()
+        if output == "-" and pipe_command is None:
+            frames = export_replays(path, indices, cfg, output, fmt, frames_per_move)
+        else:
+            if pipe_command is None:
+                os.makedirs(output, exist_ok=True)
+            from concurrent.futures import ProcessPoolExecutor
+
+            # Strided batches spread long and short games across the workers
+            num_batches = min(len(indices), workers * 4)
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [
+                    executor.submit(
+                        export_replays,
+                        path,
+                        indices[batch_idx::num_batches],
+                        cfg,
+                        output,
+                        fmt,
+                        frames_per_move,
+                        pipe_command,
+                    )
+                    for batch_idx in range(num_batches)
+                ]
+                frames = sum(future.result() for future in futures)
+    except ValueError as e:
+        raise click.UsageError(str(e)) from e
+    except (OSError, subprocess.CalledProcessError) as e:
+        raise click.ClickException(str(e)) from e
+    elapsed = time.perf_counter() - start
+
+    # Standard output may carry the frames themselves
+    click.echo(
+        f"Exported {len(indices)} games, {frames} frames in {elapsed:.2f}s "
+        f"({frames / max(elapsed, 1e-9):,.1f} frames/sec)",
+        err=True,
+    )
+
+
+@main.command()
+@click.option("--host", default="127.0.0.1", help="Address to listen on")
+@click.option("--port", "-p", default=2048, help="Port to listen on", type=int)
+@click.option(
+    "--idle-timeout",
+    default=300.0,
+    help="Close sessions idle for this many seconds",
+    type=click.FloatRange(min=0, min_open=True),
+)
+@click.option(
+    "--max-sessions",
+    default=10000,
+    help="Refuse connections beyond this many sessions",
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--grid-size",
+    "-g",
+    default=4,
+    help="Size of the game grid (e.g. 4 for 4x4)",
+    type=int,
+)
+@click.option(
+    "--engine",
+    "-e",
+    type=click.Choice(sorted(GAME_ENGINES)),
+    default=None,
+    help="Game engine (overrides the config file)",
+)
+@click.option(
+    "--config",
+    "-c",
+    "config_path",
+    type=click.Path(exists=True),
+    help="Path to config YAML file",
+)
+def serve(
+    host: str,
+    port: int,
+    idle_timeout: float,
+    max_sessions: int,
+    grid_size: int,
+    engine: Optional[str],
+    config_path: Optional[str],
+) -> None:
+    """Host game sessions for remote players over line-based TCP."""
+    import asyncio
+
+    cfg = override_config(
+        load_config(config_path), {"grid_size": grid_size, "engine": engine}
+    )
+    try:
+        create_game(cfg)
+    except ValueError as e:
+        raise click.UsageError(str(e)) from e
+
+    server = GameServer(cfg, idle_timeout=idle_timeout, max_sessions=max_sessions)
+
+    async def run() -> None:
+        await server.start(host, port)
+        click.echo(f"Serving {cfg.grid_size}x{cfg.grid_size} games on {host}:{port}")
+        await server.serve_forever()
+
+    try:
+        asyncio.run(run())
+    except KeyboardInterrupt:
+        click.echo(f"Stopped after {server.moves} moves")
+
+
+@main.command()
+@click.option("--host", default="127.0.0.1", help="Server address")
+@click.option("--port", "-p", default=2048, help="Server port", type=int)
+@click.option(
+    "--sessions",
+    "-n",
+    default=1000,
+    help="Number of concurrent sessions",
+    type=click.IntRange(min=1),
+)
+@click.option(
+    "--duration",
+    "-d",
+    default=10.0,
+    help="Seconds to run for",
+    type=click.FloatRange(min=0, min_open=True),
+)
+@click.option("--seed", "-s", default=0, help="Random seed for the moves", type=int)
+def loadtest(host: str, port: int, sessions: int, duration: float, seed: int) -> None:
+    """Measure a running game server's throughput and latency."""
+    import asyncio
+
+    results = asyncio.run(run_load_test(host, port, sessions, duration, seed))
+    if not results["sessions"]:
+        raise click.ClickException(f"Could not connect to {host}:{port}")
+    click.echo(f"Sessions: {results['sessions']}  failed: {results['failed']}")
+    click.echo(f"Moves: {results['moves']}  moves/sec: {results['moves_per_sec']:,.1f}")
+    click.echo(
+        f"Latency ms: p50 {results['p50_ms']:.2f}  p95 {results['p95_ms']:.2f}"
+        f"  p99 {results['p99_ms']:.2f}"
+    )
+
+
+@main.group()
+def history() -> None:
+    """Query the game history recorded with --history."""
+
+
+@history.command("top")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--grid-size", "-g", default=4, help="Size of the game grid", type=int)
+@click.option(
+    "--limit", "-n", default=10, help="Number of games", type=click.IntRange(min=1)
+)
+def history_top(path: str, grid_size: int, limit: int) -> None:
+    """Show the highest scores on a grid size."""
+    rows = GameHistory(path).top_scores(grid_size, limit)
+    for rank, (score, max_tile, moves, finished_at) in enumerate(rows, 1):
+        when = time.strftime("%Y-%m-%d %H:%M", time.localtime(finished_at))
+        click.echo(
+            f"{rank:>4}. {score:>10,}  tile {max_tile:>6}  {moves:>7,} moves  {when}"
+        )
+    if not rows:
+        click.echo(f"No {grid_size}x{grid_size} games recorded")
+
+
+@history.command("daily")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+@click.option("--grid-size", "-g", default=4, help="Size of the game grid", type=int)
+@click.option("--since", default=None, help="First day to show, as YYYY-MM-DD")
+def history_daily(path: str, grid_size: int, since: Optional[str]) -> None:
+    """Show games per day (UTC) on a grid size."""
+    rows = GameHistory(path).daily_stats(grid_size, since)
+    for day, games, mean_score, best_score, max_tile in rows:
+        click.echo(
+            f"{day}  {games:>8,} games  mean {mean_score:>10,.1f}"
+            f"  best {best_score:>10,}  tile {max_tile:>6}"
+        )
+    if not rows:
+        click.echo(f"No {grid_size}x{grid_size} games recorded")
+
+
+@main.group()
+def tablebase() -> None:
+    """Exact endgame tables for small grids."""
+
+
+@tablebase.command("build")
+@click.argument("output", type=click.Path(dir_okay=False))
+@click.option(
+    "--grid-size",
+    "-g",
+    default=2,
+    help="Size of the game grid",
+    type=click.IntRange(min=2, max=TABLEBASE_MAX_GRID),
+)
+@click.option(
+    "--goal",
+    default=None,
+    help="End the game once this tile is made (keeps 3x3 and 4x4 tables small)",
+    type=int,
+)
+@click.option(
+    "--lock",
+    "locks",
+    multiple=True,
+    help="ROW,COL,VALUE of a tile that never moves; repeat for several",
+)
+def tablebase_build(
+    output: str, grid_size: int, goal: Optional[int], locks: Tuple[str, ...]
+) -> None:
+    """Solve every reachable position and write a tablebase file."""
+    locked: Dict[Tuple[int, int], int] = {}
+    for spec in locks:
+        try:
+            row, col, value = map(int, spec.split(","))
+        except ValueError as e:
+            raise click.UsageError(f"--lock expects ROW,COL,VALUE, got {spec}") from e
+        locked[(row, col)] = value
+
+    start = time.perf_counter()
+    try:
+        builder = TablebaseBuilder(grid_size, goal, locked)
+    except ValueError as e:
+        raise click.UsageError(str(e)) from e
+    num_positions = builder.build(output)
+    click.echo(
+        f"Solved {num_positions:,} positions in {time.perf_counter() - start:.1f}s; "
+        f"wrote {output} ({os.path.getsize(output):,} bytes)"
+    )
+
+
+@tablebase.command("info")
+@click.argument("path", type=click.Path(exists=True, dir_okay=False))
+def tablebase_info(path: str) -> None:
+    """Describe a tablebase file."""
+    try:
+        table = Tablebase(path)
+    except ValueError as e:
+        raise click.UsageError(str(e)) from e
+    with table:
+        click.echo(f"Grid: {table.grid_size}x{table.grid_size}")
+        click.echo(f"Goal: {table.goal or 'none'}")
+        locked = [
+            f"({cell // table.grid_size}, {cell % table.grid_size})="
+            f"{1 << ((table.locked_bits >> (4 * cell)) & 0xF)}"
+            for cell in range(table.grid_size**2)
+            if (table.locked_mask >> (4 * cell)) & 0xF
+        ]
+        click.echo(f"Locked: {', '.join(locked) or 'none'}")
+        click.echo(
+            f"Positions: {table.num_positions:,} in {1 << table.hash_bits:,} slots"
+        )
+
+
+@main.group()
+def bench() -> None:
+    """Performance benchmarks."""
+
+
+@bench.command("run")
+@click.option(
+    "--output",
+    "-o",
+    type=click.Path(dir_okay=False),
+    default=None,
+    help="Write the results to this JSON file",
+)
+@click.option(
+    "--engine",
+    "-e",
+    "engines",
+    type=click.Choice(sorted(GAME_ENGINES)),
+    multiple=True,
+    help="Engine to benchmark; repeat for several (defaults to all)",
+)
+@click.option(
+    "--grid-size",
+    "-g",
+    "grid_sizes",
+    type=click.IntRange(min=2, max=8),
+    multiple=True,
+    help="Grid size to benchmark; repeat for several (defaults to 2 through 8)",
+)
+@click.option("--rounds", "-r", default=5, help="Timing rounds per benchmark", type=int)
+@click.option("--no-draw", is_flag=True, help="Skip the Renderer.draw benchmarks")
+@click.option(
+    "--startup-runs",
+    default=5,
+    help="Cold starts to measure (0 skips startup)",
+    type=click.IntRange(min=0),
+)
+def bench_run(
+    output: Optional[str],
+    engines: Tuple[str, ...],
+    grid_sizes: Tuple[int, ...],
+    rounds: int,
+    no_draw: bool,
+    startup_runs: int,
+) -> None:
+    """Run the engine, rendering and startup benchmarks."""
+    if rounds < 1:
+        raise click.UsageError("--rounds must be at least 1")
+
+    report = run_benchmarks(
+        engines or sorted(GAME_ENGINES),
+        grid_sizes or BENCH_GRID_SIZES,
+        rounds=rounds,
+        draw=not no_draw,
+        startup_runs=startup_runs,
+    )
+    for key, value in report["results"].items():
+        click.echo(f"{key:<40}{value:>14,.0f} ns")
+    if output:
+        with open(output, "w") as file:
+            json.dump(report, file, indent=2)
+        click.echo(f"Saved {len(report['results'])} results to {output}")
+
+
+@bench.command("compare")
+@click.argument("baseline_path", type=click.Path(exists=True, dir_okay=False))
+@click.argument("current_path", type=click.Path(exists=True, dir_okay=False))
+@click.option(
+    "--threshold",
+    "-t",
+    default=10.0,
+    help="Slowdown in percent that counts as a regression",
+    type=float,
+)
+def bench_compare(baseline_path: str, current_path: str, threshold: float) -> None:
+    """Compare two saved benchmark runs and fail on regressions."""
+    with open(baseline_path) as file:
+        baseline = json.load(file)["results"]
+    with open(current_path) as file:
+        current = json.load(file)["results"]
+
+    rows = compare_benchmarks(baseline, current, threshold)
+    for key, before, after, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        click.echo(f"{key:<40}{before:>14,.0f}{after:>14,.0f}{change:>+9.1f}%{flag}")
+
+    regressions = [key for key, _, _, _, regressed in rows if regressed]
+    if regressions:
+        raise click.ClickException(
+            f"{len(regressions)} of {len(rows)} benchmarks regressed by more "
+            f"than {threshold:.0f}%"
+        )
+    click.echo(f"No regressions in {len(rows)} benchmarks")
+
+
+@bench.command()
+@click.option("--runs", "-r", default=10, help="Number of cold starts", type=int)
+@click.option(
+    "--max-import-ms",
+    default=150.0,
+    help="Fail if the median cold import takes longer",
+    type=float,
+)
+@click.option(
+    "--max-first-frame-ms",
+    default=1500.0,
+    help="Fail if the median time to first frame is longer",
+    type=float,
+)
+def startup(runs: int, max_import_ms: float, max_first_frame_ms: float) -> None:
+    """Measure cold import time and time to first frame."""
+    if runs < 1:
+        raise click.UsageError("--runs must be at least 1")
+
+    results = measure_startup(runs)
+    click.echo(f"Cold import:    {results['import_ms']:8.1f} ms")
+    click.echo(f"First frame:    {results['first_frame_ms']:8.1f} ms")
+    click.echo(f"Whole process:  {results['process_ms']:8.1f} ms")
+
+    failures = []
+    if results["import_ms"] > max_import_ms:
+        failures.append(f"cold import exceeds {max_import_ms:.0f} ms")
+    if results["first_frame_ms"] > max_first_frame_ms:
+        failures.append(f"first frame exceeds {max_first_frame_ms:.0f} ms")
+    if failures:
+        raise click.ClickException("Startup regression: " + ", ".join(failures))
 
 
 if __name__ == "__main__":
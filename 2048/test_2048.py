@@ -0,0 +1,304 @@
+"""Tests for the 2048 game logic.
+
+Run with ``python -m pytest 2048``. The script's name is not a valid module
+name, so it is loaded from its path.
+"""
+
+import functools
+import importlib.util
+import pathlib
+import random
+import sys
+
+import pytest
+
+SCRIPT = pathlib.Path(__file__).with_name("2048.py")
+
+
+def load_script():
+    """Import 2048.py as the module game2048."""
+    spec = importlib.util.spec_from_file_location("game2048", SCRIPT)
+    module = importlib.util.module_from_spec(spec)
+    # Dataclasses and pickling look classes up through sys.modules
+    sys.modules[spec.name] = module
+    spec.loader.exec_module(module)
+    return module
+
+
+game2048 = load_script()
+Action = game2048.Action
+GameConfig = game2048.GameConfig
+MOVE_ACTIONS = game2048.MOVE_ACTIONS
+
+
+# Random play ends a small game in a few hundred moves; the cap turns a game
+# that never ends into a failure instead of a hang
+MAX_ATTEMPTS = 50_000
+
+
+def play_random(game, seed, max_moves=None):
+    """Play random moves until the game is over.
+
+    Args:
+        game: Game to play, already restarted
+        seed: Seed for the move choices
+        max_moves: Stop after this many board-changing moves, if given
+
+    Returns:
+        The moves that changed the board
+    """
+    rng = random.Random(seed)
+    actions = []
+    for _ in range(MAX_ATTEMPTS):
+        if game.game_over or len(actions) == max_moves:
+            return actions
+        action = rng.choice(MOVE_ACTIONS)
+        if game.handle_action(action):
+            actions.append(action)
+    raise AssertionError("game did not end")
+
+
+def position(game):
+    """Everything that decides how a game continues."""
+    return game.board_state(), game.score, game.game_over, game.rng.getstate()
+
+
+# Engines
+
+
+@pytest.mark.parametrize("seed", range(10))
+def test_bitboard_matches_list_engine(seed):
+    list_game = game2048.create_game(GameConfig(engine="list"))
+    bitboard_game = game2048.create_game(GameConfig(engine="bitboard"))
+    list_game.restart(seed)
+    bitboard_game.restart(seed)
+    rng = random.Random(seed)
+    for _ in range(MAX_ATTEMPTS):
+        if list_game.game_over:
+            break
+        action = rng.choice(MOVE_ACTIONS)
+        assert list_game.handle_action(action) == bitboard_game.handle_action(action)
+        assert bitboard_game.board == list_game.board
+        assert bitboard_game.score == list_game.score
+        assert bitboard_game.new_tile_position == list_game.new_tile_position
+        assert bitboard_game.game_over == list_game.game_over
+    assert list_game.game_over
+    assert bitboard_game.move_counts == list_game.move_counts
+
+
+@pytest.mark.parametrize("grid_size", [2, 3, 4, 5, 8])
+def test_incremental_tracking_matches_rescan(grid_size):
+    game = game2048.Game(GameConfig(grid_size=grid_size))
+    for seed in range(4):
+        game.restart(seed)
+        rng = random.Random(seed)
+        for _ in range(2000):
+            if game.game_over:
+                break
+            game.handle_action(rng.choice(MOVE_ACTIONS))
+
+            empty_list = list(game.empty_list)
+            empty_index = list(game.empty_index)
+            pair_flags = bytes(game.pair_flags)
+            equal_pairs = game.equal_pairs
+            game.update_empty_cells()
+            assert sorted(empty_list) == sorted(game.empty_list)
+            assert all(empty_index[cell] == idx for idx, cell in enumerate(empty_list))
+            assert sum(idx >= 0 for idx in empty_index) == len(empty_list)
+            assert pair_flags == bytes(game.pair_flags)
+            assert equal_pairs == game.equal_pairs
+            # The rescan may order the list differently; keep the game's own
+            game.empty_list, game.empty_index = empty_list, empty_index
+
+
+def test_row_cache_only_above_4x4():
+    assert game2048.Game(GameConfig(grid_size=4)).row_cache is None
+    assert game2048.create_game(GameConfig(engine="bitboard")).row_cache is None
+    assert game2048.Game(GameConfig(grid_size=5, row_cache_size=0)).row_cache is None
+
+
+# Replays
+
+
+@pytest.mark.parametrize("engine", ["list", "bitboard", "compact", "numpy"])
+def test_replay_round_trip(tmp_path, engine):
+    config = GameConfig(engine=engine)
+    path = tmp_path / "games.replay"
+    games = []
+    with game2048.ReplayWriter(str(path)) as writer:
+        for seed in range(5):
+            game = game2048.create_game(config)
+            game.restart(seed)
+            actions = play_random(game, seed)
+            writer.write_game(game, actions, engine)
+            games.append((game, actions))
+
+    replays = list(game2048.read_replays(str(path)))
+    assert len(replays) == len(games)
+    for replay, (game, actions) in zip(replays, games):
+        assert (replay.seed, replay.score, replay.grid_size, replay.engine) == (
+            game.seed,
+            game.score,
+            game.grid_size,
+            engine,
+        )
+        assert replay.actions() == actions
+        rebuilt = game2048.replay_game(replay, GameConfig())
+        assert rebuilt.board == game.board
+        assert rebuilt.score == game.score
+
+
+def test_replay_rejects_other_engine(tmp_path):
+    path = tmp_path / "games.replay"
+    game = game2048.create_game(GameConfig(engine="compact"))
+    game.restart(1)
+    actions = play_random(game, 1)
+    with game2048.ReplayWriter(str(path)) as writer:
+        writer.write_game(game, actions, "compact")
+    (replay,) = game2048.read_replays(str(path))
+    with pytest.raises(ValueError, match="compact engine"):
+        game2048.replay_game(replay, GameConfig(), engine="list")
+
+
+def test_read_replays_rejects_truncated_file(tmp_path):
+    path = tmp_path / "games.replay"
+    game = game2048.create_game(GameConfig())
+    game.restart(2)
+    actions = play_random(game, 2)
+    with game2048.ReplayWriter(str(path)) as writer:
+        writer.write_game(game, actions, "list")
+    path.write_bytes(path.read_bytes()[:-1])
+    with pytest.raises(ValueError, match="truncated"):
+        list(game2048.read_replays(str(path)))
+
+
+# Undo
+
+
+@pytest.mark.parametrize("engine", ["list", "bitboard"])
+def test_undo_redo_restores_positions_and_spawns(engine):
+    game = game2048.create_game(GameConfig(engine=engine))
+    game.enable_undo(1024)
+    game.restart(5)
+    positions = [position(game)]
+    actions = []
+    for action in play_random(game.clone(), 1):
+        assert game.handle_action(action)
+        actions.append(action)
+        positions.append(position(game))
+
+    for expected in reversed(positions[:-1]):
+        assert game.undo()
+        assert position(game) == expected
+    assert not game.undo()
+    for expected in positions[1:]:
+        assert game.redo()
+        assert position(game) == expected
+    assert not game.redo()
+
+    # Moves made again after undoing deal the same tiles
+    for _ in range(10):
+        game.undo()
+    for idx in range(len(actions) - 10, len(actions)):
+        assert game.handle_action(actions[idx])
+        assert position(game) == positions[idx + 1]
+
+
+def test_undo_history_stays_under_its_cap():
+    memory_kb = 64
+    game = game2048.Game(GameConfig(grid_size=6))
+    game.enable_undo(memory_kb)
+    game.restart(2)
+    boards = [game.board_state()]
+    for action in play_random(game.clone(), 3, max_moves=3000):
+        game.handle_action(action)
+        boards.append(game.board_state())
+    history = game.history
+    assert history.size == sum(entry.size for entry in history.entries)
+    assert history.size <= memory_kb * 1024
+
+    # Thinned histories skip positions but never show one that did not happen
+    steps = 0
+    while game.undo():
+        steps += 1
+        assert game.board_state() == boards[sum(game.move_counts)]
+    assert steps > 32
+    while game.redo():
+        assert game.board_state() == boards[sum(game.move_counts)]
+
+
+# Endgame tablebase
+
+
+@pytest.fixture(scope="module")
+def tablebase_2x2(tmp_path_factory):
+    path = tmp_path_factory.mktemp("tablebase") / "2x2.tb"
+    game2048.TablebaseBuilder(2).build(str(path))
+    with game2048.Tablebase(str(path)) as tablebase:
+        yield tablebase
+
+
+@functools.lru_cache(maxsize=None)
+def expectimax_2x2(board):
+    """Exact expected score still to gain and best move, by brute force."""
+    best_value, best_action = None, Action.NONE
+    for action, (successor, gain, moved) in zip(
+        MOVE_ACTIONS, game2048.all_moves(board)
+    ):
+        if not moved:
+            continue
+        empty_cells = [
+            (row_idx, col_idx)
+            for row_idx, row in enumerate(successor)
+            for col_idx, value in enumerate(row)
+            if value == 0
+        ]
+        total = 0.0
+        for row_idx, col_idx in empty_cells:
+            for tile, prob in game2048.TILE_ODDS:
+                spawned = [list(row) for row in successor]
+                spawned[row_idx][col_idx] = tile
+                total += prob * expectimax_2x2(tuple(map(tuple, spawned)))[0]
+        value = gain + total / len(empty_cells)
+        if best_value is None or value > best_value + 1e-9:
+            best_value, best_action = value, action
+    return best_value or 0.0, best_action
+
+
+def test_tablebase_matches_brute_force(tablebase_2x2):
+    rng = random.Random(0)
+    checked = 0
+    for _ in range(100):
+        cells = [0, 0, 0, 0]
+        for cell in rng.sample(range(4), 2):
+            cells[cell] = rng.choice((2, 2, 4))
+        board = (tuple(cells[:2]), tuple(cells[2:]))
+        while True:
+            found = tablebase_2x2.lookup(board)
+            value, best_action = expectimax_2x2(board)
+            assert found is not None
+            assert found[1] == pytest.approx(value, rel=1e-3, abs=1e-3)
+            checked += 1
+            if best_action == Action.NONE:
+                assert found[0] == Action.NONE
+                break
+            # The stored move may differ on ties but must reach the same value
+            successor, gain, moved = game2048.all_moves(board)[
+                game2048.MOVE_INDEX[found[0]]
+            ]
+            assert moved
+            empty_cells = [
+                (row_idx, col_idx)
+                for row_idx, row in enumerate(successor)
+                for col_idx, value in enumerate(row)
+                if value == 0
+            ]
+            row_idx, col_idx = rng.choice(empty_cells)
+            spawned = [list(row) for row in successor]
+            spawned[row_idx][col_idx] = rng.choice((2,) * 9 + (4,))
+            board = tuple(map(tuple, spawned))
+    assert checked > 100
+
+
+def test_tablebase_misses_empty_board(tablebase_2x2):
+    assert tablebase_2x2.lookup([[0, 0], [0, 0]]) is None